@@ -1,79 +1,294 @@
 import requests
 import json
+import logging
 import os
-from typing import List, Dict
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from generation_cache import GenerationCache
+from question_parser import QuestionStreamParser, question_key
+
+PROMPT_TEMPLATE = """
+        Generate {num_questions} multiple choice quiz questions about "{topic}" with {difficulty} difficulty level.
+        
+        For each question, provide:
+        1. A clear, well-formulated question
+        2. Four answer options (A, B, C, D)
+        3. The correct answer (A, B, C, or D)
+        
+        Format the response as a JSON array where each question has this structure:
+        {{
+            "question": "The question text here",
+            "option_a": "First option",
+            "option_b": "Second option", 
+            "option_c": "Third option",
+            "option_d": "Fourth option",
+            "correct_answer": "A"
+        }}
+        
+        Make sure the questions are educational, accurate, and appropriate for the topic.
+        Vary the question types and make the incorrect options plausible but clearly wrong.
+        Return ONLY the JSON array, no other text.
+        """
+
+# Status codes worth retrying; any other error moves on to the next endpoint
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationError(Exception):
+    """Raised for a failed call to one endpoint."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
 
 class NVIDIAQuestionGenerator:
-    def __init__(self):
+    def __init__(self, api_key: Optional[str] = None, endpoints: Optional[List[str]] = None,
+                 model_id: Optional[str] = None, chunk_size: int = 10, max_workers: int = 4,
+                 timeout: float = 30, max_retries: int = 3, backoff: float = 0.5,
+                 cache: Optional[GenerationCache] = None):
         # Your NVIDIA API key
-        self.api_key = "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"
+        self.api_key = api_key or os.environ.get("NVIDIA_API_KEY")
+        if not self.api_key:
+            raise RuntimeError("No API key for AI question generation: set NVIDIA_API_KEY")
         # Try different possible endpoints
-        self.endpoints = [
+        self.endpoints = endpoints or [e for e in os.environ.get("NVIDIA_API_ENDPOINTS", "").split(",") if e] or [
             "https://api.nvcf.nvidia.com/v2/nvcf/pexec/functions",
             "https://api.nvcf.nvidia.com/v2/nvcf/exec/functions",
             "https://api.nvcf.nvidia.com/v2/nvcf/chat/completions"
         ]
-        self.model_id = "nvidia/nemotron-nano-9b-v2:free"
+        self.model_id = model_id or os.environ.get("NVIDIA_MODEL_ID", "nvidia/nemotron-nano-9b-v2:free")
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        
+        # Keep-alive connections shared by the worker threads, one pool per endpoint host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        })
     
-    def generate_questions(self, topic: str, num_questions: int = 10, difficulty: str = "medium") -> List[Dict]:
+    def generate_questions(self, topic: str, num_questions: int = 10, difficulty: str = "medium",
+                           on_progress: Optional[Callable[[List[Dict]], None]] = None,
+                           exclude: Iterable[str] = ()) -> List[Dict]:
         """
         Generate quiz questions using NVIDIA Nemotron API
         
+        Collects generate_questions_stream(); see there for chunking, retries
+        and caching.
+        
         Args:
             topic (str): The topic/subject for the quiz
             num_questions (int): Number of questions to generate
             difficulty (str): Difficulty level (easy, medium, hard)
+            on_progress (callable): Called with the questions gathered so far
+                                    each time another one arrives
+            exclude (iterable): question_key() values of questions not to return,
+                                e.g. rejected ones that need replacing
         
         Returns:
             List[Dict]: List of generated questions with options and correct answers
+                        (empty if every endpoint failed)
+        """
+        questions = []
+        for question in self.generate_questions_stream(topic, num_questions, difficulty, exclude):
+            questions.append(question)
+            if on_progress:
+                on_progress(list(questions))
+        return questions
+    
+    def generate_questions_stream(self, topic: str, num_questions: int = 10, difficulty: str = "medium",
+                                  exclude: Iterable[str] = ()) -> Iterator[Dict]:
         """
+        Yield questions as soon as each one is complete in the model's streamed output.
         
-        prompt = f"""
-        Generate {num_questions} multiple choice quiz questions about "{topic}" with {difficulty} difficulty level.
+        Large requests are split into chunks of chunk_size questions that are
+        streamed concurrently; duplicates are dropped as they arrive. If the
+        merged set comes up short, one more round asks for the missing
+        questions.
         
-        For each question, provide:
-        1. A clear, well-formulated question
-        2. Four answer options (A, B, C, D)
-        3. The correct answer (A, B, C, or D)
+        With a cache, questions generated earlier for the same topic,
+        difficulty, model and prompt are yielded first and only the shortfall
+        is requested from the API.
+        """
+        excluded = set(exclude)
+        cache_key = None
+        cached = []
+        if self.cache:
+            cache_key = self.cache.key(topic, difficulty, self.model_id, PROMPT_TEMPLATE)
+            cached = [question for question in self.cache.get(cache_key)
+                      if question_key(question) not in excluded][:num_questions]
         
-        Format the response as a JSON array where each question has this structure:
-        {{
-            "question": "The question text here",
-            "option_a": "First option",
-            "option_b": "Second option", 
-            "option_c": "Third option",
-            "option_d": "Fourth option",
-            "correct_answer": "A"
-        }}
+        seen = excluded | {question_key(question) for question in cached}
+        generated = []
+        try:
+            yield from cached
+            for _ in range(2):
+                missing = num_questions - len(cached) - len(generated)
+                if missing <= 0:
+                    break
+                for question in self._generate_concurrently(topic, missing, difficulty):
+                    key = question_key(question)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    generated.append(question)
+                    yield question
+                    if len(cached) + len(generated) >= num_questions:
+                        break
+        finally:
+            # Also runs when the caller stops early, so questions already paid for are kept
+            if self.cache:
+                self._store_in_cache(cache_key, topic, difficulty, generated)
+                self.cache.record(hits=int(len(cached) == num_questions),
+                                  partial_hits=int(0 < len(cached) < num_questions),
+                                  misses=int(not cached),
+                                  questions_served=len(cached),
+                                  questions_generated=len(generated))
+    
+    def _store_in_cache(self, cache_key: str, topic: str, difficulty: str, generated: List[Dict]):
+        if not generated:
+            return
+        # Top up the stored set rather than replace it, so a smaller request never shrinks it
+        stored = self.cache.get(cache_key)
+        keys = {question_key(question) for question in stored}
+        stored += [question for question in generated if question_key(question) not in keys]
+        self.cache.put(cache_key, topic, difficulty, stored)
+    
+    def _generate_concurrently(self, topic: str, num_questions: int, difficulty: str) -> Iterator[Dict]:
+        """Yield questions from all chunks in the order they arrive."""
+        sizes = [min(self.chunk_size, num_questions - start) for start in range(0, num_questions, self.chunk_size)]
+        stop = threading.Event()
+        if len(sizes) == 1:
+            yield from self._generate_chunk(topic, sizes[0], difficulty, 0, stop)
+            return
         
-        Make sure the questions are educational, accurate, and appropriate for the topic.
-        Vary the question types and make the incorrect options plausible but clearly wrong.
-        Return ONLY the JSON array, no other text.
+        arrived = queue.Queue()
+        
+        def run_chunk(index, size):
+            try:
+                for question in self._generate_chunk(topic, size, difficulty, index, stop):
+                    arrived.put(question)
+            except Exception:
+                logger.exception("Question generation chunk %d failed", index)
+            finally:
+                arrived.put(None)
+        
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(sizes)))
+        try:
+            for index, size in enumerate(sizes):
+                pool.submit(run_chunk, index, size)
+            finished = 0
+            while finished < len(sizes):
+                question = arrived.get()
+                if question is None:
+                    finished += 1
+                else:
+                    yield question
+        finally:
+            # The caller may stop early; tell streams still open to give up
+            stop.set()
+            pool.shutdown(wait=False)
+    
+    def _generate_chunk(self, topic: str, num_questions: int, difficulty: str, chunk_index: int,
+                        stop: threading.Event) -> Iterator[Dict]:
         """
+        Stream one chunk, retrying with exponential backoff and rotating through the endpoints.
         
-        # For now, let's use the fallback generator since NVIDIA API endpoints are not working
-        # This ensures the feature works while we can debug the API later
-        print("Using fallback generator for reliable question generation")
-        return []
+        Questions already yielded from a failed attempt are kept; the retry
+        asks only for the rest. A response that ends early with some valid
+        questions counts as done, and the caller's top-up round covers the gap.
+        """
+        produced = 0
+        for attempt in range(self.max_retries + 1):
+            if stop.is_set():
+                return
+            endpoint = self.endpoints[(chunk_index + attempt) % len(self.endpoints)]
+            wanted = num_questions - produced
+            prompt = PROMPT_TEMPLATE.format(num_questions=wanted, topic=topic, difficulty=difficulty)
+            parser = QuestionStreamParser()
+            produced_before = produced
+            try:
+                for text in self._stream_endpoint(endpoint, prompt, wanted, stop):
+                    for question in parser.feed(text):
+                        produced += 1
+                        yield question
+                        if produced >= num_questions:
+                            return
+                if produced > produced_before:
+                    return
+                error = GenerationError("response contained no valid questions")
+            except GenerationError as e:
+                error = e
+            
+            logger.warning("Question generation via %s failed (attempt %d): %s", endpoint, attempt + 1, error)
+            if error.retryable and attempt < self.max_retries:
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
     
-    def _extract_questions_from_text(self, text: str, topic: str, num_questions: int) -> List[Dict]:
-        """Extract questions from text when JSON parsing fails"""
-        # This is a fallback method to create questions from any text response
-        questions = []
-        lines = text.split('\n')
-        
-        for i in range(min(num_questions, 5)):  # Limit to 5 questions max
-            question = {
-                "question": f"Sample question {i+1} about {topic}?",
-                "option_a": "Option A",
-                "option_b": "Option B",
-                "option_c": "Option C",
-                "option_d": "Option D",
-                "correct_answer": "A"
-            }
-            questions.append(question)
+    def _stream_endpoint(self, endpoint: str, prompt: str, num_questions: int,
+                         stop: Optional[threading.Event] = None) -> Iterator[str]:
+        """Yield the completion text piece by piece from a server-sent event stream.
         
-        return questions
+        Endpoints that ignore "stream" and answer with a plain JSON
+        completion are handled too, as a single piece.
+        """
+        payload = {
+            "model": self.model_id,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 400 * num_questions + 200,
+            "stream": True
+        }
+        try:
+            with self.session.post(endpoint, json=payload, timeout=self.timeout, stream=True) as response:
+                if response.status_code != 200:
+                    raise GenerationError(f"HTTP {response.status_code}",
+                                          retryable=response.status_code in RETRYABLE_STATUS)
+                
+                if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                    yield self._completion_text(response)
+                    return
+                
+                response.encoding = response.encoding or "utf-8"
+                for line in response.iter_lines(decode_unicode=True):
+                    if stop is not None and stop.is_set():
+                        return
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        return
+                    try:
+                        choice = json.loads(data)["choices"][0]
+                    except (ValueError, KeyError, IndexError, TypeError):
+                        raise GenerationError("malformed stream event")
+                    text = (choice.get("delta") or {}).get("content") or choice.get("text") or ""
+                    if text:
+                        yield text
+        except requests.RequestException as e:
+            raise GenerationError(str(e))
+    
+    def _completion_text(self, response: requests.Response) -> str:
+        try:
+            choice = response.json()["choices"][0]
+            return choice["message"]["content"] if "message" in choice else choice["text"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise GenerationError("unexpected response format", retryable=False)
 
 # Alternative simple implementation for testing
 class SimpleQuestionGenerator:
@@ -0,0 +1,255 @@
+"""
+GMU Quiz Land - Write-Behind Answer Buffer
+Keeps active attempts in memory, appends every answer to a local log and
+writes answers to the database in batched transactions (group commit)
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+
+class AttemptState:
+    """In-memory copy of an Attempt row; authoritative while the attempt is buffered."""
+
+    __slots__ = ('id', 'quiz_id', 'current_question', 'score', 'is_completed', 'end_time',
+                 'answered', 'shuffle_seed', 'deadline', 'pending', 'touched_at', 'lock')
+
+    def __init__(self, id: int, quiz_id: int, current_question: int, score: int,
+                 is_completed: bool, end_time: Optional[datetime], answered: Set[int],
+                 shuffle_seed: Optional[int] = None, deadline: Optional[datetime] = None):
+        self.id = id
+        self.quiz_id = quiz_id
+        self.current_question = current_question
+        self.score = score
+        self.is_completed = is_completed
+        self.end_time = end_time
+        self.answered = answered
+        self.shuffle_seed = shuffle_seed
+        self.deadline = deadline
+        self.pending = 0
+        self.touched_at = time.monotonic()
+        self.lock = threading.Lock()
+
+
+def _encode(entry: Dict) -> str:
+    return json.dumps({key: value.isoformat() if isinstance(value, datetime) else value
+                       for key, value in entry.items()})
+
+
+def _decode(line: str) -> Dict:
+    entry = json.loads(line)
+    for key in ('answered_at', 'end_time', 'deadline'):
+        if entry.get(key):
+            entry[key] = datetime.fromisoformat(entry[key])
+    return entry
+
+
+class AnswerBuffer:
+    """
+    Write-behind buffer for answer submissions.
+
+    Each recorded answer is appended to an append-only log and queued. A
+    background thread hands queued entries to flush_fn every
+    flush_interval_ms, or as soon as flush_max_rows are waiting. Every entry
+    carries the attempt's score/progress after the answer, so flush_fn can
+    write absolute values and replaying an entry twice is harmless.
+
+    Before each flush the live log is rotated into a numbered segment; the
+    segments are deleted once flush_fn succeeds. recover() replays whatever
+    segments and log a crashed process left behind.
+
+    The in-memory attempt state is per process, so a deployment running
+    several worker processes must not enable write-behind. Failed background
+    flushes are reported to logger.
+    """
+
+    def __init__(self, flush_fn: Callable[[List[Dict]], None], log_path: str,
+                 flush_interval_ms: int = 200, flush_max_rows: int = 500, idle_seconds: int = 3600,
+                 logger: Optional[logging.Logger] = None):
+        self.flush_fn = flush_fn
+        self.logger = logger or logging.getLogger(__name__)
+        self.log_path = log_path
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_rows = flush_max_rows
+        self.idle_seconds = idle_seconds
+        self.flushed_rows = 0
+        self.flushes = 0
+        self._states = {}
+        self._pending = []
+        self._segments = []
+        self._seq = 0
+        self._log = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+
+    def recover(self) -> int:
+        """Write any answers left in the log by a previous process. Returns the number replayed."""
+        paths = [p for p in glob.glob(self.log_path + '.*') if p.rsplit('.', 1)[1].isdigit()]
+        paths.sort(key=lambda p: int(p.rsplit('.', 1)[1]))
+        if os.path.exists(self.log_path):
+            paths.append(self.log_path)
+
+        entries = []
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entries.append(_decode(line))
+                    except ValueError:
+                        # A torn final line from a crash mid-write
+                        continue
+
+        entries.sort(key=lambda entry: entry['seq'])
+        for start in range(0, len(entries), self.flush_max_rows):
+            self.flush_fn(entries[start:start + self.flush_max_rows])
+        for path in paths:
+            os.remove(path)
+        if entries:
+            self._seq = entries[-1]['seq']
+        return len(entries)
+
+    def get_state(self, attempt_id: int, loader: Callable[[int], Optional[AttemptState]]) -> Optional[AttemptState]:
+        """Return the buffered state for attempt_id, loading it with loader(attempt_id) on first use."""
+        with self._lock:
+            state = self._states.get(attempt_id)
+        if state is None:
+            state = loader(attempt_id)
+            if state is None:
+                return None
+            with self._lock:
+                state = self._states.setdefault(attempt_id, state)
+        state.touched_at = time.monotonic()
+        return state
+
+    def peek(self, attempt_id: int) -> Optional[AttemptState]:
+        """The buffered state for attempt_id, without loading it."""
+        with self._lock:
+            return self._states.get(attempt_id)
+
+    def append(self, state: AttemptState, question_id: int, selected_answer: str, is_correct: bool):
+        """
+        Queue an answer whose effect has already been applied to state.
+
+        Callers must hold state.lock around updating the state and calling
+        append, so entries for one attempt are logged in order.
+        """
+        with self._lock:
+            self._ensure_started()
+            self._seq += 1
+            entry = {
+                'seq': self._seq,
+                'attempt_id': state.id,
+                'quiz_id': state.quiz_id,
+                'question_id': question_id,
+                'selected_answer': selected_answer,
+                'is_correct': is_correct,
+                'answered_at': datetime.utcnow(),
+                'current_question': state.current_question,
+                'score': state.score,
+                'is_completed': state.is_completed,
+                'end_time': state.end_time,
+                'deadline': state.deadline
+            }
+            self._log.write(_encode(entry) + '\n')
+            self._log.flush()
+            self._pending.append((entry, state))
+            state.pending += 1
+            if len(self._pending) >= self.flush_max_rows:
+                self._wakeup.set()
+
+    def flush(self) -> int:
+        """Synchronously write everything queued so far. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                if not pending:
+                    return 0
+                entries = [entry for entry, _ in pending]
+                # Rotate the live log so appends during the flush land in a fresh file
+                self._log.close()
+                segment = f'{self.log_path}.{entries[-1]["seq"]}'
+                os.replace(self.log_path, segment)
+                self._segments.append(segment)
+                self._log = open(self.log_path, 'a')
+
+            try:
+                self.flush_fn(entries)
+            except Exception:
+                with self._lock:
+                    self._pending = pending + self._pending
+                raise
+
+            with self._lock:
+                segments, self._segments = self._segments, []
+                for _, state in pending:
+                    state.pending -= 1
+                self._evict()
+                self.flushed_rows += len(entries)
+                self.flushes += 1
+            for path in segments:
+                os.remove(path)
+            return len(entries)
+
+    def close(self):
+        """Stop the flusher thread and write out anything still queued."""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        self.flush()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'active_attempts': len(self._states),
+                'pending_rows': len(self._pending),
+                'flushed_rows': self.flushed_rows,
+                'flushes': self.flushes
+            }
+
+    def _evict(self):
+        # Completed or idle attempts with nothing queued can be reloaded from the
+        # database. A locked state is mid-update and its answer is not queued yet.
+        now = time.monotonic()
+        for attempt_id in [attempt_id for attempt_id, state in self._states.items()
+                           if not state.pending and not state.lock.locked()
+                           and (state.is_completed or now - state.touched_at > self.idle_seconds)]:
+            del self._states[attempt_id]
+
+    def _ensure_started(self):
+        # Started lazily, and again after a fork, so pre-forking servers get one flusher per worker
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        self._pid = os.getpid()
+        if self._log is None or self._log.closed:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            self._log = open(self.log_path, 'a')
+        self._thread = threading.Thread(target=self._run, name='answer-buffer-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Entries stay queued and in the log; retry on the next tick
+                self.logger.exception('Answer buffer flush failed')
@@ -1,24 +1,102 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, current_app, render_template, request, redirect, url_for, flash, jsonify, session, abort, Response, stream_with_context
+from markupsafe import Markup
 from flask_sqlalchemy import SQLAlchemy
+from flask.cli import AppGroup
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.schema import CreateColumn
+import click
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.local import LocalProxy
+from werkzeug.utils import import_string
+from collections import Counter, defaultdict
+from contextlib import nullcontext
 from datetime import datetime, timedelta
+import atexit
+import functools
+import hmac
+import itertools
+import csv
+import io
+import json
 import os
-from ai_question_generator import NVIDIAQuestionGenerator, SimpleQuestionGenerator
+import re
+import threading
+import time
+import uuid
+from answer_buffer import AnswerBuffer, AttemptState
+from config import Config
+from catalog_cache import CatalogCache, CatalogState
+from generation_cache import GenerationCache
+from instrumentation import RequestMetrics
+from job_queue import JobQueue
+from live_events import LiveEventBroker, LocalBackend, SocketBackend, format_message
+from periodic_task import PeriodicTask
+from question_dedup import QuestionIndex, pack_signature, unpack_signature
+from question_io import FORMATS as QUESTION_FILE_FORMATS, question_format, read_questions, write_questions
+from question_parser import normalize_question, question_key
+from quiz_cache import QuizCache, QuizSnapshot, QuestionView
+from user_cache import CachedUser, UserCache, password_fingerprint
+from quiz_shuffle import (attempt_question_ids, attempt_questions, new_seed, question_order, shown_answer,
+                          shown_question, stored_answer)
 # from dotenv import load_dotenv
 # load_dotenv()
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///gmu_quiz.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+db = SQLAlchemy()
 
-db = SQLAlchemy(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'admin_login'
 login_manager.login_message = 'Please log in to access this page.'
 
+# Views, request hooks and CLI commands are declared here and added to every
+# app create_app() builds, under their function names
+_routes = []
+_before_request_funcs = []
+commands = AppGroup('quiz')
+
+def route(rule, **options):
+    """Declare a view like app.route does."""
+    def register(view):
+        _routes.append((rule, view, options))
+        return view
+    return register
+
+def before_request(f):
+    _before_request_funcs.append(f)
+    return f
+
+def _services():
+    return current_app.extensions['gmu_quiz']
+
+def _service(name):
+    """A module-level name for one of the current app's services, created by create_app()."""
+    return LocalProxy(lambda: _services()[name])
+
+def sqlite_pragma_listener(pragmas):
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return apply_pragmas
+
+# Opt-in per-endpoint SQL and timing metrics, served at /admin/metrics
+request_metrics = _service('request_metrics')
+
+def password_hash_prefix():
+    """The method prefix werkzeug writes for PASSWORD_HASH_METHOD.
+
+    Found by hashing once, since a method like 'scrypt' or 'pbkdf2' is
+    written out with werkzeug's default parameters, e.g. 'scrypt:32768:8:1'.
+    """
+    services = _services()
+    if services['password_hash_prefix'] is None:
+        probe = generate_password_hash('', method=current_app.config['PASSWORD_HASH_METHOD'])
+        services['password_hash_prefix'] = probe.split('$', 1)[0]
+    return services['password_hash_prefix']
+
 # Database Models
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -28,11 +106,19 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def needs_rehash(self):
+        """True if the stored hash was made with other parameters than PASSWORD_HASH_METHOD."""
+        return self.password_hash.split('$', 1)[0] != password_hash_prefix()
+
+    def get_id(self):
+        # The fingerprint ties the session to the password it was opened with
+        return f'{self.id}:{password_fingerprint(self.password_hash)}'
+
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -40,8 +126,27 @@ class Quiz(db.Model):
     duration_mode = db.Column(db.String(20), nullable=False)  # 'per_question' or 'overall'
     duration_seconds = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Per-attempt randomization, derived from Attempt.shuffle_seed (see quiz_shuffle)
+    shuffle_questions = db.Column(db.Boolean, default=False)
+    shuffle_options = db.Column(db.Boolean, default=False)
+    sample_size = db.Column(db.Integer)  # questions each attempt draws from the quiz; None for all of them
     questions = db.relationship('Question', backref='quiz', lazy=True, cascade='all, delete-orphan')
     attempts = db.relationship('Attempt', backref='quiz', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        # Keyset pagination of the catalog, newest first
+        db.Index('ix_quiz_created_at_id', 'created_at', 'id'),
+    )
+    
+    @property
+    def randomized(self):
+        return bool(self.shuffle_questions or self.shuffle_options or self.sample_size)
+    
+    @property
+    def questions_per_attempt(self):
+        if self.sample_size and self.sample_size < self.num_questions:
+            return self.sample_size
+        return self.num_questions
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -53,6 +158,45 @@ class Question(db.Model):
     option_d = db.Column(db.String(500), nullable=False)
     correct_answer = db.Column(db.String(1), nullable=False)  # 'A', 'B', 'C', or 'D'
     order = db.Column(db.Integer, nullable=False)
+    bank_question_id = db.Column(db.Integer, db.ForeignKey('bank_question.id'), index=True)  # set for bank questions, whose text columns here stay empty
+    
+    __table_args__ = (
+        db.Index('ix_question_quiz_order', 'quiz_id', 'order'),
+    )
+
+# Question bank: questions kept independently of any quiz. A quiz uses one
+# through a Question row with bank_question_id set (the membership row, which
+# carries the order), so assembling a quiz never copies question text.
+bank_question_tag = db.Table(
+    'bank_question_tag',
+    db.Column('bank_question_id', db.Integer, db.ForeignKey('bank_question.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('bank_tag.id'), primary_key=True),
+    # Tag filters look up questions by tag
+    db.Index('ix_bank_question_tag_tag', 'tag_id', 'bank_question_id')
+)
+
+class BankQuestion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    question_text = db.Column(db.Text, nullable=False)
+    option_a = db.Column(db.String(500), nullable=False)
+    option_b = db.Column(db.String(500), nullable=False)
+    option_c = db.Column(db.String(500), nullable=False)
+    option_d = db.Column(db.String(500), nullable=False)
+    correct_answer = db.Column(db.String(1), nullable=False)
+    difficulty = db.Column(db.String(20), index=True)  # 'easy', 'medium', 'hard' or None
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    tags = db.relationship('BankTag', secondary=bank_question_tag, lazy=True)
+
+class BankTag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
+QUESTION_CONTENT_FIELDS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer')
+# A quiz question's content: its bank question's if it has one, otherwise its own.
+# Select these with .outerjoin(BankQuestion, BankQuestion.id == Question.bank_question_id)
+QUESTION_CONTENT = [func.coalesce(getattr(BankQuestion, name), getattr(Question, name)).label(name)
+                    for name in QUESTION_CONTENT_FIELDS]
 
 class Attempt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -63,7 +207,18 @@ class Attempt(db.Model):
     current_question = db.Column(db.Integer, default=0)
     is_completed = db.Column(db.Boolean, default=False)
     score = db.Column(db.Integer, default=0)
+    shuffle_seed = db.Column(db.Integer)  # None: questions and options in stored order
+    # When time runs out: the whole quiz's, or the current question's in per_question
+    # mode. Cleared on completion, so the index only holds open attempts.
+    deadline = db.Column(db.DateTime)
     answers = db.relationship('Answer', backref='attempt', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        # Covers quiz_results: completed attempts of a quiz, newest first
+        db.Index('ix_attempt_quiz_completed_end', 'quiz_id', 'is_completed', 'end_time'),
+        # The expiry sweep: open attempts past their deadline, oldest first
+        db.Index('ix_attempt_deadline', 'deadline'),
+    )
 
 class Answer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -72,13 +227,552 @@ class Answer(db.Model):
     selected_answer = db.Column(db.String(1), nullable=False)
     is_correct = db.Column(db.Boolean, default=False)
     answered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # One answer per question per attempt; also serves lookups by attempt_id
+        db.Index('uq_answer_attempt_question', 'attempt_id', 'question_id', unique=True),
+    )
+
+# Results summary tables, maintained incrementally by the answer path so
+# dashboards read O(questions) rows however many students took the quiz
+class QuizStats(db.Model):
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)  # completed attempts
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+
+class QuizScoreBucket(db.Model):
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    score = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class QuestionStats(db.Model):
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
+    answered = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+    option_a_count = db.Column(db.Integer, nullable=False, default=0)
+    option_b_count = db.Column(db.Integer, nullable=False, default=0)
+    option_c_count = db.Column(db.Integer, nullable=False, default=0)
+    option_d_count = db.Column(db.Integer, nullable=False, default=0)
+
+OPTION_COUNT_COLUMNS = {'A': 'option_a_count', 'B': 'option_b_count', 'C': 'option_c_count', 'D': 'option_d_count'}
+QUESTION_COUNTERS = ['answered', 'correct'] + list(OPTION_COUNT_COLUMNS.values())
+
+# Near-duplicate detection fingerprint of Question.question_text (see question_dedup),
+# computed once per question so each process can load its index without rehashing
+class QuestionFingerprint(db.Model):
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
+    text_hash = db.Column(db.BigInteger, nullable=False)
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+# Quizzes whose questions were deleted, in order, so every process can drop
+# them from its duplicate index. Ids are never reused, unlike question ids
+class QuestionRemoval(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class GenerationJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # 'queued', 'running', 'completed' or 'failed'
+    topic = db.Column(db.String(200), nullable=False)
+    difficulty = db.Column(db.String(20), nullable=False)
+    num_questions = db.Column(db.Integer, nullable=False)
+    quiz_title = db.Column(db.String(200), nullable=False)
+    duration_mode = db.Column(db.String(20), nullable=False)
+    duration_seconds = db.Column(db.Integer, nullable=False)
+    progress = db.Column(db.Integer, nullable=False, default=0)  # questions generated so far
+    questions_json = db.Column(db.Text)  # the questions generated so far, as a JSON array
+    used_fallback = db.Column(db.Boolean, default=False)
+    error = db.Column(db.Text)
+    claim_token = db.Column(db.String(32))  # identifies the run that currently owns the job
+    quiz_id = db.Column(db.Integer)  # not a foreign key: the quiz may be deleted later
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # heartbeat while running
+
+# One row, bumped in the same transaction as any change to a quiz; the quiz
+# list's ETag and Last-Modified, and the key of its cached pages
+class CatalogVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# Quiz content is immutable while students take it, so student routes read
+# compiled snapshots instead of querying Quiz/Question on every request.
+# Admin routes that change a quiz must call quiz_cache.invalidate().
+quiz_cache = _service('quiz_cache')
+
+def load_quiz_snapshot(quiz_id, version):
+    quiz = db.session.get(Quiz, quiz_id)
+    if not quiz:
+        return None
+    
+    rows = db.session.execute(
+        db.select(Question.id, *QUESTION_CONTENT, Question.order)
+        .outerjoin(BankQuestion, BankQuestion.id == Question.bank_question_id)
+        .filter(Question.quiz_id == quiz_id)
+        .order_by(Question.order))
+    questions = tuple(QuestionView(*row) for row in rows)
+    return QuizSnapshot(
+        id=quiz.id,
+        title=quiz.title,
+        num_questions=quiz.num_questions,
+        duration_mode=quiz.duration_mode,
+        duration_seconds=quiz.duration_seconds,
+        created_at=quiz.created_at,
+        questions=questions,
+        answer_key={q.id: q.correct_answer for q in questions},
+        version=version,
+        shuffle_questions=bool(quiz.shuffle_questions),
+        shuffle_options=bool(quiz.shuffle_options),
+        sample_size=quiz.sample_size
+    )
+
+def get_quiz_snapshot(quiz_id):
+    return quiz_cache.get(quiz_id, load_quiz_snapshot)
+
+# The quiz list is served from rendered pages cached per catalog version, and
+# repeat visits get a 304; the version is re-read at most every
+# CATALOG_VERSION_TTL_SECONDS, so neither touches the database
+catalog_cache = _service('catalog_cache')
+CATALOG_ROW_ID = 1
+_catalog_boot_time = datetime.utcnow().replace(microsecond=0)  # templates may have changed since the last version
+
+def bump_catalog_version(session=None):
+    """Record a change to the quiz catalog in the session's current transaction."""
+    session = session or db.session
+    table = CatalogVersion.__table__
+    connection = session.connection()
+    now = datetime.utcnow()
+    updated = connection.execute(table.update().where(table.c.id == CATALOG_ROW_ID)
+                                 .values(version=table.c.version + 1, updated_at=now)).rowcount
+    if not updated:
+        connection.execute(insert_ignoring_duplicates(table).values(id=CATALOG_ROW_ID, version=1, updated_at=now))
+    session.info['catalog_changed'] = True
+
+@event.listens_for(db.session, 'after_flush')
+def bump_catalog_on_quiz_change(session, flush_context):
+    # ORM changes to quizzes; Core statements on the quiz table call bump_catalog_version() themselves
+    if any(isinstance(obj, Quiz) for obj in itertools.chain(session.new, session.dirty, session.deleted)):
+        bump_catalog_version(session)
+
+@event.listens_for(db.session, 'after_commit')
+def refresh_catalog_after_commit(session):
+    if session.info.pop('catalog_changed', False) and catalog_cache:
+        catalog_cache.refresh()
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_catalog_change(session):
+    session.info.pop('catalog_changed', None)
+
+def load_catalog_state():
+    row = db.session.execute(db.select(CatalogVersion.version, CatalogVersion.updated_at)
+                             .filter_by(id=CATALOG_ROW_ID)).first()
+    return CatalogState(*row) if row else CatalogState(0, None)
+
+def quiz_cursor(quiz):
+    """Opaque position of quiz in the newest-first catalog, for ?after="""
+    return f'{quiz.created_at:%Y%m%d%H%M%S%f}-{quiz.id}'
+
+def parse_quiz_cursor(cursor):
+    """(created_at, id) from quiz_cursor(); raises ValueError for anything else."""
+    created_at, _, quiz_id = cursor.partition('-')
+    return datetime.strptime(created_at, '%Y%m%d%H%M%S%f'), int(quiz_id)
+
+def quiz_page(after=None, limit=None):
+    """Quizzes newest first, after the (created_at, id) position; returns them and the next page's cursor."""
+    query = Quiz.query.order_by(Quiz.created_at.desc(), Quiz.id.desc())
+    if after:
+        query = query.filter(db.tuple_(Quiz.created_at, Quiz.id) < after)
+    if not limit:
+        return query.all(), None
+    quizzes = query.limit(limit + 1).all()
+    next_cursor = quiz_cursor(quizzes[limit - 1]) if len(quizzes) > limit else None
+    return quizzes[:limit], next_cursor
+
+def catalog_stats():
+    """Totals over the whole catalog for the quiz list, in one query."""
+    stats = {'quizzes': 0, 'questions': 0, 'per_question': 0, 'overall': 0}
+    for duration_mode, quizzes, questions in db.session.query(
+            Quiz.duration_mode, func.count(Quiz.id), func.coalesce(func.sum(Quiz.num_questions), 0)
+    ).group_by(Quiz.duration_mode):
+        stats['quizzes'] += quizzes
+        stats['questions'] += questions
+        if duration_mode in ('per_question', 'overall'):
+            stats[duration_mode] = quizzes
+    return stats
+
+def render_quiz_list(after):
+    quizzes, next_cursor = quiz_page(after, current_app.config['CATALOG_PAGE_SIZE'])
+    return Markup(render_template('student/quiz_list.html', quizzes=quizzes, next_cursor=next_cursor,
+                                  first_page=after is None, stats=catalog_stats()))
+
+# Near-duplicate index over every stored question, built lazily per app
+# and caught up with questions added and removed since (by any process)
+# before each use
+_question_index_lock = threading.Lock()
+
+def load_question_fingerprints(index, after_id=0, question_ids=None):
+    """Yield (question_id, quiz_id, text_hash, signature) for questions with id > after_id.
+
+    question_ids, if given, limits the rows to those questions.
+    Questions without a stored fingerprint are fingerprinted and the rows
+    are added to the session once the generator is exhausted.
+    """
+    rows = (db.select(Question.id, Question.quiz_id, QUESTION_CONTENT[0],
+                      QuestionFingerprint.text_hash, QuestionFingerprint.signature)
+            .outerjoin(BankQuestion, BankQuestion.id == Question.bank_question_id)
+            .outerjoin(QuestionFingerprint, QuestionFingerprint.question_id == Question.id)
+            .filter(Question.id > after_id)
+            .order_by(Question.id)
+            .execution_options(yield_per=5000))
+    if question_ids is not None:
+        rows = rows.filter(Question.id.in_(question_ids))
+    missing = []
+    for question_id, quiz_id, text, text_hash, signature in db.session.execute(rows):
+        if signature is None:
+            text_hash, signature = index.fingerprint(text)
+            missing.append({'question_id': question_id, 'quiz_id': quiz_id,
+                            'text_hash': text_hash, 'signature': pack_signature(signature)})
+        else:
+            signature = unpack_signature(signature)
+        yield question_id, quiz_id, text_hash, signature
+    
+    for start in range(0, len(missing), 1000):
+        db.session.execute(insert_ignoring_duplicates(QuestionFingerprint), missing[start:start + 1000])
+
+def get_question_index():
+    services = _services()
+    with _question_index_lock:
+        index = services['question_index']
+        if index is None:
+            # Read first: a removal logged during the build is applied again next time, harmlessly
+            services['question_removal_id'] = db.session.query(func.max(QuestionRemoval.id)).scalar() or 0
+            index = QuestionIndex(threshold=current_app.config['DEDUP_THRESHOLD'])
+            index.build(load_question_fingerprints(index))
+            services['question_index'] = index
+        else:
+            removals = db.session.execute(
+                db.select(QuestionRemoval.id, QuestionRemoval.quiz_id)
+                .filter(QuestionRemoval.id > services['question_removal_id'])
+                .order_by(QuestionRemoval.id)).all()
+            freed = []
+            for removal_id, quiz_id in removals:
+                freed += index.remove_quiz(quiz_id)
+                services['question_removal_id'] = removal_id
+            for row in load_question_fingerprints(index, index.max_id):
+                index.add(*row)
+            # SQLite hands the ids of deleted questions to the next ones inserted,
+            # which the max_id catch-up never reaches
+            for start in range(0, len(freed), 1000):
+                for row in load_question_fingerprints(index, question_ids=freed[start:start + 1000]):
+                    index.add(*row)
+        db.session.commit()
+    return index
+
+def forget_quiz_fingerprints(quiz_id):
+    """Delete a quiz's fingerprint rows and log the removal; call before deleting its questions.
+
+    Every process's index drops the quiz's questions, and picks up any that
+    replace them, the next time it is used.
+    """
+    QuestionFingerprint.query.filter_by(quiz_id=quiz_id).delete()
+    db.session.add(QuestionRemoval(quiz_id=quiz_id))
+
+def find_duplicate_questions(texts, exclude_quiz_id=None):
+    """For each text, the stored questions it nearly duplicates and the earlier texts of the batch it repeats.
+
+    Stored matches are {'question_id', 'quiz_id', 'similarity'}; matches
+    within the batch are {'position', 'similarity'}.
+    """
+    index = get_question_index()
+    batch = QuestionIndex(threshold=index.threshold)
+    found = []
+    for position, text in enumerate(texts):
+        fingerprint = index.fingerprint(text)
+        matches = [match._asdict() for match in index.find_fingerprint(*fingerprint, exclude_quiz_id=exclude_quiz_id)]
+        matches += [{'position': match.question_id, 'similarity': match.similarity}
+                    for match in batch.find_fingerprint(*fingerprint)]
+        batch.add(position, 0, *fingerprint)
+        found.append(matches)
+    
+    # Another process may have deleted a matched question since this index saw it
+    matched_ids = {match['question_id'] for matches in found for match in matches if 'question_id' in match}
+    if matched_ids:
+        live = {question_id for question_id, in db.session.query(Question.id).filter(Question.id.in_(matched_ids))}
+        found = [[match for match in matches if match.get('question_id', -1) in live or 'position' in match]
+                 for matches in found]
+    return found
+
+def describe_duplicates(found):
+    messages = []
+    for position, matches in enumerate(found):
+        if not matches:
+            continue
+        match = matches[0]
+        if 'position' in match:
+            messages.append(f"Question {position + 1} repeats question {match['position'] + 1}")
+        else:
+            messages.append(f"Question {position + 1} is {match['similarity']:.0%} similar to "
+                            f"question #{match['question_id']} (quiz #{match['quiz_id']})")
+    return messages
+
+def increment_counters(model, keys, counters, rows):
+    """Add each row's counter values to the matching summary row, creating it if missing.
+
+    Runs as one INSERT ... ON CONFLICT DO UPDATE statement on SQLite and
+    Postgres, so concurrent writers never lose an increment.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    if db.engine.dialect.name in ('sqlite', 'postgresql'):
+        stmt = upsert_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={column: table.c[column] + stmt.excluded[column] for column in counters}
+        )
+        db.session.execute(stmt, rows)
+        return
+    
+    for row in rows:
+        result = db.session.execute(
+            table.update()
+            .where(*[table.c[key] == row[key] for key in keys])
+            .values({column: table.c[column] + row[column] for column in counters})
+        )
+        if not result.rowcount:
+            db.session.execute(table.insert().values(row))
+
+def update_results_stats(quiz_id, answers=(), completed_scores=()):
+    """Fold newly stored answers and newly completed attempts into the summary tables.
+
+    answers holds (question_id, selected_answer, is_correct) tuples and
+    completed_scores the final scores of attempts that just completed. Must
+    run in the same transaction that stores them.
+    """
+    question_rows = {}
+    for question_id, selected_answer, is_correct in answers:
+        row = question_rows.get(question_id)
+        if row is None:
+            row = question_rows[question_id] = dict({column: 0 for column in QUESTION_COUNTERS},
+                                                    question_id=question_id, quiz_id=quiz_id)
+        row['answered'] += 1
+        row['correct'] += int(bool(is_correct))
+        if selected_answer in OPTION_COUNT_COLUMNS:
+            row[OPTION_COUNT_COLUMNS[selected_answer]] += 1
+    increment_counters(QuestionStats, ['question_id'], QUESTION_COUNTERS, list(question_rows.values()))
+    
+    if completed_scores:
+        increment_counters(QuizStats, ['quiz_id'], ['attempt_count', 'score_sum'], [{
+            'quiz_id': quiz_id,
+            'attempt_count': len(completed_scores),
+            'score_sum': sum(completed_scores)
+        }])
+        increment_counters(QuizScoreBucket, ['quiz_id', 'score'], ['count'], [
+            {'quiz_id': quiz_id, 'score': score, 'count': count}
+            for score, count in sorted(Counter(completed_scores).items())
+        ])
+
+def compute_results_stats(quiz_id):
+    """A quiz's summary rows recomputed from Attempt and Answer."""
+    completed = db.and_(Attempt.quiz_id == quiz_id, Attempt.is_completed == True)
+    attempt_count, score_sum = (db.session.query(func.count(Attempt.id), func.coalesce(func.sum(Attempt.score), 0))
+                                .filter(completed).one())
+    buckets = dict(db.session.query(Attempt.score, func.count(Attempt.id))
+                   .filter(completed).group_by(Attempt.score))
+    
+    questions = {}
+    for question_id, selected_answer, is_correct, count in (
+            db.session.query(Answer.question_id, Answer.selected_answer, Answer.is_correct, func.count(Answer.id))
+            .join(Question, Answer.question_id == Question.id)
+            .filter(Question.quiz_id == quiz_id)
+            .group_by(Answer.question_id, Answer.selected_answer, Answer.is_correct)):
+        row = questions.setdefault(question_id, {column: 0 for column in QUESTION_COUNTERS})
+        row['answered'] += count
+        if is_correct:
+            row['correct'] += count
+        if selected_answer in OPTION_COUNT_COLUMNS:
+            row[OPTION_COUNT_COLUMNS[selected_answer]] += count
+    
+    return {
+        'quiz': {'attempt_count': attempt_count, 'score_sum': score_sum},
+        'buckets': buckets,
+        'questions': questions
+    }
+
+def read_results_stats(quiz_id):
+    """A quiz's summary rows as stored, in the shape compute_results_stats returns."""
+    quiz_stats = db.session.get(QuizStats, quiz_id)
+    return {
+        'quiz': {
+            'attempt_count': quiz_stats.attempt_count if quiz_stats else 0,
+            'score_sum': quiz_stats.score_sum if quiz_stats else 0
+        },
+        'buckets': {bucket.score: bucket.count
+                    for bucket in QuizScoreBucket.query.filter_by(quiz_id=quiz_id) if bucket.count},
+        'questions': {stats.question_id: {column: getattr(stats, column) for column in QUESTION_COUNTERS}
+                      for stats in QuestionStats.query.filter_by(quiz_id=quiz_id) if stats.answered}
+    }
+
+def delete_results_stats(quiz_id):
+    QuestionStats.query.filter_by(quiz_id=quiz_id).delete()
+    QuizScoreBucket.query.filter_by(quiz_id=quiz_id).delete()
+    QuizStats.query.filter_by(quiz_id=quiz_id).delete()
+
+def rebuild_results_stats(quiz_id):
+    """Replace a quiz's summary rows with values recomputed from Attempt and Answer."""
+    stats = compute_results_stats(quiz_id)
+    delete_results_stats(quiz_id)
+    db.session.add(QuizStats(quiz_id=quiz_id, **stats['quiz']))
+    db.session.add_all(QuizScoreBucket(quiz_id=quiz_id, score=score, count=count)
+                       for score, count in stats['buckets'].items())
+    db.session.add_all(QuestionStats(question_id=question_id, quiz_id=quiz_id, **counters)
+                       for question_id, counters in stats['questions'].items())
+    return stats
+
+# Write-behind mode: answers are acknowledged from memory and written to the
+# database in batches by a background thread. Single-process deployments only.
+answer_buffer = _service('answer_buffer')
+
+def load_attempt_state(attempt_id):
+    attempt = db.session.get(Attempt, attempt_id)
+    if not attempt:
+        return None
+    
+    answered = {question_id for question_id, in
+                db.session.query(Answer.question_id).filter_by(attempt_id=attempt_id)}
+    return AttemptState(attempt.id, attempt.quiz_id, attempt.current_question, attempt.score,
+                        attempt.is_completed, attempt.end_time, answered, attempt.shuffle_seed, attempt.deadline)
+
+def get_active_attempt(attempt_id):
+    """The attempt as the answer path sees it: buffered state in write-behind mode, else the row."""
+    if answer_buffer:
+        return answer_buffer.get_state(attempt_id, load_attempt_state)
+    return db.session.get(Attempt, attempt_id)
+
+def attempt_lock(attempt):
+    return attempt.lock if answer_buffer else nullcontext()
+
+def upsert_insert(table):
+    """The SQLite or Postgres INSERT construct, which supports ON CONFLICT."""
+    # Imported here so a process only loads the dialect its engine uses
+    if db.engine.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
+
+def insert_ignoring_duplicates(model):
+    """INSERT that skips rows violating a unique index, for idempotent bulk writes."""
+    table = getattr(model, '__table__', model)
+    if db.engine.dialect.name in ('sqlite', 'postgresql'):
+        return upsert_insert(table).on_conflict_do_nothing()
+    return db.insert(table).prefix_with('IGNORE')
+
+def flush_buffered_answers(app, entries):
+    """Group commit: write a batch of buffered answers and the latest state of their attempts.
+
+    Entries may be replayed after a crash, so answers that are already
+    stored and attempts that are already completed are not counted again
+    in the results summary tables.
+    """
+    latest = {}
+    for entry in entries:
+        latest[entry['attempt_id']] = entry
+    
+    with app.app_context():
+        stored = set(db.session.query(Answer.attempt_id, Answer.question_id)
+                     .filter(Answer.attempt_id.in_(list(latest))))
+        new_answers = []
+        for entry in entries:
+            key = (entry['attempt_id'], entry['question_id'])
+            if key not in stored:
+                stored.add(key)
+                new_answers.append(entry)
+        
+        if new_answers:
+            db.session.execute(insert_ignoring_duplicates(Answer), [{
+                'attempt_id': entry['attempt_id'],
+                'question_id': entry['question_id'],
+                'selected_answer': entry['selected_answer'],
+                'is_correct': entry['is_correct'],
+                'answered_at': entry['answered_at']
+            } for entry in new_answers])
+        db.session.execute(db.update(Attempt), [{
+            'id': entry['attempt_id'],
+            'current_question': entry['current_question'],
+            'score': entry['score'],
+            'deadline': None if entry['is_completed'] else entry.get('deadline')
+        } for entry in latest.values()])
+        
+        completed_scores = {}
+        for entry in latest.values():
+            if not entry['is_completed']:
+                continue
+            result = db.session.execute(
+                db.update(Attempt)
+                .where(Attempt.id == entry['attempt_id'], Attempt.is_completed == False)
+                .values(is_completed=True, end_time=entry['end_time'])
+            )
+            if result.rowcount:
+                completed_scores.setdefault(entry['quiz_id'], []).append(entry['score'])
+        
+        answers_by_quiz = {}
+        for entry in new_answers:
+            answers_by_quiz.setdefault(entry['quiz_id'], []).append(
+                (entry['question_id'], entry['selected_answer'], entry['is_correct']))
+        for quiz_id in set(answers_by_quiz) | set(completed_scores):
+            update_results_stats(quiz_id, answers_by_quiz.get(quiz_id, ()), completed_scores.get(quiz_id, ()))
+        db.session.commit()
+
+# Admin pages are refreshed constantly during exams; the user behind a
+# session is cached briefly instead of loaded from the user table each time
+user_cache = _service('user_cache')
+
+def load_user_identity(user_id):
+    row = db.session.execute(
+        db.select(User.id, User.email, User.is_admin, User.password_hash).filter_by(id=user_id)).first()
+    if row is None:
+        return None
+    return CachedUser(row.id, row.email, bool(row.is_admin), password_fingerprint(row.password_hash))
+
+@event.listens_for(db.session, 'after_flush')
+def note_user_changes(session, flush_context):
+    # Cached copies are dropped after the commit, so a load in between cannot keep the old row
+    changed = {obj.id for obj in itertools.chain(session.dirty, session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault('changed_users', set()).update(changed)
+
+@event.listens_for(db.session, 'after_commit')
+def evict_changed_users(session):
+    for user_id in session.info.pop('changed_users', ()):
+        if user_cache:
+            user_cache.invalidate(user_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_user_changes(session):
+    session.info.pop('changed_users', None)
 
 @login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+def load_user(session_id):
+    user_id, _, fingerprint = session_id.partition(':')
+    if not user_id.isdigit() or not fingerprint:
+        return None  # sessions from before fingerprints log in again
+    user = user_cache.get(int(user_id), load_user_identity)
+    if user is not None and user.fingerprint != fingerprint:
+        # Possibly a password changed by another process; check the row before refusing
+        user_cache.invalidate(user.id)
+        user = user_cache.get(user.id, load_user_identity)
+    if user is None or not hmac.compare_digest(user.fingerprint, fingerprint):
+        return None
+    return user
 
 # Admin Routes
-@app.route('/admin/login', methods=['GET', 'POST'])
+@route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         email = request.form['email']
@@ -86,6 +780,10 @@ def admin_login():
         user = User.query.filter_by(email=email, is_admin=True).first()
         
         if user and user.check_password(password):
+            if user.needs_rehash():
+                # Moves the account to the configured hash parameters; ends its other sessions
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
             return redirect(url_for('admin_dashboard'))
         else:
@@ -93,19 +791,37 @@ def admin_login():
     
     return render_template('admin/login.html')
 
-@app.route('/admin/logout')
+@route('/admin/logout')
 @login_required
 def admin_logout():
+    user_cache.invalidate(current_user.id)
     logout_user()
     return redirect(url_for('admin_login'))
 
-@app.route('/admin/dashboard')
+@route('/admin/dashboard')
 @login_required
 def admin_dashboard():
-    quizzes = Quiz.query.order_by(Quiz.created_at.desc()).all()
-    return render_template('admin/dashboard.html', quizzes=quizzes)
+    # Every quiz unless ?limit= asks for a page; ?after= continues from next_cursor
+    try:
+        after = parse_quiz_cursor(request.args['after']) if request.args.get('after') else None
+    except ValueError:
+        abort(400)
+    quizzes, next_cursor = quiz_page(after, request.args.get('limit', type=int))
+    return render_template('admin/dashboard.html', quizzes=quizzes, next_cursor=next_cursor)
+
+def quiz_randomization(data):
+    """shuffle_questions, shuffle_options and sample_size for a Quiz, from a form or a JSON body."""
+    try:
+        sample_size = int(data.get('sample_size') or 0)
+    except (TypeError, ValueError):
+        sample_size = 0
+    return {
+        'shuffle_questions': data.get('shuffle_questions') in (True, 'on', 'true', '1'),
+        'shuffle_options': data.get('shuffle_options') in (True, 'on', 'true', '1'),
+        'sample_size': sample_size if sample_size > 0 else None
+    }
 
-@app.route('/admin/create-quiz', methods=['GET', 'POST'])
+@route('/admin/create-quiz', methods=['GET', 'POST'])
 @login_required
 def create_quiz():
     if request.method == 'POST':
@@ -121,7 +837,8 @@ def create_quiz():
             title=title,
             num_questions=num_questions,
             duration_mode=duration_mode,
-            duration_seconds=duration_seconds
+            duration_seconds=duration_seconds,
+            **quiz_randomization(request.form)
         )
         db.session.add(quiz)
         db.session.commit()
@@ -130,13 +847,25 @@ def create_quiz():
     
     return render_template('admin/create_quiz.html')
 
-@app.route('/admin/add-questions/<int:quiz_id>', methods=['GET', 'POST'])
+@route('/admin/add-questions/<int:quiz_id>', methods=['GET', 'POST'])
 @login_required
 def add_questions(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
     
     if request.method == 'POST':
-        # Clear existing questions
+        duplicates = []
+        if current_app.config['DEDUP_POLICY'] != 'off':
+            texts = [request.form[f'question_{i+1}'] for i in range(quiz.num_questions)]
+            duplicates = describe_duplicates(find_duplicate_questions(texts, exclude_quiz_id=quiz_id))
+            if duplicates and current_app.config['DEDUP_POLICY'] == 'reject':
+                flash('Duplicate questions: ' + '; '.join(duplicates), 'error')
+                return render_template('admin/add_questions.html', quiz=quiz)
+        
+        # Clear existing questions, and the answers to them, whose ids new questions may reuse
+        QuestionStats.query.filter_by(quiz_id=quiz_id).delete()
+        forget_quiz_fingerprints(quiz_id)
+        Answer.query.filter(Answer.question_id.in_(db.session.query(Question.id).filter_by(quiz_id=quiz_id))
+                            ).delete(synchronize_session=False)
         Question.query.filter_by(quiz_id=quiz_id).delete()
         
         for i in range(quiz.num_questions):
@@ -160,38 +889,356 @@ def add_questions(quiz_id):
             db.session.add(question)
         
         db.session.commit()
+        quiz_cache.invalidate(quiz_id)
         flash('Quiz created successfully!', 'success')
+        if duplicates:
+            flash('Possible duplicate questions: ' + '; '.join(duplicates), 'warning')
         return redirect(url_for('admin_dashboard'))
     
     return render_template('admin/add_questions.html', quiz=quiz)
 
-@app.route('/admin/delete-quiz/<int:quiz_id>')
+@route('/admin/delete-quiz/<int:quiz_id>')
 @login_required
 def delete_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
+    delete_results_stats(quiz_id)
+    forget_quiz_fingerprints(quiz_id)
     db.session.delete(quiz)
     db.session.commit()
+    quiz_cache.invalidate(quiz_id)
     flash('Quiz deleted successfully!', 'success')
     return redirect(url_for('admin_dashboard'))
 
-@app.route('/admin/quiz-results/<int:quiz_id>')
+@route('/admin/quiz-results/<int:quiz_id>')
 @login_required
 def quiz_results(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
-    attempts = Attempt.query.filter_by(quiz_id=quiz_id, is_completed=True).order_by(Attempt.end_time.desc()).all()
-    return render_template('admin/quiz_results.html', quiz=quiz, attempts=attempts)
+    pagination = paginate_attempts(quiz_id)
+    stats = compute_quiz_analytics(quiz_id)
+    return render_template('admin/quiz_results.html', quiz=quiz, attempts=pagination.items,
+                           pagination=pagination, stats=stats)
+
+@route('/admin/quiz-results/<int:quiz_id>/analytics')
+@login_required
+def quiz_analytics(quiz_id):
+    Quiz.query.get_or_404(quiz_id)
+    pagination = paginate_attempts(quiz_id)
+    analytics = compute_quiz_analytics(quiz_id)
+    analytics['attempts'] = {
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'items': [{
+            'id': attempt.id,
+            'student_name': attempt.student_name,
+            'score': attempt.score,
+            'start_time': attempt.start_time.isoformat() if attempt.start_time else None,
+            'end_time': attempt.end_time.isoformat() if attempt.end_time else None
+        } for attempt in pagination.items]
+    }
+    return jsonify(analytics)
+
+EXPORT_COLUMNS = ['attempt_id', 'student_name', 'start_time', 'end_time', 'is_completed', 'score',
+                  'question_id', 'selected_answer', 'is_correct', 'answered_at']
+
+@route('/admin/quiz-results/<int:quiz_id>/export')
+@login_required
+def export_quiz_results(quiz_id):
+    """Stream every attempt and answer of a quiz as CSV or NDJSON (?format=csv|ndjson).
+
+    One row per answer; attempts without answers get one row with empty
+    answer columns. Rows are read in chunks from a server-side cursor and
+    written as they arrive, so memory use does not grow with the quiz.
+    """
+    quiz = Quiz.query.get_or_404(quiz_id)
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    
+    stmt = (db.select(Attempt.id, Attempt.student_name, Attempt.start_time, Attempt.end_time,
+                      Attempt.is_completed, Attempt.score, Answer.question_id, Answer.selected_answer,
+                      Answer.is_correct, Answer.answered_at)
+            .outerjoin(Answer, Answer.attempt_id == Attempt.id)
+            .where(Attempt.quiz_id == quiz_id)
+            .order_by(Attempt.id, Answer.id)
+            .execution_options(yield_per=1000, stream_results=True))
+    
+    def rows():
+        for row in db.session.execute(stmt):
+            yield [value.isoformat() if isinstance(value, datetime) else value for value in row]
+    
+    if export_format == 'csv':
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            for count, row in enumerate(rows(), 1):
+                writer.writerow(row)
+                if count % 500 == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        mimetype, extension = 'text/csv', 'csv'
+    else:
+        def generate():
+            lines = []
+            for row in rows():
+                lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n')
+                if len(lines) == 500:
+                    yield ''.join(lines)
+                    lines = []
+            yield ''.join(lines)
+        mimetype, extension = 'application/x-ndjson', 'ndjson'
+    
+    filename = f'quiz_{quiz.id}_results.{extension}'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+def paginate_attempts(quiz_id):
+    """One page of completed attempts, newest first (?page=&per_page=)."""
+    return (Attempt.query.filter_by(quiz_id=quiz_id, is_completed=True)
+            .order_by(Attempt.end_time.desc())
+            .paginate(page=request.args.get('page', 1, type=int),
+                      per_page=request.args.get('per_page', 50, type=int),
+                      max_per_page=500, error_out=False))
+
+def epoch_seconds(column):
+    """SQL expression for a timestamp column as seconds since the epoch."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return func.julianday(column) * 86400.0
+    if dialect == 'postgresql':
+        return func.extract('epoch', column)
+    return func.unix_timestamp(column)
+
+def median_from_counts(counts):
+    """Median of a distribution given as sorted (value, count) pairs."""
+    total = sum(count for _, count in counts)
+    if not total:
+        return None
+    lower, upper = (total - 1) // 2, total // 2
+    seen, low_value = 0, None
+    for value, count in counts:
+        if low_value is None and seen + count > lower:
+            low_value = value
+        if seen + count > upper:
+            return (low_value + value) / 2
+        seen += count
+
+def compute_quiz_analytics(quiz_id):
+    """Results statistics for a quiz.
+
+    Score figures cover completed attempts; per-question counts cover every
+    stored answer. Both come from the summary tables, so cost is
+    O(questions) rows however many attempts the quiz has. Answer times are
+    computed with grouped SQL over the completed attempts.
+    """
+    completed = db.and_(Attempt.quiz_id == quiz_id, Attempt.is_completed == True)
+    
+    # Score distribution; count, mean and median all come from it
+    distribution = (db.session.query(QuizScoreBucket.score, QuizScoreBucket.count)
+                    .filter(QuizScoreBucket.quiz_id == quiz_id, QuizScoreBucket.count > 0)
+                    .order_by(QuizScoreBucket.score)
+                    .all())
+    attempt_count = sum(count for _, count in distribution)
+    score_total = sum(score * count for score, count in distribution)
+    
+    # Time spent on each answer: since the previous answer, or since the
+    # attempt started for the first one. Bucketed to whole seconds so the
+    # median is found from counts instead of shipping every duration.
+    answered = epoch_seconds(Answer.answered_at)
+    previous = func.coalesce(
+        func.lag(answered).over(partition_by=Answer.attempt_id, order_by=Answer.answered_at),
+        epoch_seconds(Attempt.start_time)
+    )
+    durations = (db.session.query(Answer.question_id.label('question_id'), (answered - previous).label('seconds'))
+                 .join(Attempt, Answer.attempt_id == Attempt.id)
+                 .filter(completed)
+                 .subquery())
+    second = db.cast(func.round(durations.c.seconds), db.Integer)
+    timing = (db.session.query(durations.c.question_id, second, func.count())
+              .group_by(durations.c.question_id, second)
+              .order_by(durations.c.question_id, second)
+              .all())
+    
+    questions = {}
+    snapshot = get_quiz_snapshot(quiz_id)
+    for question in (snapshot.questions if snapshot else ()):
+        questions[question.id] = {
+            'question_id': question.id,
+            'order': question.order,
+            'question_text': question.question_text,
+            'correct_answer': question.correct_answer,
+            'answered': 0,
+            'correct': 0,
+            'options': {'A': 0, 'B': 0, 'C': 0, 'D': 0},
+            'median_answer_seconds': None
+        }
+    
+    for row in QuestionStats.query.filter_by(quiz_id=quiz_id):
+        stats = questions.get(row.question_id)
+        if stats is None:
+            continue
+        stats['answered'] = row.answered
+        stats['correct'] = row.correct
+        stats['options'] = {option: getattr(row, column) for option, column in OPTION_COUNT_COLUMNS.items()}
+    
+    timings = {}
+    for question_id, seconds, count in timing:
+        timings.setdefault(question_id, []).append((seconds, count))
+    for question_id, counts in timings.items():
+        if question_id in questions:
+            questions[question_id]['median_answer_seconds'] = median_from_counts(counts)
+    
+    for stats in questions.values():
+        stats['correct_rate'] = stats['correct'] / stats['answered'] if stats['answered'] else None
+    
+    return {
+        'quiz_id': quiz_id,
+        'attempt_count': attempt_count,
+        'mean_score': score_total / attempt_count if attempt_count else None,
+        'median_score': median_from_counts(distribution),
+        'score_distribution': [{'score': score, 'count': count} for score, count in distribution],
+        'questions': sorted(questions.values(), key=lambda stats: stats['order'])
+    }
+
+# Live exam monitoring: the answer path publishes each change once, after it
+# is committed, and every admin watching the quiz gets it without a query
+live_events = _service('live_events')
+LIVE_SNAPSHOT_LIMIT = 500  # open attempts listed when a monitor connects
+LIVE_RETRY_MS = 3000
+
+def attempt_progress_event(attempt, expired=False):
+    """live_events.publish() arguments for an attempt's progress.
+
+    Built while the attempt is locked and published after the commit, so the
+    attempt is never reloaded. Events for one attempt share a coalesce key,
+    so a monitor that falls behind only gets the latest.
+    """
+    data = {'attempt_id': attempt.id, 'current_question': attempt.current_question, 'score': attempt.score}
+    if attempt.is_completed:
+        data['end_time'] = attempt.end_time.isoformat() if attempt.end_time else None
+        data['expired'] = expired
+    kind = 'attempt_completed' if attempt.is_completed else 'answer_submitted'
+    return attempt.quiz_id, kind, data, f'attempt:{attempt.id}'
+
+def live_snapshot(quiz):
+    """What a monitor starts from: the open attempts and the completed-attempt totals."""
+    rows = db.session.execute(
+        db.select(Attempt.id, Attempt.student_name, Attempt.current_question, Attempt.score,
+                  Attempt.start_time, Attempt.deadline)
+        .filter(Attempt.quiz_id == quiz.id, Attempt.is_completed == False)
+        .order_by(Attempt.id.desc())
+        .limit(LIVE_SNAPSHOT_LIMIT)).all()
+    attempts = []
+    for row in rows:
+        # Buffered attempts are ahead of their rows
+        state = answer_buffer.peek(row.id) if answer_buffer else None
+        if state is not None and state.is_completed:
+            continue
+        progress = state or row
+        attempts.append({
+            'attempt_id': row.id,
+            'student_name': row.student_name,
+            'current_question': progress.current_question,
+            'score': progress.score,
+            'start_time': row.start_time.isoformat() if row.start_time else None,
+            'deadline': progress.deadline.isoformat() if progress.deadline else None
+        })
+    quiz_stats = db.session.get(QuizStats, quiz.id)
+    return {
+        'quiz_id': quiz.id,
+        'questions': quiz.questions_per_attempt,
+        'in_progress': attempts,
+        'completed': {
+            'attempt_count': quiz_stats.attempt_count if quiz_stats else 0,
+            'score_sum': quiz_stats.score_sum if quiz_stats else 0
+        }
+    }
+
+@route('/admin/quiz/<int:quiz_id>/live')
+@login_required
+def quiz_live(quiz_id):
+    """Server-sent events for an exam in progress.
+
+    Sends a snapshot, then attempt_started, answer_submitted and
+    attempt_completed events as they happen. Each stream holds a worker
+    thread; it ends after LIVE_STREAM_MAX_SECONDS and the browser's
+    EventSource reconnects, to any worker, and gets a fresh snapshot.
+    """
+    quiz = get_quiz_snapshot(quiz_id)
+    if not quiz:
+        abort(404)
+    
+    # Subscribe first, so nothing that happens while the snapshot is read is missed
+    broker = live_events._get_current_object()
+    subscription = broker.subscribe(quiz_id)
+    try:
+        snapshot = live_snapshot(quiz)
+    except Exception:
+        broker.unsubscribe(subscription)
+        raise
+    # The stream outlives the request; it needs the app itself, not the context-bound proxies
+    app = current_app._get_current_object()
+    heartbeat = current_app.config['LIVE_STREAM_HEARTBEAT_SECONDS']
+    ends = time.monotonic() + current_app.config['LIVE_STREAM_MAX_SECONDS']
+    
+    def stream():
+        yield f'retry: {LIVE_RETRY_MS}\n' + format_message('snapshot', json.dumps(snapshot))
+        while time.monotonic() < ends:
+            events, overflowed = subscription.get(timeout=heartbeat)
+            if overflowed:
+                # A fresh snapshot is newer than anything that was still queued
+                with app.app_context():
+                    fresh = json.dumps(live_snapshot(quiz))
+                yield format_message('snapshot', fresh)
+            elif events:
+                yield ''.join(event.message() for event in events)
+            else:
+                yield ': keepalive\n\n'
+    
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Also runs when the client leaves before the stream starts
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
 
 # Student Routes
-@app.route('/')
+@route('/')
 def index():
     return render_template('student/index.html')
 
-@app.route('/student/quizzes')
+@route('/student/quizzes')
 def student_quizzes():
-    quizzes = Quiz.query.order_by(Quiz.created_at.desc()).all()
-    return render_template('student/quizzes.html', quizzes=quizzes)
+    cursor = request.args.get('after') or None
+    try:
+        after = parse_quiz_cursor(cursor) if cursor else None
+    except ValueError:
+        abort(400)
+    
+    state = catalog_cache.state(load_catalog_state)
+    etag = (f'catalog-{state.version}-{_catalog_boot_time:%Y%m%d%H%M%S}-{cursor or "first"}-'
+            f'{int(current_user.is_authenticated)}')
+    last_modified = max(state.updated_at or _catalog_boot_time, _catalog_boot_time)
+    
+    def with_validators(response):
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+    
+    # A pending flash message is part of the page, so it always gets a full response
+    if '_flashes' not in session:
+        not_modified = with_validators(Response()).make_conditional(request)
+        if not_modified.status_code == 304:
+            return not_modified
+    
+    quiz_list = catalog_cache.page((state.version, cursor), lambda: render_quiz_list(after))
+    return with_validators(current_app.make_response(render_template('student/quizzes.html', quiz_list=quiz_list)))
 
-@app.route('/student/start-quiz/<int:quiz_id>', methods=['GET', 'POST'])
+@route('/student/start-quiz/<int:quiz_id>', methods=['GET', 'POST'])
 def start_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
     
@@ -202,104 +1249,445 @@ def start_quiz(quiz_id):
         attempt = Attempt(
             quiz_id=quiz_id,
             student_name=student_name,
-            start_time=datetime.utcnow()
+            start_time=datetime.utcnow(),
+            shuffle_seed=new_seed() if quiz.randomized else None
         )
+        attempt.deadline = attempt.start_time + timedelta(seconds=quiz.duration_seconds)
         db.session.add(attempt)
+        db.session.flush()
+        # Read before the commit expires the attempt
+        started = {
+            'attempt_id': attempt.id,
+            'student_name': student_name,
+            'start_time': attempt.start_time.isoformat(),
+            'deadline': attempt.deadline.isoformat()
+        }
         db.session.commit()
         
-        session['attempt_id'] = attempt.id
+        session['attempt_id'] = started['attempt_id']
+        live_events.publish(quiz_id, 'attempt_started', started)
         return redirect(url_for('take_quiz', quiz_id=quiz_id))
     
     return render_template('student/start_quiz.html', quiz=quiz)
 
-@app.route('/student/take-quiz/<int:quiz_id>')
+@route('/student/take-quiz/<int:quiz_id>')
 def take_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
+    quiz = get_quiz_snapshot(quiz_id)
+    if not quiz:
+        abort(404)
     attempt_id = session.get('attempt_id')
     
     if not attempt_id:
         return redirect(url_for('student_quizzes'))
     
-    attempt = Attempt.query.get(attempt_id)
+    attempt = get_active_attempt(attempt_id)
     if not attempt or attempt.is_completed:
         return redirect(url_for('student_quizzes'))
     
-    questions = Question.query.filter_by(quiz_id=quiz_id).order_by(Question.order).all()
+    if attempt_overdue(attempt, quiz):
+        with attempt_lock(attempt):
+            if quiz.duration_mode == 'per_question':
+                skip_overrun_questions(attempt, quiz, datetime.utcnow())
+            else:
+                expire_attempt(attempt)
+            update = attempt_progress_event(attempt, expired=True)
+        db.session.commit()
+        live_events.publish(*update)
+        if attempt.is_completed:
+            return redirect(url_for('student_quiz_results', quiz_id=quiz_id))
+    
+    # This attempt's questions, in its order; computed from the seed, not stored
+    order = question_order(quiz, attempt.shuffle_seed)
     
-    if attempt.current_question >= len(questions):
+    if attempt.current_question >= len(order):
         # Quiz completed
         return redirect(url_for('student_quiz_results', quiz_id=quiz_id))
     
-    current_q = questions[attempt.current_question]
+    current_q = shown_question(quiz, attempt.shuffle_seed, quiz.questions[order[attempt.current_question]])
     
     return render_template('student/take_quiz.html', 
                          quiz=quiz, 
                          question=current_q, 
                          question_num=attempt.current_question + 1,
-                         total_questions=len(questions),
-                         attempt=attempt)
+                         total_questions=len(order),
+                         attempt=attempt,
+                         seconds_left=seconds_left(attempt))
+
+@route('/student/quiz-session/<int:quiz_id>')
+def quiz_session(quiz_id):
+    """Hand the client the whole answer-stripped question set in one response."""
+    attempt_id = session.get('attempt_id')
+    if not attempt_id:
+        return jsonify({'error': 'No active attempt'}), 400
+    
+    attempt = get_active_attempt(attempt_id)
+    if not attempt or attempt.is_completed or attempt.quiz_id != quiz_id:
+        return jsonify({'error': 'Attempt not found or completed'}), 400
+    
+    quiz = get_quiz_snapshot(quiz_id)
+    if not quiz:
+        abort(404)
+    
+    return jsonify({
+        'quiz': {
+            'id': quiz.id,
+            'title': quiz.title,
+            'duration_mode': quiz.duration_mode,
+            'duration_seconds': quiz.duration_seconds
+        },
+        'current_question': attempt.current_question,
+        'seconds_left': seconds_left(attempt),
+        'questions': quiz.public_questions(attempt_questions(quiz, attempt.shuffle_seed)),
+        'submit_url': url_for('submit_answers'),
+        'results_url': url_for('student_quiz_results', quiz_id=quiz_id)
+    })
+
+class AttemptExpired(ValueError):
+    """Time ran out: the attempt has been closed, or in per_question mode the
+    overrun questions skipped, and the change must be committed."""
+
+# Stored for a per_question quiz's question whose time ran out before it was answered
+BLANK_ANSWER = ''
+
+def answers_due(attempt, quiz, count=1):
+    """The latest time count answers submitted together are still accepted.
+
+    In per_question mode a batch can hold answers to several questions, each
+    with its own time allowance.
+    """
+    due = attempt.deadline + timedelta(seconds=current_app.config['ATTEMPT_DEADLINE_GRACE_SECONDS'])
+    if quiz.duration_mode == 'per_question' and count > 1:
+        due += timedelta(seconds=quiz.duration_seconds * (count - 1))
+    return due
+
+def attempt_overdue(attempt, quiz, count=1, now=None):
+    if attempt.deadline is None or attempt.is_completed:
+        return False
+    return (now or datetime.utcnow()) > answers_due(attempt, quiz, count)
+
+def seconds_left(attempt):
+    if attempt.deadline is None:
+        return None
+    return max(0, int((attempt.deadline - datetime.utcnow()).total_seconds()))
+
+def expire_attempt(attempt):
+    """Close an attempt whose time ran out, as of its deadline.
+
+    In write-behind mode only the buffered state changes; the expiry sweep
+    closes the row and counts it in the summary tables.
+    """
+    if answer_buffer:
+        attempt.is_completed = True
+        attempt.end_time = attempt.deadline
+        return
+    
+    # Conditional, so an attempt closed concurrently is only counted once
+    closed = db.session.execute(
+        db.update(Attempt)
+        .where(Attempt.id == attempt.id, Attempt.is_completed == False)
+        .values(is_completed=True, end_time=Attempt.deadline, deadline=None)
+        .execution_options(synchronize_session=False)).rowcount
+    end_time = attempt.deadline
+    set_committed_value(attempt, 'is_completed', True)
+    set_committed_value(attempt, 'end_time', end_time)
+    set_committed_value(attempt, 'deadline', None)
+    if closed:
+        update_results_stats(attempt.quiz_id, completed_scores=[attempt.score])
+
+def parse_submission(submission):
+    """Return the (question_id, selected_answer) of one submitted answer.
+
+    Raises ValueError unless submission is an object with an integer
+    question_id (the form client posts it as a string of digits) and one of
+    the option letters as selected_answer.
+    """
+    if not isinstance(submission, dict):
+        raise ValueError('Invalid answer')
+    question_id = submission.get('question_id')
+    selected_answer = submission.get('selected_answer')
+    if question_id is None or selected_answer is None:
+        raise ValueError('Missing data')
+    
+    if isinstance(question_id, str) and question_id.isdecimal():
+        question_id = int(question_id)
+    if type(question_id) is not int:
+        raise ValueError('Invalid question id')
+    if selected_answer not in OPTION_COUNT_COLUMNS:
+        raise ValueError('Invalid answer')
+    return question_id, selected_answer
+
+def skip_overrun_questions(attempt, quiz, now):
+    """Record blank answers for a per_question attempt's questions whose time has run out.
+
+    Each question's time starts when the previous one's ran out, so an
+    attempt left alone loses one question per allowance until it completes.
+    """
+    allowance = timedelta(seconds=quiz.duration_seconds)
+    grace = timedelta(seconds=current_app.config['ATTEMPT_DEADLINE_GRACE_SECONDS'])
+    overrun = (now - grace - attempt.deadline) // allowance + 1
+    if answer_buffer:
+        answered = attempt.answered
+    else:
+        answered = {question_id for question_id, in
+                    db.session.query(Answer.question_id).filter_by(attempt_id=attempt.id)}
+    unanswered = [question.id for question in (quiz.questions[position] for position in
+                                               question_order(quiz, attempt.shuffle_seed))
+                  if question.id not in answered]
+    skipped = unanswered[:overrun]
+    if not skipped:
+        expire_attempt(attempt)
+        return
+    
+    graded = [(question_id, BLANK_ANSWER, False) for question_id in skipped]
+    # As of when the last skipped question's time ran out, which starts the next one's
+    ran_out = attempt.deadline + allowance * (len(skipped) - 1)
+    if answer_buffer:
+        buffer_answers(attempt, quiz, graded, ran_out)
+    else:
+        store_answers(attempt, quiz, graded, ran_out)
+
+def record_answers(attempt, submissions):
+    """Grade and store a batch of answers for an attempt in one transaction.
 
-@app.route('/student/submit-answer', methods=['POST'])
+    attempt is an Attempt row, or its buffered AttemptState in write-behind
+    mode (callers hold its lock). Returns a list of (question_id, is_correct)
+    tuples, one per accepted answer. Answers already stored for the attempt
+    are acknowledged without being counted again. Raises ValueError, before
+    changing anything, if any submission is malformed or not part of the quiz,
+    and AttemptExpired if its time has run out: after closing the attempt, or
+    in per_question mode after skipping the questions whose time ran out.
+    """
+    if attempt.is_completed:
+        raise ValueError('Attempt not found or completed')
+    submissions = [parse_submission(submission) for submission in submissions]
+    
+    quiz = get_quiz_snapshot(attempt.quiz_id)
+    if not quiz:
+        raise ValueError('Quiz not found')
+    now = datetime.utcnow()
+    if attempt_overdue(attempt, quiz, len(submissions), now):
+        if quiz.duration_mode == 'per_question':
+            skip_overrun_questions(attempt, quiz, now)
+            raise AttemptExpired('Time is up for this question')
+        expire_attempt(attempt)
+        raise AttemptExpired('Time is up')
+    answer_key = quiz.answer_key
+    seed = attempt.shuffle_seed
+    # Only a sampled attempt has to check which questions it was dealt
+    dealt = attempt_question_ids(quiz, seed) if seed is not None and quiz.sample_size else None
+    
+    graded = []
+    for question_id, selected_answer in submissions:
+        if question_id not in answer_key or (dealt is not None and question_id not in dealt):
+            raise ValueError('Question not found')
+        
+        # Answers are stored and graded with the stored option letters
+        if seed is not None:
+            selected_answer = stored_answer(quiz, seed, question_id, selected_answer)
+        
+        # Check if answer is correct
+        graded.append((question_id, selected_answer, selected_answer == answer_key[question_id]))
+    
+    if answer_buffer:
+        return buffer_answers(attempt, quiz, graded, now)
+    return store_answers(attempt, quiz, graded, now)
+
+def buffer_answers(attempt, quiz, graded, now):
+    """Apply graded answers to a buffered AttemptState and queue them for the database."""
+    answered = attempt.answered
+    results = []
+    for question_id, selected_answer, is_correct in graded:
+        results.append((question_id, is_correct))
+        
+        # Resubmitted answers (double clicks, client retries) are acknowledged
+        # but never counted twice
+        if question_id in answered:
+            continue
+        answered.add(question_id)
+        
+        attempt.current_question += 1
+        if is_correct:
+            attempt.score += 1
+        
+        if attempt.current_question >= quiz.questions_per_attempt:
+            attempt.is_completed = True
+            attempt.end_time = now
+            attempt.deadline = None
+        elif quiz.duration_mode == 'per_question':
+            attempt.deadline = now + timedelta(seconds=quiz.duration_seconds)
+        
+        # Buffered answers reach the summary tables when they are flushed
+        answer_buffer.append(attempt, question_id, selected_answer, is_correct)
+        
+        if attempt.is_completed:
+            break
+    return results
+
+def store_answers(attempt, quiz, graded, now):
+    """Store graded answers and advance the attempt with atomic statements.
+
+    Each answer is an INSERT that does nothing when the attempt already has
+    an answer to that question, so double clicks and retried requests are
+    counted once without reading the stored answers first. The attempt's
+    counters then move in one UPDATE ... SET score = score + :correct that
+    only matches an open attempt, so concurrent requests never lose an
+    increment. The attempt object is brought up to date from the statement
+    without being marked dirty.
+    """
+    results = []
+    new_answers = []
+    for question_id, selected_answer, is_correct in graded:
+        results.append((question_id, is_correct))
+        inserted = db.session.execute(insert_ignoring_duplicates(Answer).values(
+            attempt_id=attempt.id,
+            question_id=question_id,
+            selected_answer=selected_answer,
+            is_correct=is_correct,
+            answered_at=now
+        )).rowcount
+        if inserted:
+            new_answers.append((question_id, selected_answer, is_correct))
+    if not new_answers:
+        return results
+    
+    progressed = Attempt.current_question + len(new_answers)
+    done = progressed >= quiz.questions_per_attempt
+    if quiz.duration_mode == 'per_question':
+        next_deadline = db.literal(now + timedelta(seconds=quiz.duration_seconds), db.DateTime)
+    else:
+        next_deadline = Attempt.deadline
+    stmt = (db.update(Attempt)
+            .where(Attempt.id == attempt.id, Attempt.is_completed == False)
+            # Counters last: MySQL evaluates assignments in order, and done reads current_question
+            .ordered_values((Attempt.is_completed, db.case((done, True), else_=False)),
+                            (Attempt.end_time, db.case((done, db.literal(now, db.DateTime)), else_=Attempt.end_time)),
+                            (Attempt.deadline, db.case((done, db.null()), else_=next_deadline)),
+                            (Attempt.current_question, progressed),
+                            (Attempt.score, Attempt.score + sum(1 for _, _, is_correct in new_answers if is_correct)))
+            .execution_options(synchronize_session=False))
+    progress = (Attempt.current_question, Attempt.score, Attempt.is_completed, Attempt.end_time, Attempt.deadline)
+    if db.engine.dialect.update_returning:
+        row = db.session.execute(stmt.returning(*progress)).first()
+    else:
+        row = db.session.execute(db.select(*progress).filter(Attempt.id == attempt.id)).first() \
+            if db.session.execute(stmt).rowcount else None
+    if row is None:
+        # Another request completed the attempt first; the caller rolls back these answers
+        raise ValueError('Attempt not found or completed')
+    
+    for column, value in zip(progress, row):
+        set_committed_value(attempt, column.key, value)
+    update_results_stats(attempt.quiz_id, new_answers, [attempt.score] if attempt.is_completed else [])
+    return results
+
+@route('/student/submit-answer', methods=['POST'])
 def submit_answer():
     attempt_id = session.get('attempt_id')
     if not attempt_id:
         return jsonify({'error': 'No active attempt'}), 400
     
-    attempt = Attempt.query.get(attempt_id)
+    attempt = get_active_attempt(attempt_id)
     if not attempt or attempt.is_completed:
         return jsonify({'error': 'Attempt not found or completed'}), 400
     
-    data = request.get_json()
-    question_id = data.get('question_id')
-    selected_answer = data.get('selected_answer')
-    
-    if not question_id or not selected_answer:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
         return jsonify({'error': 'Missing data'}), 400
     
-    question = Question.query.get(question_id)
-    if not question:
-        return jsonify({'error': 'Question not found'}), 400
-    
-    # Check if answer is correct
-    is_correct = selected_answer == question.correct_answer
+    update = None
+    try:
+        with attempt_lock(attempt):
+            answered = attempt.current_question
+            results = record_answers(attempt, [data])
+            if attempt.current_question != answered:
+                update = attempt_progress_event(attempt)
+        db.session.commit()
+    except AttemptExpired as e:
+        update = attempt_progress_event(attempt, expired=True)
+        db.session.commit()
+        live_events.publish(*update)
+        return jsonify({'error': str(e), 'completed': attempt.is_completed}), 400
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except IntegrityError:
+        # A concurrent request stored the same answer first
+        db.session.rollback()
+        return jsonify({'error': 'Answer already recorded'}), 409
     
-    # Save answer
-    answer = Answer(
-        attempt_id=attempt_id,
-        question_id=question_id,
-        selected_answer=selected_answer,
-        is_correct=is_correct
-    )
-    db.session.add(answer)
+    if update:
+        live_events.publish(*update)
+    return jsonify({'success': True, 'is_correct': results[0][1]})
+
+@route('/student/submit-answers', methods=['POST'])
+def submit_answers():
+    """Batched answer submission used by the single-page quiz client."""
+    attempt_id = session.get('attempt_id')
+    if not attempt_id:
+        return jsonify({'error': 'No active attempt'}), 400
     
-    # Update attempt
-    attempt.current_question += 1
-    if is_correct:
-        attempt.score += 1
+    attempt = get_active_attempt(attempt_id)
+    if not attempt or attempt.is_completed:
+        return jsonify({'error': 'Attempt not found or completed'}), 400
     
-    # Check if quiz is completed
-    quiz = Quiz.query.get(attempt.quiz_id)
-    if attempt.current_question >= quiz.num_questions:
-        attempt.is_completed = True
-        attempt.end_time = datetime.utcnow()
+    data = request.get_json(silent=True)
+    submissions = data.get('answers') if isinstance(data, dict) else None
+    if not isinstance(submissions, list) or not submissions:
+        return jsonify({'error': 'Missing data'}), 400
     
-    db.session.commit()
+    update = None
+    try:
+        with attempt_lock(attempt):
+            answered = attempt.current_question
+            results = record_answers(attempt, submissions)
+            progress = attempt.current_question, attempt.is_completed
+            if attempt.current_question != answered:
+                update = attempt_progress_event(attempt)
+        db.session.commit()
+    except AttemptExpired as e:
+        update = attempt_progress_event(attempt, expired=True)
+        db.session.commit()
+        live_events.publish(*update)
+        return jsonify({'error': str(e), 'completed': attempt.is_completed}), 400
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except IntegrityError:
+        # A concurrent request stored the same answer first
+        db.session.rollback()
+        return jsonify({'error': 'Answer already recorded'}), 409
     
-    return jsonify({'success': True, 'is_correct': is_correct})
+    if update:
+        live_events.publish(*update)
+    return jsonify({
+        'success': True,
+        'accepted': len(results),
+        'results': [{'question_id': q_id, 'is_correct': ok} for q_id, ok in results],
+        'current_question': progress[0],
+        'completed': progress[1]
+    })
 
-@app.route('/student/quiz-results/<int:quiz_id>')
+@route('/student/quiz-results/<int:quiz_id>')
 def student_quiz_results(quiz_id):
     attempt_id = session.get('attempt_id')
     if not attempt_id:
         return redirect(url_for('student_quizzes'))
     
-    attempt = Attempt.query.get(attempt_id)
+    if answer_buffer:
+        answer_buffer.flush()
+    
+    attempt = db.session.get(Attempt, attempt_id)
     if not attempt:
         return redirect(url_for('student_quizzes'))
     
-    quiz = Quiz.query.get(quiz_id)
-    questions = Question.query.filter_by(quiz_id=quiz_id).order_by(Question.order).all()
+    quiz = get_quiz_snapshot(quiz_id)
+    questions = attempt_questions(quiz, attempt.shuffle_seed) if quiz else []
     answers = Answer.query.filter_by(attempt_id=attempt_id).all()
+    if quiz and attempt.shuffle_seed is not None:
+        # Show answers with the option letters the student saw
+        answers = [{'question_id': answer.question_id, 'is_correct': answer.is_correct,
+                    'selected_answer': shown_answer(quiz, attempt.shuffle_seed, answer.question_id,
+                                                    answer.selected_answer)} for answer in answers]
     
     # Clear session
     session.pop('attempt_id', None)
@@ -310,77 +1698,393 @@ def student_quiz_results(quiz_id):
                          questions=questions, 
                          answers=answers)
 
-# AI Question Generation Routes
-@app.route('/admin/ai-create-quiz', methods=['GET', 'POST'])
-@login_required
-def ai_create_quiz():
-    if not current_user.is_admin:
-        flash('Access denied. Admin privileges required.', 'error')
-        return redirect(url_for('admin_dashboard'))
+# Expiry sweep: closes attempts whose time ran out while nobody was submitting
+EXPIRY_BATCH_SIZE = 1000
+
+def expire_overdue_attempts(limit=EXPIRY_BATCH_SIZE):
+    """Handle up to limit open attempts past their deadline and grace period. Returns how many.
+
+    The overdue rows are read through the deadline index. Attempts of
+    per_question quizzes get blank answers for the questions whose time ran
+    out, one attempt at a time, and only complete if that was their last
+    question. The rest are closed with one UPDATE that only matches rows
+    still at the progress that was read; if an answer arrived for any of
+    them in between, they are closed one at a time instead. Safe to run in
+    several processes at once.
+    """
+    if answer_buffer:
+        answer_buffer.flush()
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=current_app.config['ATTEMPT_DEADLINE_GRACE_SECONDS'])
+    rows = db.session.execute(
+        db.select(Attempt.id, Attempt.quiz_id, Attempt.current_question, Attempt.score, Attempt.deadline)
+        .filter(Attempt.deadline < cutoff, Attempt.is_completed == False)
+        .order_by(Attempt.deadline)
+        .limit(limit)).all()
+    if not rows:
+        return 0
     
-    if request.method == 'POST':
-        topic = request.form.get('topic')
-        num_questions = int(request.form.get('num_questions', 10))
-        difficulty = request.form.get('difficulty', 'medium')
-        quiz_title = request.form.get('quiz_title', f'AI Quiz: {topic}')
-        duration_mode = request.form.get('duration_mode', 'per_question')
-        duration_value = int(request.form.get('duration_value', 30))
+    quizzes = {quiz_id: get_quiz_snapshot(quiz_id) for quiz_id in {row.quiz_id for row in rows}}
+    per_question = [row for row in rows
+                    if quizzes[row.quiz_id] and quizzes[row.quiz_id].duration_mode == 'per_question']
+    for row in per_question:
+        skip_overdue_questions(row.id, quizzes[row.quiz_id], now)
+    rows = [row for row in rows if row not in per_question]
+    if not rows:
+        return len(per_question)
+    
+    close = (db.update(Attempt)
+             .where(Attempt.is_completed == False, Attempt.deadline < cutoff)
+             .values(is_completed=True, end_time=Attempt.deadline, deadline=None)
+             .execution_options(synchronize_session=False))
+    closed = db.session.execute(close.where(
+        db.tuple_(Attempt.id, Attempt.current_question).in_([(row.id, row.current_question) for row in rows])))
+    if closed.rowcount != len(rows):
+        db.session.rollback()
+        rows = [row for row in rows if db.session.execute(close.where(
+            Attempt.id == row.id, Attempt.current_question == row.current_question)).rowcount]
+    
+    scores = defaultdict(list)
+    for row in rows:
+        scores[row.quiz_id].append(row.score)
+    for quiz_id, quiz_scores in scores.items():
+        update_results_stats(quiz_id, completed_scores=quiz_scores)
+    db.session.commit()
+    
+    for row in rows:
+        live_events.publish(row.quiz_id, 'attempt_completed', {
+            'attempt_id': row.id,
+            'current_question': row.current_question,
+            'score': row.score,
+            'end_time': row.deadline.isoformat(),
+            'expired': True
+        }, f'attempt:{row.id}')
+    
+    if answer_buffer:
+        for row in rows:
+            state = answer_buffer.peek(row.id)
+            if state is not None:
+                with state.lock:
+                    state.is_completed = True
+                    state.end_time = row.deadline
+    return len(rows) + len(per_question)
+
+def skip_overdue_questions(attempt_id, quiz, now):
+    """The expiry sweep for one per_question attempt; commits."""
+    attempt = get_active_attempt(attempt_id)
+    if attempt is None:
+        return
+    try:
+        with attempt_lock(attempt):
+            # An answer may have moved the deadline on since the row was read
+            if not attempt_overdue(attempt, quiz, now=now):
+                return
+            skip_overrun_questions(attempt, quiz, now)
+            update = attempt_progress_event(attempt, expired=True)
+        db.session.commit()
+    except ValueError:
+        # Completed by a concurrent request
+        db.session.rollback()
+        return
+    live_events.publish(*update)
+
+def sweep_expired_attempts(app):
+    with app.app_context():
+        try:
+            while expire_overdue_attempts() == EXPIRY_BATCH_SIZE:
+                pass
+        finally:
+            db.session.remove()
+
+attempt_sweeper = _service('attempt_sweeper')
+
+@before_request
+def start_attempt_sweeper():
+    attempt_sweeper.start()
+
+# AI Question Generation Routes
+# Set GENERATION_CACHE_PATH to an empty string to always call the API
+generation_cache = _service('generation_cache')
+
+# ai_question_generator (and requests with it) is imported on first use, so
+# workers that only serve students never load it
+def get_question_generator():
+    """Shared generator, so its keep-alive connection pool survives between requests.
+
+    Without an API key this is the offline fallback generator; check with
+    is_fallback_generator() before using the AI generator's options.
+    """
+    services = _services()
+    if services['question_generator'] is None:
+        from ai_question_generator import NVIDIAQuestionGenerator
+        try:
+            services['question_generator'] = NVIDIAQuestionGenerator(cache=services['generation_cache'])
+        except RuntimeError as e:
+            current_app.logger.warning('%s; generating sample questions instead', e)
+            services['question_generator'] = get_fallback_generator()
+    return services['question_generator']
+
+def get_fallback_generator():
+    """Offline generator used when the AI service returns nothing."""
+    from ai_question_generator import SimpleQuestionGenerator
+    return SimpleQuestionGenerator()
+
+def is_fallback_generator(generator):
+    from ai_question_generator import SimpleQuestionGenerator
+    return isinstance(generator, SimpleQuestionGenerator)
+
+def screen_generated_questions(job, questions, allow_replacements=True):
+    """Apply DEDUP_POLICY to generated questions.
+
+    'flag' keeps near duplicates and marks them with duplicate_of; 'reject'
+    drops them and asks the generator for replacements, up to two rounds.
+    """
+    rejected = set()
+    for round_number in range(3):
+        kept = []
+        for question, matches in zip(questions, find_duplicate_questions([q['question'] for q in questions])):
+            if not matches:
+                kept.append(question)
+            elif current_app.config['DEDUP_POLICY'] == 'flag':
+                kept.append(dict(question, duplicate_of=matches[0]))
+            else:
+                rejected.add(question_key(question))
+        questions = kept
         
-        if not topic:
-            flash('Please enter a topic for the quiz.', 'error')
-            return render_template('admin/ai_create_quiz.html')
+        missing = job.num_questions - len(questions)
+        if current_app.config['DEDUP_POLICY'] != 'reject' or missing <= 0 or not allow_replacements or round_number == 2:
+            break
+        exclude = rejected | {question_key(question) for question in questions}
+        questions = questions + get_question_generator().generate_questions(
+            job.topic, missing, job.difficulty, exclude=exclude)
+    return questions
+
+def run_generation_job(app, job_id):
+    """Generate a queued job's questions, then insert its quiz in one transaction.
+
+    The job is claimed with a conditional UPDATE and every later write checks
+    the claim token, so a job that was requeued as stale while this run was
+    still going cannot produce a second quiz.
+    """
+    with app.app_context():
+        token = uuid.uuid4().hex
+        claimed = db.session.execute(
+            db.update(GenerationJob)
+            .where(GenerationJob.id == job_id, GenerationJob.status == 'queued')
+            .values(status='running', claim_token=token, progress=0, questions_json=None)
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            return
+        
+        job = db.session.get(GenerationJob, job_id)
+        owned = (GenerationJob.id == job_id, GenerationJob.claim_token == token)
+        
+        last_report = [0.0]
+        
+        def report_progress(questions):
+            # Questions stream in one at a time; write at most every half second
+            if time.monotonic() - last_report[0] < 0.5:
+                return
+            last_report[0] = time.monotonic()
+            db.session.execute(db.update(GenerationJob).where(*owned).values(
+                progress=len(questions), questions_json=json.dumps(questions)))
+            db.session.commit()
         
         try:
-            # Generate questions using AI
-            generator = NVIDIAQuestionGenerator()
-            questions_data = generator.generate_questions(topic, num_questions, difficulty)
+            generator = get_question_generator()
+            questions_data = None if is_fallback_generator(generator) else generator.generate_questions(
+                job.topic, job.num_questions, job.difficulty, on_progress=report_progress)
+            used_fallback = not questions_data
+            if used_fallback:
+                # If AI generation fails, use simple generator for testing
+                questions_data = get_fallback_generator().generate_questions(job.topic, job.num_questions, job.difficulty)
+            if current_app.config['DEDUP_POLICY'] != 'off':
+                questions_data = screen_generated_questions(job, questions_data, allow_replacements=not used_fallback)
             
-            # If AI generation fails, use simple generator for testing
-            if not questions_data:
-                flash('AI generation failed. Using sample questions for testing.', 'warning')
-                simple_generator = SimpleQuestionGenerator()
-                questions_data = simple_generator.generate_questions(topic, num_questions, difficulty)
-            
-            if not questions_data:
-                flash('Failed to generate questions. Please try again.', 'error')
-                return render_template('admin/ai_create_quiz.html')
-            
-            # Create the quiz
             quiz = Quiz(
-                title=quiz_title,
+                title=job.quiz_title,
                 num_questions=len(questions_data),
-                duration_mode=duration_mode,
-                duration_seconds=duration_value
+                duration_mode=job.duration_mode,
+                duration_seconds=job.duration_seconds
             )
             db.session.add(quiz)
             db.session.flush()  # Get the quiz ID
+            db.session.execute(db.insert(Question), [{
+                'quiz_id': quiz.id,
+                'question_text': q_data['question'],
+                'option_a': q_data['option_a'],
+                'option_b': q_data['option_b'],
+                'option_c': q_data['option_c'],
+                'option_d': q_data['option_d'],
+                'correct_answer': q_data['correct_answer'],
+                'order': i + 1
+            } for i, q_data in enumerate(questions_data)])
             
-            # Add questions to the quiz
-            for i, q_data in enumerate(questions_data):
-                question = Question(
-                    quiz_id=quiz.id,
-                    question_text=q_data['question'],
-                    option_a=q_data['option_a'],
-                    option_b=q_data['option_b'],
-                    option_c=q_data['option_c'],
-                    option_d=q_data['option_d'],
-                    correct_answer=q_data['correct_answer'],
-                    order=i + 1
-                )
-                db.session.add(question)
-            
+            finished = db.session.execute(db.update(GenerationJob).where(*owned).values(
+                status='completed', quiz_id=quiz.id, progress=len(questions_data),
+                questions_json=json.dumps(questions_data), used_fallback=used_fallback)).rowcount
+            if not finished:
+                db.session.rollback()
+                return
             db.session.commit()
-            flash(f'AI Quiz "{quiz_title}" created successfully with {len(questions_data)} questions!', 'success')
-            return redirect(url_for('admin_dashboard'))
-            
+            quiz_cache.invalidate(quiz.id)
         except Exception as e:
             db.session.rollback()
-            flash(f'Error creating AI quiz: {str(e)}', 'error')
+            db.session.execute(db.update(GenerationJob).where(*owned).values(status='failed', error=str(e)))
+            db.session.commit()
+
+generation_queue = _service('generation_queue')
+
+def resume_generation_jobs():
+    """Queue jobs left behind by a previous process.
+
+    Running jobs whose heartbeat is older than GENERATION_JOB_STALE_SECONDS
+    belonged to a process that died and start over.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['GENERATION_JOB_STALE_SECONDS'])
+    db.session.execute(
+        db.update(GenerationJob)
+        .where(GenerationJob.status == 'running', GenerationJob.updated_at < stale_before)
+        .values(status='queued', claim_token=None)
+    )
+    db.session.commit()
+    for job_id, in db.session.query(GenerationJob.id).filter_by(status='queued').order_by(GenerationJob.id):
+        generation_queue.submit(job_id)
+
+@before_request
+def resume_generation_jobs_once():
+    # Once per worker process; the claim in run_generation_job keeps workers from doubling up
+    services = _services()
+    if services['generation_jobs_resumed_pid'] != os.getpid():
+        services['generation_jobs_resumed_pid'] = os.getpid()
+        resume_generation_jobs()
+
+def generation_job_status(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'topic': job.topic,
+        'difficulty': job.difficulty,
+        'num_questions': job.num_questions,
+        'progress': job.progress,
+        'questions': json.loads(job.questions_json) if job.questions_json else [],
+        'used_fallback': job.used_fallback,
+        'error': job.error,
+        'quiz_id': job.quiz_id,
+        'quiz_url': url_for('add_questions', quiz_id=job.quiz_id) if job.quiz_id else None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'updated_at': job.updated_at.isoformat() if job.updated_at else None
+    }
+
+@route('/admin/ai-create-quiz', methods=['GET', 'POST'])
+@login_required
+def ai_create_quiz():
+    if not current_user.is_admin:
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('admin_dashboard'))
+    
+    if request.method == 'POST':
+        wants_json = request.is_json or request.accept_mimetypes.best == 'application/json'
+        data = request.get_json(silent=True) or request.form
+        topic = data.get('topic')
+        quiz_title = data.get('quiz_title') or f'AI Quiz: {topic}'
+        
+        try:
+            num_questions = int(data.get('num_questions', 10))
+            duration_value = int(data.get('duration_value', 30))
+        except (TypeError, ValueError):
+            num_questions = 0
+        
+        error = None
+        if not topic:
+            error = 'Please enter a topic for the quiz.'
+        elif num_questions < 1:
+            error = 'Please enter a valid number of questions.'
+        if error:
+            if wants_json:
+                return jsonify({'error': error}), 400
+            flash(error, 'error')
             return render_template('admin/ai_create_quiz.html')
+        
+        job = GenerationJob(
+            topic=topic,
+            difficulty=data.get('difficulty', 'medium'),
+            num_questions=num_questions,
+            quiz_title=quiz_title,
+            duration_mode=data.get('duration_mode', 'per_question'),
+            duration_seconds=duration_value,
+            created_by=current_user.id
+        )
+        db.session.add(job)
+        db.session.commit()
+        generation_queue.submit(job.id)
+        
+        status_url = url_for('generation_job', job_id=job.id)
+        if wants_json:
+            response = jsonify(generation_job_status(job))
+            response.status_code = 202
+            response.headers['Location'] = status_url
+            return response
+        flash(f'Generating "{quiz_title}" in the background (job #{job.id}). '
+              f'It will appear on the dashboard when it is ready.', 'info')
+        return redirect(url_for('admin_dashboard'))
     
     return render_template('admin/ai_create_quiz.html')
 
-@app.route('/admin/generate-questions', methods=['POST'])
+@route('/admin/generation-jobs/<int:job_id>')
+@login_required
+def generation_job(job_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    job = GenerationJob.query.get_or_404(job_id)
+    return jsonify(generation_job_status(job))
+
+@route('/admin/questions/check-duplicates', methods=['POST'])
+@login_required
+def check_duplicate_questions():
+    """Near-duplicate matches for {"questions": [text, ...], "quiz_id": optional quiz to ignore}."""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    texts = data.get('questions')
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({'error': 'questions must be a list of strings'}), 400
+    
+    found = find_duplicate_questions(texts, exclude_quiz_id=data.get('quiz_id'))
+    return jsonify({'duplicates': found, 'messages': describe_duplicates(found)})
+
+@route('/admin/generation-cache')
+@login_required
+def generation_cache_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    if not generation_cache:
+        return jsonify({'enabled': False})
+    return jsonify(dict(generation_cache.stats(), enabled=True))
+
+@route('/admin/metrics')
+def metrics():
+    """Request metrics in the Prometheus text format, or as JSON with ?format=json.
+
+    Open to logged-in admins, and to scrapers sending "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    token = current_app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    scraper = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    if not scraper and not (current_user.is_authenticated and current_user.is_admin):
+        return jsonify({'error': 'Access denied'}), 403
+    if not request_metrics:
+        return jsonify({'error': 'Metrics are disabled; set METRICS_ENABLED=1'}), 404
+    
+    if request.args.get('format') == 'json':
+        return jsonify(request_metrics.stats())
+    return Response(request_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@route('/admin/generate-questions', methods=['POST'])
 @login_required
 def generate_questions():
     if not current_user.is_admin:
@@ -394,13 +2098,31 @@ def generate_questions():
     if not topic:
         return jsonify({'error': 'Topic is required'}), 400
     
+    if data.get('stream') or request.accept_mimetypes.best == 'application/x-ndjson':
+        # One question per line as soon as the model finishes writing it
+        generator = get_question_generator()
+        
+        def generate():
+            sent = 0
+            if not is_fallback_generator(generator):
+                for question in generator.generate_questions_stream(topic, num_questions, difficulty):
+                    sent += 1
+                    yield json.dumps(question) + '\n'
+            if not sent:
+                for question in get_fallback_generator().generate_questions(topic, num_questions, difficulty):
+                    yield json.dumps(question) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                        headers={'X-Accel-Buffering': 'no'})
+    
     try:
-        generator = NVIDIAQuestionGenerator()
-        questions = generator.generate_questions(topic, num_questions, difficulty)
+        generator = get_question_generator()
+        questions = None if is_fallback_generator(generator) else generator.generate_questions(
+            topic, num_questions, difficulty)
         
         # If AI generation fails, use simple generator for testing
         if not questions:
-            simple_generator = SimpleQuestionGenerator()
+            simple_generator = get_fallback_generator()
             questions = simple_generator.generate_questions(topic, num_questions, difficulty)
         
         return jsonify({'questions': questions})
@@ -408,9 +2130,752 @@ def generate_questions():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Question bank
+BANK_DIFFICULTIES = ('easy', 'medium', 'hard')
+BANK_PAGE_SIZE_MAX = 100
+BANK_TSVECTOR_SQL = "to_tsvector('english', question_text)"  # must match the expression index
+bank_question_fts = db.table('bank_question_fts', db.column('rowid'), db.column('rank'))
+
+def bank_search_mode():
+    """'fts5', 'tsvector' or 'like': how this database searches bank question text."""
+    services = _services()
+    if services['bank_search_mode'] is None:
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            services['bank_search_mode'] = 'tsvector'
+        elif dialect == 'sqlite' and db.inspect(db.engine).has_table('bank_question_fts'):
+            services['bank_search_mode'] = 'fts5'
+        else:
+            services['bank_search_mode'] = 'like'
+    return services['bank_search_mode']
+
+def normalize_tag(name):
+    return ' '.join(str(name).lower().split())[:50]
+
+def search_bank_questions(text='', tags=(), difficulty=None, page=1, per_page=20):
+    """One page of bank questions and whether there are more.
+
+    Text is split into words that must all appear, the last one as a prefix,
+    and results are ranked by relevance; without text the newest come first.
+    Every tag in tags must be present. Pages are read with LIMIT one past the
+    page instead of counting every match.
+    """
+    terms = re.findall(r'\w+', text.lower())[:16]
+    query = db.select(BankQuestion)
+    order = [BankQuestion.id.desc()]
+    
+    if terms:
+        mode = bank_search_mode()
+        if mode == 'fts5':
+            # A one-letter prefix matches most of the bank, so it only matches the whole word
+            match = ' '.join(f'"{term}"' for term in terms) + ('*' if len(terms[-1]) > 1 else '')
+            query = (query.join(bank_question_fts, bank_question_fts.c.rowid == BankQuestion.id)
+                     .filter(db.text('bank_question_fts MATCH :match').bindparams(match=match)))
+            order.insert(0, bank_question_fts.c.rank)
+        elif mode == 'tsvector':
+            vector = db.literal_column(BANK_TSVECTOR_SQL)
+            tsquery = func.to_tsquery(db.literal_column("'english'"),
+                                      ' & '.join(terms) + (':*' if len(terms[-1]) > 1 else ''))
+            query = query.filter(vector.bool_op('@@')(tsquery))
+            order.insert(0, func.ts_rank(vector, tsquery).desc())
+        else:
+            for term in terms:
+                query = query.filter(BankQuestion.question_text.ilike(f'%{term}%'))
+    
+    if difficulty:
+        query = query.filter(BankQuestion.difficulty == difficulty)
+    if tags:
+        tag_ids = [tag_id for tag_id, in db.session.execute(db.select(BankTag.id).filter(BankTag.name.in_(tags)))]
+        if len(tag_ids) < len(set(tags)):
+            return [], False
+        for tag_id in tag_ids:
+            query = query.filter(BankQuestion.id.in_(
+                db.select(bank_question_tag.c.bank_question_id).filter(bank_question_tag.c.tag_id == tag_id)))
+    
+    questions = db.session.execute(
+        query.order_by(*order).limit(per_page + 1).offset((page - 1) * per_page)).scalars().all()
+    return questions[:per_page], len(questions) > per_page
+
+def bank_question_dicts(questions):
+    """Bank questions as dicts, with their tags read in one query."""
+    tags = defaultdict(list)
+    if questions:
+        rows = db.session.execute(
+            db.select(bank_question_tag.c.bank_question_id, BankTag.name)
+            .join(BankTag, BankTag.id == bank_question_tag.c.tag_id)
+            .filter(bank_question_tag.c.bank_question_id.in_([q.id for q in questions]))
+            .order_by(BankTag.name))
+        for question_id, name in rows:
+            tags[question_id].append(name)
+    
+    return [{
+        'id': q.id,
+        'question_text': q.question_text,
+        'option_a': q.option_a,
+        'option_b': q.option_b,
+        'option_c': q.option_c,
+        'option_d': q.option_d,
+        'correct_answer': q.correct_answer,
+        'difficulty': q.difficulty,
+        'tags': tags[q.id]
+    } for q in questions]
+
+def get_or_create_tags(names):
+    """{name: tag id} for names, inserting the tags that do not exist yet."""
+    if not names:
+        return {}
+    db.session.execute(insert_ignoring_duplicates(BankTag), [{'name': name} for name in names])
+    return dict(db.session.execute(db.select(BankTag.name, BankTag.id).filter(BankTag.name.in_(names))).all())
+
+@route('/admin/bank/questions', methods=['GET', 'POST'])
+@login_required
+def bank_questions():
+    """GET searches the bank (q, tags, difficulty, page, per_page); POST adds {"questions": [...]} to it."""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    if request.method == 'POST':
+        return create_bank_questions()
+    
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), BANK_PAGE_SIZE_MAX)
+    tags = [normalize_tag(name) for name in request.args.get('tags', '').split(',') if name.strip()]
+    difficulty = request.args.get('difficulty') or None
+    questions, has_more = search_bank_questions(request.args.get('q', ''), tags, difficulty, page, per_page)
+    return jsonify({
+        'questions': bank_question_dicts(questions),
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more
+    })
+
+def create_bank_questions():
+    data = request.get_json(silent=True) or {}
+    items = data.get('questions')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'questions must be a non-empty list'}), 400
+    
+    questions, tag_names, invalid = [], [], []
+    for position, item in enumerate(items):
+        question = normalize_question(item)
+        difficulty = item.get('difficulty') if isinstance(item, dict) else None
+        tags = item.get('tags', []) if isinstance(item, dict) else []
+        if question is None or difficulty not in (None, *BANK_DIFFICULTIES) or not isinstance(tags, list):
+            invalid.append(position)
+            continue
+        questions.append(BankQuestion(
+            question_text=question['question'],
+            option_a=question['option_a'],
+            option_b=question['option_b'],
+            option_c=question['option_c'],
+            option_d=question['option_d'],
+            correct_answer=question['correct_answer'],
+            difficulty=difficulty,
+            created_by=current_user.id
+        ))
+        tag_names.append({normalize_tag(name) for name in tags if str(name).strip()})
+    if invalid:
+        return jsonify({'error': 'Invalid questions', 'positions': invalid}), 400
+    
+    db.session.add_all(questions)
+    db.session.flush()
+    tag_ids = get_or_create_tags(sorted(set().union(*tag_names)))
+    links = [{'bank_question_id': question.id, 'tag_id': tag_ids[name]}
+             for question, names in zip(questions, tag_names) for name in names]
+    if links:
+        db.session.execute(bank_question_tag.insert(), links)
+    db.session.commit()
+    return jsonify({'ids': [question.id for question in questions]}), 201
+
+@route('/admin/bank/assemble', methods=['POST'])
+@login_required
+def assemble_quiz_from_bank():
+    """Add bank questions, in the order given, to a quiz as membership rows.
+
+    Body: {"bank_question_ids": [...], "quiz_id": ...} appends to an existing
+    quiz; without quiz_id, "title", "duration_mode", "duration_value" and
+    optionally "shuffle_questions", "shuffle_options" and "sample_size" create
+    a new one.
+    """
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    ids = data.get('bank_question_ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'error': 'bank_question_ids must be a non-empty list of ids'}), 400
+    ids = list(dict.fromkeys(ids))
+    found = {question_id for question_id, in db.session.execute(
+        db.select(BankQuestion.id).filter(BankQuestion.id.in_(ids)))}
+    missing = [question_id for question_id in ids if question_id not in found]
+    if missing:
+        return jsonify({'error': 'Unknown bank questions', 'bank_question_ids': missing}), 404
+    
+    if data.get('quiz_id') is not None:
+        quiz = db.session.get(Quiz, data['quiz_id'])
+        if not quiz:
+            return jsonify({'error': 'Quiz not found'}), 404
+        last_order, count = db.session.query(func.coalesce(func.max(Question.order), 0),
+                                             func.count(Question.id)).filter(Question.quiz_id == quiz.id).one()
+        created = False
+    else:
+        try:
+            duration_seconds = int(data.get('duration_value', 30))
+        except (TypeError, ValueError):
+            duration_seconds = 0
+        if not data.get('title') or duration_seconds < 1:
+            return jsonify({'error': 'A new quiz needs a title and a positive duration_value'}), 400
+        quiz = Quiz(title=data['title'], num_questions=0, duration_seconds=duration_seconds,
+                    duration_mode=data.get('duration_mode', 'per_question'), **quiz_randomization(data))
+        db.session.add(quiz)
+        db.session.flush()
+        last_order, count, created = 0, 0, True
+    
+    # Content columns stay empty: readers take the text from the bank question
+    db.session.execute(db.insert(Question), [dict(
+        {field: '' for field in QUESTION_CONTENT_FIELDS},
+        quiz_id=quiz.id,
+        bank_question_id=question_id,
+        order=last_order + n
+    ) for n, question_id in enumerate(ids, 1)])
+    quiz.num_questions = count + len(ids)
+    db.session.commit()
+    quiz_cache.invalidate(quiz.id)
+    return jsonify({'quiz_id': quiz.id, 'added': len(ids), 'num_questions': quiz.num_questions}), 201 if created else 200
+
+# Bulk question import/export (file formats in question_io)
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_ERRORS_LISTED = 100
+QUESTION_FILE_MIMETYPES = {'csv': ('text/csv', 'csv'), 'json': ('application/x-ndjson', 'jsonl'),
+                           'gift': ('text/plain', 'gift')}
+
+def import_questions(rows, quiz_id=None, title=None, duration_mode='per_question', duration_seconds=60,
+                     skip_invalid=False):
+    """Insert question_io.ImportRows as quiz questions, IMPORT_CHUNK_SIZE rows per executemany.
+
+    Rows are appended to quiz_id if given; otherwise each distinct quiz
+    title in the file (title for rows without one) becomes a new quiz.
+    Everything is one transaction: unless skip_invalid, a single invalid row
+    rolls the import back, though the rest of the file is still checked so
+    every error is reported. Returns a report dict.
+    """
+    # Plain executemany on the table: the ORM's per-row bookkeeping costs more than the insert
+    connection = db.session.connection()
+    insert_question = Question.__table__.insert()
+    targets = {}  # quiz title -> [quiz id, title, last order, questions added]
+    if quiz_id is not None:
+        quiz = db.session.get(Quiz, quiz_id)
+        if quiz is None:
+            raise LookupError(f'Quiz {quiz_id} not found')
+        last_order = db.session.query(func.coalesce(func.max(Question.order), 0)).filter(
+            Question.quiz_id == quiz_id).scalar()
+        fixed_target = [quiz.id, quiz.title, last_order, 0]
+    
+    pending, errors = [], []
+    error_count = imported = 0
+    for row in rows:
+        question = row.question
+        error = row.error
+        if question and quiz_id is None and not (question['quiz'] or title):
+            error = 'no quiz title (add a quiz column or give a title)'
+        if error:
+            error_count += 1
+            if len(errors) < IMPORT_ERRORS_LISTED:
+                errors.append({'row': row.row, 'error': error})
+            continue
+        if error_count and not skip_invalid:
+            continue
+        
+        if quiz_id is not None:
+            target = fixed_target
+        else:
+            quiz_title = question['quiz'] or title
+            target = targets.get(quiz_title)
+            if target is None:
+                new_quiz_id = connection.execute(Quiz.__table__.insert().values(
+                    title=quiz_title, num_questions=0, duration_mode=duration_mode,
+                    duration_seconds=duration_seconds)).inserted_primary_key[0]
+                target = targets[quiz_title] = [new_quiz_id, quiz_title, 0, 0]
+        target[2] += 1
+        target[3] += 1
+        pending.append({
+            'quiz_id': target[0],
+            'question_text': question['question'],
+            'option_a': question['option_a'],
+            'option_b': question['option_b'],
+            'option_c': question['option_c'],
+            'option_d': question['option_d'],
+            'correct_answer': question['correct_answer'],
+            'order': target[2]
+        })
+        if len(pending) == IMPORT_CHUNK_SIZE:
+            connection.execute(insert_question, pending)
+            imported += len(pending)
+            pending = []
+    
+    committed = skip_invalid or not error_count
+    quizzes = [fixed_target] if quiz_id is not None else list(targets.values())
+    if committed:
+        if pending:
+            connection.execute(insert_question, pending)
+            imported += len(pending)
+        for target_id, _, _, added in quizzes:
+            db.session.execute(db.update(Quiz).where(Quiz.id == target_id)
+                               .values(num_questions=Quiz.num_questions + added))
+        bump_catalog_version()
+        db.session.commit()
+        for target_id, _, _, _ in quizzes:
+            quiz_cache.invalidate(target_id)
+    else:
+        db.session.rollback()
+        imported = 0
+    return {
+        'committed': committed,
+        'imported': imported,
+        'quizzes': [{'id': target_id, 'title': quiz_title, 'added': added}
+                    for target_id, quiz_title, _, added in quizzes if committed and added],
+        'error_count': error_count,
+        'errors': errors
+    }
+
+def export_question_rows(quiz_id=None):
+    """Yield every quiz question (or one quiz's) as a dict for question_io.write_questions, in quiz order."""
+    stmt = (db.select(Quiz.title, *QUESTION_CONTENT)
+            .select_from(Question)
+            .join(Quiz, Quiz.id == Question.quiz_id)
+            .outerjoin(BankQuestion, BankQuestion.id == Question.bank_question_id)
+            .order_by(Question.quiz_id, Question.order, Question.id)
+            .execution_options(yield_per=1000, stream_results=True))
+    if quiz_id is not None:
+        stmt = stmt.where(Question.quiz_id == quiz_id)
+    for title, question_text, *rest in db.session.execute(stmt):
+        yield dict(zip(('option_a', 'option_b', 'option_c', 'option_d', 'correct_answer'), rest),
+                   quiz=title, question=question_text)
+
+@route('/admin/questions/import', methods=['POST'])
+@login_required
+def import_questions_upload():
+    """Import an uploaded question file (multipart field "file").
+
+    Form fields: format (csv, json or gift; default from the file name),
+    quiz_id to append to an existing quiz, otherwise title, duration_mode
+    and duration_seconds for the new quizzes, and skip_invalid.
+    """
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'error': 'Upload the questions as the "file" field'}), 400
+    file_format = request.form.get('format') or question_format(upload.filename)
+    if file_format not in QUESTION_FILE_FORMATS:
+        return jsonify({'error': 'format must be csv, json or gift'}), 400
+    quiz_id = request.form.get('quiz_id', type=int)
+    try:
+        duration_seconds = int(request.form.get('duration_seconds', 60))
+    except ValueError:
+        duration_seconds = 0
+    if duration_seconds < 1:
+        return jsonify({'error': 'duration_seconds must be a positive number'}), 400
+    
+    title = request.form.get('title') or os.path.splitext(upload.filename or '')[0] or None
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        report = import_questions(read_questions(stream, file_format), quiz_id=quiz_id, title=title,
+                                  duration_mode=request.form.get('duration_mode', 'per_question'),
+                                  duration_seconds=duration_seconds,
+                                  skip_invalid=request.form.get('skip_invalid') in ('on', 'true', '1'))
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    return jsonify(report), 201 if report['committed'] else 400
+
+@route('/admin/questions/export')
+@login_required
+def export_questions():
+    """Stream every question, or one quiz's (?quiz_id=), as CSV, JSON lines or GIFT (?format=)."""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    file_format = request.args.get('format', 'csv')
+    if file_format not in QUESTION_FILE_FORMATS:
+        return jsonify({'error': 'format must be csv, json or gift'}), 400
+    quiz_id = request.args.get('quiz_id', type=int)
+    if quiz_id is not None:
+        Quiz.query.get_or_404(quiz_id)
+    
+    mimetype, extension = QUESTION_FILE_MIMETYPES[file_format]
+    filename = f'quiz_{quiz_id}_questions.{extension}' if quiz_id else f'questions.{extension}'
+    return Response(stream_with_context(write_questions(export_question_rows(quiz_id), file_format)),
+                    mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 # Initialize database and create admin user
-def create_tables():
+def add_missing_columns():
+    """Add model columns that an existing table lacks. Returns the names added.
+
+    Only nullable columns, or ones with a server default, can be added to a
+    table that already has rows.
+    """
+    inspector = db.inspect(db.engine)
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                db.session.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+                added.append(f'{table.name}.{column.name}')
+    db.session.commit()
+    return added
+
+def setup_bank_search():
+    """Create the full-text index over bank question text.
+
+    SQLite gets an FTS5 table kept in sync with bank_question by triggers,
+    PostgreSQL a GIN index on to_tsvector(). Elsewhere, or on a SQLite build
+    without FTS5, search falls back to LIKE.
+    """
+    _services()['bank_search_mode'] = None
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(db.text(
+            f"CREATE INDEX IF NOT EXISTS ix_bank_question_search ON bank_question USING GIN ({BANK_TSVECTOR_SQL})"))
+    elif dialect == 'sqlite':
+        if db.inspect(db.engine).has_table('bank_question_fts'):
+            return
+        try:
+            db.session.execute(db.text(
+                "CREATE VIRTUAL TABLE bank_question_fts USING fts5("
+                "question_text, content='bank_question', content_rowid='id', tokenize='porter unicode61')"))
+        except OperationalError as e:
+            db.session.rollback()
+            current_app.logger.warning('FTS5 unavailable, question bank search will use LIKE: %s', e)
+            return
+        for statement in (
+            "CREATE TRIGGER bank_question_fts_insert AFTER INSERT ON bank_question BEGIN "
+            "INSERT INTO bank_question_fts (rowid, question_text) VALUES (new.id, new.question_text); END",
+            "CREATE TRIGGER bank_question_fts_delete AFTER DELETE ON bank_question BEGIN "
+            "INSERT INTO bank_question_fts (bank_question_fts, rowid, question_text) "
+            "VALUES ('delete', old.id, old.question_text); END",
+            "CREATE TRIGGER bank_question_fts_update AFTER UPDATE OF question_text ON bank_question BEGIN "
+            "INSERT INTO bank_question_fts (bank_question_fts, rowid, question_text) "
+            "VALUES ('delete', old.id, old.question_text); "
+            "INSERT INTO bank_question_fts (rowid, question_text) VALUES (new.id, new.question_text); END",
+            # Index whatever the bank already holds
+            "INSERT INTO bank_question_fts (bank_question_fts) VALUES ('rebuild')"):
+            db.session.execute(db.text(statement))
+    db.session.commit()
+
+def backfill_attempt_deadlines():
+    """Give open attempts from before deadlines were stored the most generous deadline their quiz allows."""
+    for quiz in Quiz.query:
+        allowance = quiz.duration_seconds
+        if quiz.duration_mode == 'per_question':
+            allowance *= quiz.questions_per_attempt
+        rows = (db.session.query(Attempt.id, Attempt.start_time)
+                .filter(Attempt.quiz_id == quiz.id, Attempt.is_completed == False, Attempt.deadline == None))
+        deadlines = [{'id': attempt_id, 'deadline': start_time + timedelta(seconds=allowance)}
+                     for attempt_id, start_time in rows if start_time]
+        if deadlines:
+            db.session.execute(db.update(Attempt), deadlines)
+    db.session.commit()
+
+def upgrade_schema():
+    """Bring an existing database up to the current schema.
+
+    db.create_all() only creates missing tables, so columns and indexes
+    declared on tables that already exist are added here. Duplicate answers left over
+    from before the (attempt_id, question_id) unique index are removed first
+    and the progress they inflated is recounted: score, current question, and
+    whether the attempt is completed.
+    """
+    missing_stats = not db.inspect(db.engine).has_table(QuizStats.__tablename__)
     db.create_all()
+    added = add_missing_columns()
+    for column in added:
+        print(f"Added column {column}")
+    if 'attempt.deadline' in added:
+        backfill_attempt_deadlines()
+    setup_bank_search()
+    
+    duplicates = (db.session.query(Answer.attempt_id, Answer.question_id, func.min(Answer.id))
+                  .group_by(Answer.attempt_id, Answer.question_id)
+                  .having(func.count(Answer.id) > 1)
+                  .all())
+    for attempt_id, question_id, keep_id in duplicates:
+        Answer.query.filter(Answer.attempt_id == attempt_id,
+                            Answer.question_id == question_id,
+                            Answer.id != keep_id).delete(synchronize_session=False)
+    reopened = False
+    for attempt_id in {attempt_id for attempt_id, _, _ in duplicates}:
+        # Every duplicate also advanced the attempt, and may have completed it early
+        attempt = db.session.get(Attempt, attempt_id)
+        attempt.current_question = Answer.query.filter_by(attempt_id=attempt_id).count()
+        attempt.score = Answer.query.filter_by(attempt_id=attempt_id, is_correct=True).count()
+        completed = attempt.current_question >= attempt.quiz.questions_per_attempt
+        if attempt.is_completed and not completed:
+            attempt.is_completed = False
+            attempt.end_time = None
+            reopened = True
+    db.session.commit()
+    if reopened:
+        # So the expiry sweep closes them once their time is up
+        backfill_attempt_deadlines()
+    
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    
+    if duplicates:
+        print(f"Removed duplicate answers for {len(duplicates)} question(s)")
+    
+    # Summary tables added to a database that already has results start from a rebuild
+    if missing_stats or duplicates:
+        for quiz_id, in db.session.query(Quiz.id):
+            rebuild_results_stats(quiz_id)
+        db.session.commit()
+
+@commands.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables and indexes in an existing database."""
+    upgrade_schema()
+    print("Database schema is up to date")
+
+@commands.command('bootstrap')
+def bootstrap_command():
+    """Create or upgrade the schema and the default admin; run once per deploy, before starting servers."""
+    start = time.perf_counter()
+    create_tables()
+    print(f"Database ready in {time.perf_counter() - start:.1f}s")
+
+@commands.command('set-password')
+@click.argument('email')
+@click.password_option()
+def set_password_command(email, password):
+    """Set a user's password; sessions opened with the old one stop working."""
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        raise click.UsageError(f'No user with email {email}')
+    user.set_password(password)
+    db.session.commit()
+    print(f"Password changed for {email}; other server processes drop old sessions within "
+          f"{current_app.config['USER_CACHE_TTL_SECONDS']:g}s")
+
+def time_password_hash(method, rounds=3):
+    """Median seconds generate_password_hash takes with method on this machine."""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        generate_password_hash('calibration password', method=method)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+@commands.command('calibrate-password-hash')
+@click.option('--budget-ms', type=click.IntRange(min=1), default=250, show_default=True,
+              help='Time one admin login may spend hashing')
+def calibrate_password_hash_command(budget_ms):
+    """Measure hashing cost here and suggest a PASSWORD_HASH_METHOD that fits the budget."""
+    configured = current_app.config['PASSWORD_HASH_METHOD']
+    print(f"Configured {configured}: {time_password_hash(configured) * 1000:.0f} ms")
+    
+    # PBKDF2 cost is linear in the iteration count; scale from a probe, then check
+    probe = 100_000
+    per_iteration = time_password_hash(f'pbkdf2:sha256:{probe}') / probe
+    iterations = max(10_000, int(budget_ms / 1000 / per_iteration) // 10_000 * 10_000)
+    method = f'pbkdf2:sha256:{iterations}'
+    print(f"Suggested PASSWORD_HASH_METHOD={method}: {time_password_hash(method) * 1000:.0f} ms "
+          f"(budget {budget_ms} ms)")
+    if iterations < 600_000:
+        print("Below the 600000 iterations OWASP recommends for PBKDF2-SHA256; consider a larger budget")
+
+@commands.command('rebuild-stats')
+@click.option('--quiz-id', type=int, help='Only this quiz (default: every quiz)')
+@click.option('--check', is_flag=True, help='Report summary rows that disagree with Attempt/Answer without changing them')
+def rebuild_stats_command(quiz_id, check):
+    """Recompute the results summary tables from Attempt and Answer."""
+    quiz_ids = [quiz_id] if quiz_id else [quiz_id for quiz_id, in db.session.query(Quiz.id).order_by(Quiz.id)]
+    stale = 0
+    for quiz_id in quiz_ids:
+        expected = compute_results_stats(quiz_id)
+        if read_results_stats(quiz_id) == expected:
+            continue
+        stale += 1
+        if check:
+            print(f"Quiz {quiz_id}: summary rows are out of date")
+        else:
+            rebuild_results_stats(quiz_id)
+            print(f"Quiz {quiz_id}: rebuilt")
+    db.session.commit()
+    print(f"{len(quiz_ids)} quiz(zes) checked, {stale} out of date")
+    if check and stale:
+        raise SystemExit(1)
+
+@commands.command('expire-attempts')
+def expire_attempts_command():
+    """Close open attempts whose time has run out (what the background sweeper does)."""
+    total = 0
+    while True:
+        closed = expire_overdue_attempts()
+        total += closed
+        if closed < EXPIRY_BATCH_SIZE:
+            break
+    print(f"Closed {total} overdue attempt(s)")
+
+@commands.command('build-dedup-index')
+def build_dedup_index_command():
+    """Fingerprint every question that has no fingerprint yet and report the index size."""
+    start = time.perf_counter()
+    index = get_question_index()
+    print(f"Indexed {len(index)} question(s) in {time.perf_counter() - start:.1f}s")
+
+@commands.command('import-questions')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(QUESTION_FILE_FORMATS), help='Default: from the file extension')
+@click.option('--quiz-id', type=int, help='Append every question to this quiz')
+@click.option('--title', help='Quiz title for rows without a quiz column (default: the file name)')
+@click.option('--duration-mode', type=click.Choice(['per_question', 'overall']), default='per_question', show_default=True)
+@click.option('--duration-seconds', type=click.IntRange(min=1), default=60, show_default=True)
+@click.option('--skip-invalid', is_flag=True, help='Import the valid rows even if some are invalid')
+def import_questions_command(path, file_format, quiz_id, title, duration_mode, duration_seconds, skip_invalid):
+    """Import quiz questions from a CSV, JSON or GIFT file."""
+    file_format = file_format or question_format(path)
+    if file_format is None:
+        raise click.UsageError('Cannot tell the format from the file name; pass --format')
+    title = title or os.path.splitext(os.path.basename(path))[0]
+    
+    start = time.perf_counter()
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        try:
+            report = import_questions(read_questions(f, file_format), quiz_id=quiz_id, title=title,
+                                      duration_mode=duration_mode, duration_seconds=duration_seconds,
+                                      skip_invalid=skip_invalid)
+        except LookupError as e:
+            raise click.UsageError(str(e))
+    for error in report['errors']:
+        print(f"Row {error['row']}: {error['error']}")
+    if report['error_count'] > len(report['errors']):
+        print(f"... {report['error_count'] - len(report['errors'])} more invalid row(s)")
+    for quiz in report['quizzes']:
+        print(f"Quiz {quiz['id']} ({quiz['title']}): {quiz['added']} question(s) added")
+    if not report['committed']:
+        print(f"Nothing imported: {report['error_count']} invalid row(s); fix them or pass --skip-invalid")
+        raise SystemExit(1)
+    print(f"Imported {report['imported']} question(s) in {time.perf_counter() - start:.1f}s")
+
+@commands.command('export-questions')
+@click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'file_format', type=click.Choice(QUESTION_FILE_FORMATS), default='csv', show_default=True)
+@click.option('--quiz-id', type=int, help='Only this quiz (default: every quiz)')
+def export_questions_command(output, file_format, quiz_id):
+    """Write quiz questions as CSV, JSON lines or GIFT to OUTPUT (default: stdout)."""
+    for chunk in write_questions(export_question_rows(quiz_id), file_format):
+        output.write(chunk)
+
+def create_app(config=None):
+    """Build an app from a Config class (or its import path), with its own services.
+
+    Defaults to the QUIZ_CONFIG environment variable, then config.Config.
+    Every call returns a new app with its own caches, buffers and background
+    workers, so tests can build one per configuration. `flask --app app`
+    finds this factory by itself; servers call it once per process.
+    """
+    settings = config or os.environ.get('QUIZ_CONFIG') or Config
+    if isinstance(settings, str):
+        settings = import_string(settings)
+    
+    app = Flask(__name__)
+    app.config.from_object(settings)
+    for key, filename in (('QUIZ_CACHE_SYNC_PATH', 'quiz_cache.sync'), ('ANSWER_LOG_PATH', 'answers.log'),
+                          ('GENERATION_CACHE_PATH', 'generation_cache.db'), ('LIVE_EVENTS_SOCKET_DIR', 'live')):
+        if app.config[key] is None:
+            app.config[key] = os.path.join(app.instance_path, filename)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = settings.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLITE_PRAGMAS'] = settings.sqlite_pragmas()
+    
+    db.init_app(app)
+    login_manager.init_app(app)
+    services = app.extensions['gmu_quiz'] = dict.fromkeys(
+        ('request_metrics', 'answer_buffer', 'generation_cache', 'question_index', 'question_removal_id',
+         'question_generator', 'bank_search_mode', 'generation_jobs_resumed_pid', 'password_hash_prefix'))
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', sqlite_pragma_listener(app.config['SQLITE_PRAGMAS']))
+        if app.config['METRICS_ENABLED']:
+            services['request_metrics'] = RequestMetrics(
+                n_plus_one_threshold=app.config['METRICS_N_PLUS_ONE_THRESHOLD'])
+            services['request_metrics'].init_app(app, db.engine)
+    
+    for rule, view, options in _routes:
+        # A copy, so the registry stays intact for the next app
+        options = dict(options)
+        app.add_url_rule(rule, options.pop('endpoint', None), view, **options)
+    for f in _before_request_funcs:
+        app.before_request(f)
+    for command in commands.commands.values():
+        app.cli.add_command(command)
+    
+    # The sync file carries invalidations between worker processes
+    if app.config['QUIZ_CACHE_SYNC_PATH']:
+        os.makedirs(os.path.dirname(os.path.abspath(app.config['QUIZ_CACHE_SYNC_PATH'])), exist_ok=True)
+    services['quiz_cache'] = QuizCache(maxsize=app.config['QUIZ_CACHE_SIZE'],
+                                       sync_path=app.config['QUIZ_CACHE_SYNC_PATH'] or None, logger=app.logger,
+                                       sync_max_bytes=app.config['QUIZ_CACHE_SYNC_MAX_BYTES'])
+    services['user_cache'] = UserCache(maxsize=app.config['USER_CACHE_SIZE'],
+                                       ttl_seconds=app.config['USER_CACHE_TTL_SECONDS'])
+    services['catalog_cache'] = CatalogCache(maxsize=app.config['CATALOG_CACHE_SIZE'],
+                                             ttl_seconds=app.config['CATALOG_VERSION_TTL_SECONDS'])
+    # Worker processes pass live events to each other's monitors through Unix sockets
+    if app.config['LIVE_EVENTS_SOCKET_DIR'] and os.name == 'posix':
+        live_backend = SocketBackend(app.config['LIVE_EVENTS_SOCKET_DIR'], logger=app.logger)
+    else:
+        live_backend = LocalBackend()
+    services['live_events'] = LiveEventBroker(live_backend, queue_size=app.config['LIVE_EVENTS_QUEUE_SIZE'])
+    
+    if app.config['ANSWER_WRITE_BEHIND']:
+        buffer = services['answer_buffer'] = AnswerBuffer(
+            functools.partial(flush_buffered_answers, app),
+            app.config['ANSWER_LOG_PATH'],
+            flush_interval_ms=app.config['ANSWER_FLUSH_INTERVAL_MS'],
+            flush_max_rows=app.config['ANSWER_FLUSH_MAX_ROWS'],
+            logger=app.logger
+        )
+        replayed = buffer.recover()
+        if replayed:
+            app.logger.warning('Recovered %d buffered answer(s) from %s', replayed, app.config['ANSWER_LOG_PATH'])
+        atexit.register(buffer.close)
+    
+    if app.config['GENERATION_CACHE_PATH']:
+        services['generation_cache'] = GenerationCache(
+            app.config['GENERATION_CACHE_PATH'],
+            ttl_seconds=app.config['GENERATION_CACHE_TTL_SECONDS'],
+            max_entries=app.config['GENERATION_CACHE_MAX_ENTRIES']
+        )
+    services['generation_queue'] = JobQueue(functools.partial(run_generation_job, app),
+                                            max_workers=app.config['GENERATION_WORKERS'], name='quiz-generation',
+                                            logger=app.logger)
+    atexit.register(services['generation_queue'].shutdown)
+    services['attempt_sweeper'] = PeriodicTask(functools.partial(sweep_expired_attempts, app),
+                                               app.config['ATTEMPT_SWEEP_INTERVAL_SECONDS'],
+                                               name='attempt-expiry-sweeper', logger=app.logger)
+    return app
+
+def warm_quiz_cache(limit=None):
+    """Load snapshots (questions and answer keys) of the newest quizzes, up to the cache size. Returns how many."""
+    limit = min(limit or quiz_cache.maxsize, quiz_cache.maxsize)
+    quiz_ids = [quiz_id for quiz_id, in db.session.query(Quiz.id).order_by(Quiz.created_at.desc()).limit(limit)]
+    # Oldest first, so the newest quizzes end up most recently used
+    for quiz_id in reversed(quiz_ids):
+        get_quiz_snapshot(quiz_id)
+    return len(quiz_ids)
+
+def needs_bootstrap():
+    """True if the database has no tables yet; one cheap query instead of a full schema check."""
+    return not db.inspect(db.engine).has_table(Quiz.__tablename__)
+
+def create_tables():
+    """Bring the schema up to date and create the default admin. Run once per deploy, not per boot."""
+    upgrade_schema()
     
     # Create admin user if it doesn't exist
     admin = User.query.filter_by(email='admin@gmu.edu').first()
@@ -422,7 +2887,9 @@ def create_tables():
         print("Admin user created: admin@gmu.edu / admin123")
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        create_tables()
+        if needs_bootstrap():
+            create_tables()
     
     app.run(debug=True)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+GMU Quiz Land - Answer Race Stress Test
+Has simulated students submit every answer several times at once and in
+parallel with their other answers (double clicks, retried requests,
+out-of-order batches), then checks that each attempt counted every question
+exactly once and that the results summary tables agree with the answers.
+Exits non-zero if anything was lost or counted twice.
+
+Usage: python benchmarks/answer_race.py [--students 10] [--questions 10] [--copies 3]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from submit_load import free_port  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=10, help='simulated students')
+    parser.add_argument('--questions', type=int, default=10, help='questions in the quiz')
+    parser.add_argument('--copies', type=int, default=3, help='simultaneous submissions of each answer')
+    parser.add_argument('--profile', default='production', help='STORAGE_PROFILE for the server')
+    parser.add_argument('--write-behind', action='store_true', help='run the server with ANSWER_WRITE_BEHIND=1')
+    return parser.parse_args()
+
+
+def start_student(base_url, quiz_id):
+    http = requests.Session()
+    http.post(f'{base_url}/student/start-quiz/{quiz_id}', data={'student_name': 'Race Tester'},
+              allow_redirects=False, timeout=60)
+    return http, http.get(f'{base_url}/student/quiz-session/{quiz_id}', timeout=60).json()['questions']
+
+
+def submit(http, base_url, barrier, question, statuses, lock):
+    # Even positions are answered correctly (every seeded answer is A)
+    answer = 'A' if question['position'] % 2 == 0 else 'B'
+    barrier.wait()
+    try:
+        status = http.post(f'{base_url}/student/submit-answer',
+                           json={'question_id': question['id'], 'selected_answer': answer}, timeout=120).status_code
+    except requests.RequestException:
+        status = 'error'
+    with lock:
+        statuses[status] += 1
+
+
+def check(database_url, expected_score, args):
+    """Compare every attempt and the summary tables with the stored answers. Returns a list of problems."""
+    os.environ['DATABASE_URL'] = database_url
+    import app as appmod
+
+    problems = []
+    with appmod.create_app().app_context():
+        db, Attempt, Answer = appmod.db, appmod.Attempt, appmod.Answer
+        for attempt in Attempt.query.order_by(Attempt.id):
+            answers = Answer.query.filter_by(attempt_id=attempt.id).all()
+            per_question = Counter(answer.question_id for answer in answers)
+            if len(answers) != args.questions or max(per_question.values(), default=0) > 1:
+                problems.append(f"attempt {attempt.id}: {len(answers)} answers stored for {len(per_question)} questions")
+            if attempt.current_question != len(answers):
+                problems.append(f"attempt {attempt.id}: current_question {attempt.current_question} != {len(answers)} answers")
+            if attempt.score != sum(answer.is_correct for answer in answers) or attempt.score != expected_score:
+                problems.append(f"attempt {attempt.id}: score {attempt.score}, expected {expected_score}")
+            if not attempt.is_completed:
+                problems.append(f"attempt {attempt.id}: not completed")
+        for quiz_id, in db.session.query(appmod.Quiz.id):
+            if appmod.read_results_stats(quiz_id) != appmod.compute_results_stats(quiz_id):
+                problems.append(f"quiz {quiz_id}: summary tables disagree with the stored answers")
+    return problems
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='gmu_quiz_race_')
+    database_url = 'sqlite:///' + os.path.join(workdir, 'race.db')
+    env = dict(os.environ, STORAGE_PROFILE=args.profile, DATABASE_URL=database_url,
+               ANSWER_LOG_PATH=os.path.join(workdir, 'answers.log'))
+    if args.write_behind:
+        env['ANSWER_WRITE_BEHIND'] = '1'
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'benchmarks', 'submit_load.py'), '--serve', '--port', str(port),
+         '--questions', str(args.questions)],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    statuses, lock = Counter(), threading.Lock()
+    try:
+        line = server.stdout.readline()
+        while line and not line.startswith('READY'):
+            line = server.stdout.readline()
+        if not line:
+            raise RuntimeError('server failed to start')
+        quiz_id = int(line.split()[1])
+        base_url = f'http://127.0.0.1:{port}'
+
+        students = [start_student(base_url, quiz_id) for _ in range(args.students)]
+        threads = []
+        barrier = threading.Barrier(args.students * args.questions * args.copies)
+        for http, questions in students:
+            for position, question in enumerate(questions):
+                for _ in range(args.copies):
+                    threads.append(threading.Thread(target=submit, args=(
+                        http, base_url, barrier, dict(question, position=position), statuses, lock)))
+        print(f"{args.students} students x {args.questions} answers x {args.copies} copies "
+              f"= {len(threads)} simultaneous requests")
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    print('responses: ' + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str)))
+    problems = check(database_url, (args.questions + 1) // 2, args)
+    for problem in problems:
+        print('FAIL ' + problem)
+    if problems:
+        sys.exit(1)
+    print('OK: every answer counted exactly once')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+GMU Quiz Land - Exam Flow Benchmark
+Seeds a fresh database with copies of the demo quizzes (demo_data) and a
+history of finished attempts, then has concurrent simulated students go
+through the whole exam: student_quizzes, start_quiz, take_quiz, quiz_session, one
+submit_answer per question and student_quiz_results. Reports throughput,
+latency percentiles and SQL statements per request for each endpoint.
+
+Requests go through the Flask test client in this process (default) or over
+real sockets to a threaded server in a child process (--mode socket).
+Save a run with --save and compare later runs against it with --baseline
+to catch regressions: more statements per request, or a p95 latency more
+than --tolerance worse, fails the run.
+
+Usage: python benchmarks/exam_flow.py [--students 50] [--sessions 2] [--mode client|socket]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from submit_load import free_port, percentile  # noqa: E402
+
+ENDPOINTS = ('student_quizzes', 'start_quiz', 'take_quiz', 'quiz_session', 'submit_answer', 'student_quiz_results')
+QUERY_HEADER = 'X-Benchmark-Queries'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=50, help='concurrent simulated students')
+    parser.add_argument('--sessions', type=int, default=2, help='exams each student takes, one after another')
+    parser.add_argument('--demo-copies', type=int, default=10, help='times to run demo_data.create_demo_data')
+    parser.add_argument('--history', type=int, default=200, help='finished attempts to seed per quiz')
+    parser.add_argument('--think-ms', type=int, default=0, help='maximum random pause between answers')
+    parser.add_argument('--mode', choices=('client', 'socket'), default='client')
+    parser.add_argument('--database-url', help='seed and run against this (empty) database instead of a temporary SQLite file')
+    parser.add_argument('--save', metavar='PATH', help='write the results as JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='compare with results saved by --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 slowdown against the baseline')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for answers and history')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def seed_database(app, args):
+    """Create the schema, the demo quizzes and a history of finished attempts. Returns the quiz ids."""
+    import app as appmod
+    from demo_data import create_demo_data
+
+    db, Attempt, Answer, Question = appmod.db, appmod.Attempt, appmod.Answer, appmod.Question
+    with app.app_context():
+        with contextlib.redirect_stdout(io.StringIO()):
+            appmod.create_tables()
+            for _ in range(args.demo_copies):
+                create_demo_data(app)
+
+        rng = random.Random(args.seed)
+        now = datetime.utcnow()
+        quiz_ids = [quiz_id for quiz_id, in db.session.query(appmod.Quiz.id).order_by(appmod.Quiz.id)]
+        for quiz_id in quiz_ids:
+            questions = db.session.query(Question.id, Question.correct_answer).filter_by(quiz_id=quiz_id).all()
+            first_id = (db.session.query(db.func.max(Attempt.id)).scalar() or 0) + 1
+            attempts, answers = [], []
+            for attempt_id in range(first_id, first_id + args.history):
+                started = now - timedelta(minutes=rng.randint(10, 60 * 24 * 14))
+                picks = [(question_id, rng.choice('ABCD'), correct) for question_id, correct in questions]
+                attempts.append({
+                    'id': attempt_id, 'quiz_id': quiz_id, 'student_name': f'Past student {attempt_id}',
+                    'start_time': started, 'end_time': started + timedelta(minutes=rng.randint(1, 10)),
+                    'current_question': len(picks), 'score': sum(pick == correct for _, pick, correct in picks),
+                    'is_completed': True
+                })
+                answers.extend({'attempt_id': attempt_id, 'question_id': question_id, 'selected_answer': pick,
+                                'is_correct': pick == correct, 'answered_at': started}
+                               for question_id, pick, correct in picks)
+            if attempts:
+                db.session.execute(db.insert(Attempt), attempts)
+                db.session.execute(db.insert(Answer), answers)
+            appmod.rebuild_results_stats(quiz_id)
+        db.session.commit()
+    return quiz_ids
+
+
+def count_queries(app, db):
+    """Report the SQL statements each request ran in a response header."""
+    from sqlalchemy import event
+
+    local = threading.local()
+
+    def before_cursor_execute(*_):
+        local.count = getattr(local, 'count', 0) + 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    @app.before_request
+    def reset_query_count():
+        local.count = 0
+
+    @app.after_request
+    def add_query_count(response):
+        response.headers[QUERY_HEADER] = str(getattr(local, 'count', 0))
+        return response
+
+
+def serve(args):
+    """Child process for --mode socket: seed, then run a threaded server until killed."""
+    from werkzeug.serving import make_server
+    import app as appmod
+
+    app = appmod.create_app()
+    quiz_ids = seed_database(app, args)
+    count_queries(app, appmod.db)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    print('READY ' + ','.join(map(str, quiz_ids)), flush=True)
+    server.serve_forever()
+
+
+class TestClientSession:
+    """One student's cookies, with requests going through the Flask test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, **kwargs):
+        response = self.client.open(path, method=method, **kwargs)
+        return response.status_code, response.headers.get(QUERY_HEADER), response.get_json(silent=True)
+
+
+class SocketSession:
+    """One student's cookies, with requests going over HTTP to base_url."""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url
+        self.http = requests.Session()
+
+    def request(self, method, path, data=None, json=None):
+        response = self.http.request(method, self.base_url + path, data=data, json=json,
+                                     allow_redirects=False, timeout=120)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, response.headers.get(QUERY_HEADER), body
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def call(self, session, endpoint, method, path, expected, **kwargs):
+        start = time.perf_counter()
+        try:
+            status, queries, body = session.request(method, path, **kwargs)
+        except Exception:
+            status, queries, body = None, None, None
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            if queries is not None:
+                self.queries[endpoint].append(int(queries))
+            if status not in expected:
+                self.errors[endpoint] += 1
+        return body
+
+
+def take_exam(new_session, recorder, quiz_id, rng, think_ms):
+    session = new_session()
+    recorder.call(session, 'student_quizzes', 'GET', '/student/quizzes', (200,))
+    recorder.call(session, 'start_quiz', 'POST', f'/student/start-quiz/{quiz_id}', (302,),
+                  data={'student_name': 'Benchmark Student'})
+    recorder.call(session, 'take_quiz', 'GET', f'/student/take-quiz/{quiz_id}', (200,))
+    body = recorder.call(session, 'quiz_session', 'GET', f'/student/quiz-session/{quiz_id}', (200,))
+    for question in (body or {}).get('questions', []):
+        if think_ms:
+            time.sleep(rng.uniform(0, think_ms) / 1000)
+        recorder.call(session, 'submit_answer', 'POST', '/student/submit-answer', (200,),
+                      json={'question_id': question['id'], 'selected_answer': rng.choice('ABCD')})
+    recorder.call(session, 'student_quiz_results', 'GET', f'/student/quiz-results/{quiz_id}', (200,))
+
+
+def run_students(new_session, quiz_ids, args):
+    recorder = Recorder()
+    barrier = threading.Barrier(args.students + 1)
+
+    def student(number):
+        rng = random.Random(args.seed * 100003 + number)
+        barrier.wait()
+        for session_number in range(args.sessions):
+            quiz_id = quiz_ids[(number + session_number) % len(quiz_ids)]
+            take_exam(new_session, recorder, quiz_id, rng, args.think_ms)
+
+    threads = [threading.Thread(target=student, args=(number,)) for number in range(args.students)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
+
+
+def summarize(recorder, wall, args):
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        latencies = recorder.latencies[endpoint]
+        queries = recorder.queries[endpoint]
+        endpoints[endpoint] = {
+            'requests': len(latencies),
+            'errors': recorder.errors[endpoint],
+            'throughput': len(latencies) / wall if wall else 0.0,
+            'p50': statistics.median(latencies) if latencies else 0.0,
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'queries': statistics.mean(queries) if queries else None
+        }
+    return {
+        'mode': args.mode,
+        'students': args.students,
+        'sessions': args.students * args.sessions,
+        'wall_seconds': wall,
+        'exams_per_second': args.students * args.sessions / wall if wall else 0.0,
+        'endpoints': endpoints
+    }
+
+
+def report(results):
+    print(f"{results['sessions']} exams by {results['students']} concurrent students ({results['mode']} mode) "
+          f"in {results['wall_seconds']:.1f}s: {results['exams_per_second']:.1f} exams/s")
+    print(f"{'endpoint':<22}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'errors':>8}")
+    for endpoint, row in results['endpoints'].items():
+        queries = f"{row['queries']:.1f}" if row['queries'] is not None else '-'
+        print(f"{endpoint:<22}{row['requests']:>9}{row['throughput']:>9.1f}{row['p50']:>9.1f}"
+              f"{row['p95']:>9.1f}{row['p99']:>9.1f}{queries:>9}{row['errors']:>8}")
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for endpoint, row in results['endpoints'].items():
+        before = baseline['endpoints'].get(endpoint)
+        if not before:
+            continue
+        if row['queries'] is not None and before['queries'] is not None and row['queries'] > before['queries'] + 0.05:
+            found.append(f"{endpoint}: {row['queries']:.1f} statements per request, was {before['queries']:.1f}")
+        if before['p95'] and row['p95'] > before['p95'] * (1 + tolerance):
+            found.append(f"{endpoint}: p95 {row['p95']:.1f} ms, was {before['p95']:.1f} ms")
+        if row['errors'] > before['errors']:
+            found.append(f"{endpoint}: {row['errors']} errors, was {before['errors']}")
+    return found
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='gmu_quiz_exam_')
+    database_url = args.database_url or 'sqlite:///' + os.path.join(workdir, 'exam.db')
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('ANSWER_LOG_PATH', os.path.join(workdir, 'answers.log'))
+    if args.serve:
+        serve(args)
+        return
+
+    if args.mode == 'client':
+        import app as appmod
+        app = appmod.create_app()
+        quiz_ids = seed_database(app, args)
+        count_queries(app, appmod.db)
+        recorder, wall = run_students(lambda: TestClientSession(app), quiz_ids, args)
+    else:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port),
+             '--demo-copies', str(args.demo_copies), '--history', str(args.history), '--seed', str(args.seed)],
+            cwd=ROOT, env=dict(os.environ), stdout=subprocess.PIPE, text=True)
+        try:
+            line = server.stdout.readline()
+            while line and not line.startswith('READY'):
+                line = server.stdout.readline()
+            if not line:
+                raise RuntimeError('server failed to start')
+            quiz_ids = [int(quiz_id) for quiz_id in line.split()[1].split(',')]
+            base_url = f'http://127.0.0.1:{port}'
+            recorder, wall = run_students(lambda: SocketSession(base_url), quiz_ids, args)
+        finally:
+            server.terminate()
+            server.wait()
+
+    results = summarize(recorder, wall, args)
+    report(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for regression in found:
+            print('REGRESSION ' + regression)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+GMU Quiz Land - Index Benchmark
+Times the queries behind quiz_results and take_quiz on a large synthetic
+database, first without the secondary indexes and then after upgrade_schema()
+
+Usage: python benchmarks/indexes.py [--attempts 100000] [--quizzes 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attempts', type=int, default=100000, help='total attempts to seed')
+    parser.add_argument('--quizzes', type=int, default=50, help='number of quizzes')
+    parser.add_argument('--questions', type=int, default=20, help='questions per quiz')
+    parser.add_argument('--answers', type=int, default=5, help='answers stored per attempt')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per query')
+    return parser.parse_args()
+
+
+def seed(db, Quiz, Question, Attempt, Answer, args):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    db.session.execute(db.insert(Quiz), [{
+        'id': quiz_id,
+        'title': f'Quiz {quiz_id}',
+        'num_questions': args.questions,
+        'duration_mode': 'overall',
+        'duration_seconds': 600
+    } for quiz_id in range(1, args.quizzes + 1)])
+
+    db.session.execute(db.insert(Question), [{
+        'id': (quiz_id - 1) * args.questions + n,
+        'quiz_id': quiz_id,
+        'question_text': f'Question {n} of quiz {quiz_id}?',
+        'option_a': 'A', 'option_b': 'B', 'option_c': 'C', 'option_d': 'D',
+        'correct_answer': 'A',
+        'order': n
+    } for quiz_id in range(1, args.quizzes + 1) for n in range(1, args.questions + 1)])
+
+    batch = 20000
+    for start in range(1, args.attempts + 1, batch):
+        attempts, answers = [], []
+        for attempt_id in range(start, min(start + batch, args.attempts + 1)):
+            quiz_id = rng.randint(1, args.quizzes)
+            completed = rng.random() < 0.9
+            started = now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+            attempts.append({
+                'id': attempt_id,
+                'quiz_id': quiz_id,
+                'student_name': f'Student {attempt_id}',
+                'start_time': started,
+                'end_time': started + timedelta(minutes=10) if completed else None,
+                'current_question': args.answers,
+                'is_completed': completed,
+                'score': rng.randint(0, args.answers)
+            })
+            for n in range(1, args.answers + 1):
+                answers.append({
+                    'attempt_id': attempt_id,
+                    'question_id': (quiz_id - 1) * args.questions + n,
+                    'selected_answer': rng.choice('ABCD'),
+                    'is_correct': rng.random() < 0.5,
+                    'answered_at': started
+                })
+        db.session.execute(db.insert(Attempt), attempts)
+        db.session.execute(db.insert(Answer), answers)
+    db.session.commit()
+
+
+def time_query(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run_queries(appmod, args):
+    rng = random.Random(7)
+    db, Quiz, Question, Attempt, Answer = appmod.db, appmod.Quiz, appmod.Question, appmod.Attempt, appmod.Answer
+
+    def quiz_results():
+        quiz_id = rng.randint(1, args.quizzes)
+        Attempt.query.filter_by(quiz_id=quiz_id, is_completed=True).order_by(Attempt.end_time.desc()).all()
+
+    def take_quiz():
+        # Cold-cache take_quiz: the attempt plus the ordered question list
+        attempt_id = rng.randint(1, args.attempts)
+        attempt = db.session.get(Attempt, attempt_id)
+        Question.query.filter_by(quiz_id=attempt.quiz_id).order_by(Question.order).all()
+
+    def attempt_answers():
+        # student_quiz_results and the duplicate-answer check in submit_answer
+        Answer.query.filter_by(attempt_id=rng.randint(1, args.attempts)).all()
+
+    results = {}
+    for name, fn in (('quiz_results', quiz_results), ('take_quiz', take_quiz),
+                     ('answers_by_attempt', attempt_answers)):
+        fn()
+        results[name] = time_query(fn, args.repeat)
+        db.session.remove()
+    return results
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='gmu_quiz_bench_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    import app as appmod
+    db = appmod.db
+
+    with appmod.create_app().app_context():
+        db.create_all()
+        print(f"Seeding {args.attempts} attempts across {args.quizzes} quizzes...")
+        start = time.perf_counter()
+        seed(db, appmod.Quiz, appmod.Question, appmod.Attempt, appmod.Answer, args)
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+        # Start from the pre-index schema
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(db.engine, checkfirst=True)
+        before = run_queries(appmod, args)
+
+        appmod.upgrade_schema()
+        db.session.execute(db.text('ANALYZE'))
+        after = run_queries(appmod, args)
+
+    print()
+    print(f"{'query':<22}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+    for name in before:
+        print(f"{name:<22}{before[name]:>14.2f}{after[name]:>14.2f}{before[name] / after[name]:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+GMU Quiz Land - Question Import Benchmark
+Writes a synthetic question file in each format, times importing it into a
+throwaway database and exporting it again, and checks the round trip
+
+Usage: python benchmarks/question_import.py [--questions 100000] [--per-quiz 50]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=100000, help='questions per file')
+    parser.add_argument('--per-quiz', type=int, default=50, help='questions per quiz')
+    parser.add_argument('--formats', default='csv,json,gift', help='comma-separated formats to time')
+    return parser.parse_args()
+
+
+def synthetic_questions(args):
+    for n in range(args.questions):
+        yield {
+            'quiz': f'Imported quiz {n // args.per_quiz + 1}',
+            'question': f'Question {n}: which option is correct? {{#{n}}}',
+            'option_a': f'First option {n}',
+            'option_b': 'Second option',
+            'option_c': 'Third option, with a comma',
+            'option_d': 'Fourth "quoted" option',
+            'correct_answer': 'ABCD'[n % 4]
+        }
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='gmu_quiz_import_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'import.db')
+    from app import create_app, db, export_question_rows, import_questions, read_questions, upgrade_schema, write_questions
+
+    with create_app().app_context():
+        upgrade_schema()
+        print(f"{'format':<8}{'size MB':>10}{'import s':>10}{'rows/s':>10}{'export s':>10}  round trip")
+        for file_format in args.formats.split(','):
+            text = ''.join(write_questions(synthetic_questions(args), file_format))
+
+            start = time.perf_counter()
+            report = import_questions(read_questions(io.StringIO(text, newline=''), file_format))
+            import_seconds = time.perf_counter() - start
+            quiz_ids = [quiz['id'] for quiz in report['quizzes']]
+
+            start = time.perf_counter()
+            exported = []
+            for quiz_id in quiz_ids:
+                exported.extend(export_question_rows(quiz_id))
+            export_seconds = time.perf_counter() - start
+
+            expected = list(synthetic_questions(args))
+            ok = report['committed'] and report['imported'] == args.questions and exported == expected
+            print(f"{file_format:<8}{len(text.encode()) / 1e6:>10.1f}{import_seconds:>10.2f}"
+                  f"{args.questions / import_seconds:>10.0f}{export_seconds:>10.2f}  {'ok' if ok else 'MISMATCH'}")
+            if not ok:
+                sys.exit(1)
+        db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+GMU Quiz Land - Startup Benchmark
+Measures how soon a fresh process serves its first request: interpreter
+start, importing app and calling create_app(), and the first request, each
+over several cold runs. Also runs `python -X importtime -c "import app"` and lists
+the slowest imports, and checks that a student request leaves the AI
+generator subsystem unloaded.
+
+With --server the cold start is timed end to end through serve.py: from
+spawning it to the first HTTP response from a worker.
+
+Usage: python benchmarks/startup.py [--runs 5] [--path /student/quizzes] [--server] [--budget 0.5]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LAZY_MODULES = ('ai_question_generator', 'requests')  # should stay unloaded for student requests
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='cold starts to time')
+    parser.add_argument('--path', default='/student/quizzes', help='URL of the first request')
+    parser.add_argument('--server', action='store_true', help='time serve.py to its first HTTP response as well')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--budget', type=float, help='fail if the median time to first response exceeds this (seconds)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def child(path):
+    """One cold start in this process: import and create the app, then serve path through the test client."""
+    start = time.perf_counter()
+    import app as appmod
+    app = appmod.create_app()
+    imported = time.perf_counter()
+    response = app.test_client().get(path)
+    served = time.perf_counter()
+    print(json.dumps({
+        'import': imported - start,
+        'first_request': served - imported,
+        'status': response.status_code,
+        'loaded': [name for name in LAZY_MODULES if name in sys.modules]
+    }), flush=True)
+
+
+def seed_database():
+    import app as appmod
+    from demo_data import create_demo_data
+
+    app = appmod.create_app()
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        appmod.create_tables()
+        create_demo_data(app)
+
+
+def time_process(argv):
+    """Wall time from spawning argv to its first line of output (or exit), and that line."""
+    start = time.perf_counter()
+    process = subprocess.Popen(argv, cwd=ROOT, env=dict(os.environ), stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.communicate()
+    if process.returncode:
+        raise RuntimeError(f'{argv[1:]} exited with {process.returncode}')
+    return elapsed, line
+
+
+def import_profile(top):
+    """(total seconds, slowest modules imported directly by app) from -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                            env=dict(os.environ), stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True,
+                            check=True)
+    total, direct = 0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0 and name.strip() == 'app':
+            total = int(cumulative) / 1e6
+        elif depth == 1:
+            direct.append((int(cumulative) / 1e6, name.strip()))
+    direct.sort(reverse=True)
+    return total, direct[:top]
+
+
+def time_server(path):
+    """Seconds from spawning serve.py to the first response to path."""
+    from submit_load import free_port  # imports requests, so not in the module the child runs
+
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}', '--workers', '1',
+                               '--threads', '1'], cwd=ROOT, env=dict(os.environ),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while server.poll() is None:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=5) as response:
+                    return time.perf_counter() - start, response.status
+            except urllib.error.HTTPError as e:
+                return time.perf_counter() - start, e.code
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError('serve.py exited before answering')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        child(args.path)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='gmu_quiz_startup_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'startup.db')
+    os.environ.setdefault('ANSWER_LOG_PATH', os.path.join(workdir, 'answers.log'))
+    os.environ.setdefault('QUIZ_CACHE_SYNC_PATH', os.path.join(workdir, 'quiz_cache.sync'))
+    os.environ.setdefault('GENERATION_CACHE_PATH', os.path.join(workdir, 'generation_cache.db'))
+    seed_database()
+
+    interpreter = statistics.median(time_process([sys.executable, '-c', 'pass'])[0] for _ in range(args.runs))
+    runs = []
+    for _ in range(args.runs):
+        wall, line = time_process([sys.executable, os.path.abspath(__file__), '--child', '--path', args.path])
+        runs.append(dict(json.loads(line), wall=wall))
+
+    total, slowest = import_profile(args.top)
+    print(f'Slowest imports of app ({total * 1000:.0f} ms in all, one -X importtime run):')
+    for seconds, name in slowest:
+        print(f'  {seconds * 1000:8.1f} ms  {name}')
+
+    print(f'\nCold starts ({args.runs} runs, medians):')
+    print(f'  interpreter start      {interpreter * 1000:8.1f} ms')
+    print(f'  import + create_app    {statistics.median(r["import"] for r in runs) * 1000:8.1f} ms')
+    print(f'  first request          {statistics.median(r["first_request"] for r in runs) * 1000:8.1f} ms'
+          f'  (GET {args.path} -> {runs[-1]["status"]})')
+    first_response = statistics.median(r['wall'] for r in runs)
+    print(f'  spawn to response      {first_response * 1000:8.1f} ms')
+    loaded = sorted({name for r in runs for name in r['loaded']})
+    print(f'  lazily loaded modules  {"loaded: " + ", ".join(loaded) if loaded else "not loaded"}')
+
+    if args.server:
+        server_runs = [time_server(args.path) for _ in range(args.runs)]
+        first_response = statistics.median(seconds for seconds, _ in server_runs)
+        print(f'  serve.py to response   {first_response * 1000:8.1f} ms  (-> {server_runs[-1][1]})')
+
+    if args.budget is not None and first_response > args.budget:
+        print(f'OVER BUDGET: {first_response:.3f}s to first response, budget {args.budget:.3f}s')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+GMU Quiz Land - Answer Submission Load Test
+Starts the app once per storage profile on a fresh database and has N
+simulated students hammer /student/submit-answer at the same moment,
+reporting p50/p99 latency and error rate for each profile
+
+Usage: python benchmarks/submit_load.py [--students 100] [--profiles default,production]
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=100, help='concurrent simulated students')
+    parser.add_argument('--questions', type=int, default=20, help='questions in the quiz (answers per student)')
+    parser.add_argument('--profiles', default='default,production', help='comma-separated STORAGE_PROFILE values')
+    parser.add_argument('--database-url', help='run against this database instead of a fresh SQLite file')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def serve(args):
+    """Child process: seed a quiz and run a threaded server until killed."""
+    from werkzeug.serving import make_server
+    import app as appmod
+
+    app = appmod.create_app()
+    with app.app_context():
+        appmod.create_tables()
+        quiz = appmod.Quiz(title='Load Test Quiz', num_questions=args.questions,
+                           duration_mode='overall', duration_seconds=3600)
+        appmod.db.session.add(quiz)
+        appmod.db.session.flush()
+        for i in range(1, args.questions + 1):
+            appmod.db.session.add(appmod.Question(
+                quiz_id=quiz.id, question_text=f'Question {i}?', option_a='A', option_b='B',
+                option_c='C', option_d='D', correct_answer='A', order=i))
+        appmod.db.session.commit()
+        quiz_id = quiz.id
+
+    # Exit cleanly on terminate so write-behind mode flushes its buffer
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    print(f'READY {quiz_id}', flush=True)
+    server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def student(base_url, quiz_id, barrier, latencies, errors, lock):
+    http = requests.Session()
+    try:
+        http.post(f'{base_url}/student/start-quiz/{quiz_id}', data={'student_name': 'Load Tester'},
+                  allow_redirects=False, timeout=60)
+        questions = http.get(f'{base_url}/student/quiz-session/{quiz_id}', timeout=60).json()['questions']
+    except (requests.RequestException, KeyError, ValueError):
+        questions = []
+    barrier.wait()
+
+    for question in questions:
+        start = time.perf_counter()
+        try:
+            response = http.post(f'{base_url}/student/submit-answer',
+                                 json={'question_id': question['id'], 'selected_answer': 'A'}, timeout=60)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors.append(elapsed)
+
+
+def run_profile(profile, args):
+    env = dict(os.environ, STORAGE_PROFILE=profile)
+    workdir = tempfile.mkdtemp(prefix='gmu_quiz_load_')
+    env['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(workdir, 'load.db')
+    env['ANSWER_LOG_PATH'] = os.path.join(workdir, 'answers.log')
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port), '--questions', str(args.questions)],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    try:
+        line = server.stdout.readline()
+        while line and not line.startswith('READY'):
+            line = server.stdout.readline()
+        if not line:
+            raise RuntimeError(f'server for profile {profile!r} failed to start')
+        quiz_id = int(line.split()[1])
+
+        base_url = f'http://127.0.0.1:{port}'
+        latencies, errors, lock = [], [], threading.Lock()
+        barrier = threading.Barrier(args.students + 1)
+        threads = [threading.Thread(target=student, args=(base_url, quiz_id, barrier, latencies, errors, lock))
+                   for _ in range(args.students)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50': statistics.median(latencies) if latencies else 0.0,
+        'p99': percentile(latencies, 99),
+        'error_rate': len(errors) / len(latencies) * 100 if latencies else 100.0
+    }
+
+
+def main():
+    args = parse_args()
+    if args.serve:
+        serve(args)
+        return
+
+    print(f"{args.students} students x {args.questions} answers per profile")
+    print(f"{'profile':<12}{'requests':>10}{'req/s':>10}{'p50 (ms)':>11}{'p99 (ms)':>11}{'errors':>9}")
+    for profile in args.profiles.split(','):
+        result = run_profile(profile, args)
+        print(f"{profile:<12}{result['requests']:>10}{result['throughput']:>10.1f}"
+              f"{result['p50']:>11.1f}{result['p99']:>11.1f}{result['error_rate']:>8.1f}%")
+
+
+if __name__ == '__main__':
+    main()
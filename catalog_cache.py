@@ -0,0 +1,81 @@
+"""
+GMU Quiz Land - Quiz Catalog Cache
+Per-process copy of the catalog version and rendered pages of the quiz list
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Hashable, NamedTuple, Optional
+
+
+class CatalogState(NamedTuple):
+    version: int
+    updated_at: Optional[datetime]  # None before the first change is recorded
+
+
+class CatalogCache:
+    """
+    The quiz catalog's version, re-read at most once per ttl_seconds, and
+    rendered quiz-list pages keyed by version.
+
+    The version lives in the database and is bumped in the same transaction
+    as any change to a quiz, so every process agrees on it. A change made by
+    another process shows up here within ttl_seconds; refresh() makes this
+    process's own changes show at once. A new version makes every cached
+    page unreachable, and old pages age out of the LRU.
+    """
+
+    def __init__(self, maxsize: int = 64, ttl_seconds: float = 2.0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._state = None
+        self._expires = 0.0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def state(self, loader: Callable[[], CatalogState]) -> CatalogState:
+        """The current CatalogState, calling loader() if the copy is older than ttl_seconds."""
+        with self._lock:
+            if self._state is not None and time.monotonic() < self._expires:
+                return self._state
+        state = loader()
+        with self._lock:
+            self._state = state
+            self._expires = time.monotonic() + self.ttl_seconds
+        return state
+
+    def refresh(self):
+        """Forget the version, e.g. after this process committed a change to a quiz."""
+        with self._lock:
+            self._state = None
+
+    def page(self, key: Hashable, render: Callable[[], object]):
+        """The page cached under key, calling render() on a miss. Keys should include the version."""
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return page
+            self.misses += 1
+
+        page = render()
+        with self._lock:
+            self._pages[key] = page
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+        return page
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'version': self._state.version if self._state else None,
+                'pages': len(self._pages),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
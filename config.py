@@ -3,7 +3,93 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def _flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes')
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-change-this-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///gmu_quiz.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Paths left as None default to files in the app's instance folder; an
+    # empty string turns the feature off where noted
+    QUIZ_CACHE_SIZE = int(os.environ.get('QUIZ_CACHE_SIZE', 256))
+    QUIZ_CACHE_SYNC_PATH = os.environ.get('QUIZ_CACHE_SYNC_PATH')  # '' for a single process
+    QUIZ_CACHE_SYNC_MAX_BYTES = int(os.environ.get('QUIZ_CACHE_SYNC_MAX_BYTES', 1024 * 1024))
+    ANSWER_WRITE_BEHIND = _flag('ANSWER_WRITE_BEHIND')
+    ANSWER_LOG_PATH = os.environ.get('ANSWER_LOG_PATH')
+    ANSWER_FLUSH_INTERVAL_MS = int(os.environ.get('ANSWER_FLUSH_INTERVAL_MS', 200))
+    ANSWER_FLUSH_MAX_ROWS = int(os.environ.get('ANSWER_FLUSH_MAX_ROWS', 500))
+    GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', 2))
+    GENERATION_JOB_STALE_SECONDS = int(os.environ.get('GENERATION_JOB_STALE_SECONDS', 300))
+    GENERATION_CACHE_PATH = os.environ.get('GENERATION_CACHE_PATH')  # '' to always call the API
+    GENERATION_CACHE_TTL_SECONDS = int(os.environ.get('GENERATION_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+    GENERATION_CACHE_MAX_ENTRIES = int(os.environ.get('GENERATION_CACHE_MAX_ENTRIES', 1000))
+    DEDUP_POLICY = os.environ.get('DEDUP_POLICY', 'flag')  # 'off', 'flag' or 'reject'
+    DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', 0.7))
+    ATTEMPT_DEADLINE_GRACE_SECONDS = int(os.environ.get('ATTEMPT_DEADLINE_GRACE_SECONDS', 10))
+    ATTEMPT_SWEEP_INTERVAL_SECONDS = float(os.environ.get('ATTEMPT_SWEEP_INTERVAL_SECONDS', 30))
+    METRICS_ENABLED = _flag('METRICS_ENABLED')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    METRICS_N_PLUS_ONE_THRESHOLD = int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', 5))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 256))
+    USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', 30))  # 0 loads the user every request
+    # werkzeug method string; password_hash holds 120 characters, enough for pbkdf2 but not scrypt
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE', 24))
+    CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 64))  # rendered quiz-list pages
+    CATALOG_VERSION_TTL_SECONDS = float(os.environ.get('CATALOG_VERSION_TTL_SECONDS', 2))
+    LIVE_EVENTS_SOCKET_DIR = os.environ.get('LIVE_EVENTS_SOCKET_DIR')  # '' for a single process
+    LIVE_EVENTS_QUEUE_SIZE = int(os.environ.get('LIVE_EVENTS_QUEUE_SIZE', 256))  # per monitor, after coalescing
+    LIVE_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_STREAM_HEARTBEAT_SECONDS', 15))
+    LIVE_STREAM_MAX_SECONDS = float(os.environ.get('LIVE_STREAM_MAX_SECONDS', 300))
+
+    # Storage profile: 'default' keeps SQLAlchemy's stock settings, 'production'
+    # tunes SQLite for concurrent writers (WAL) or sizes the pool for a server
+    # database such as Postgres
+    STORAGE_PROFILE = os.environ.get('STORAGE_PROFILE') or 'default'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+    @classmethod
+    def engine_options(cls, uri=None):
+        """SQLALCHEMY_ENGINE_OPTIONS for the configured storage profile."""
+        uri = uri or cls.SQLALCHEMY_DATABASE_URI
+        if cls.STORAGE_PROFILE != 'production':
+            return {}
+
+        if uri.startswith('sqlite'):
+            return {
+                'pool_size': cls.DB_POOL_SIZE,
+                'max_overflow': cls.DB_MAX_OVERFLOW,
+                'pool_timeout': cls.DB_POOL_TIMEOUT,
+                'connect_args': {
+                    'timeout': cls.SQLITE_BUSY_TIMEOUT_MS / 1000,
+                    'check_same_thread': False
+                }
+            }
+
+        return {
+            'pool_size': cls.DB_POOL_SIZE,
+            'max_overflow': cls.DB_MAX_OVERFLOW,
+            'pool_timeout': cls.DB_POOL_TIMEOUT,
+            'pool_recycle': cls.DB_POOL_RECYCLE,
+            'pool_pre_ping': True
+        }
+
+    @classmethod
+    def sqlite_pragmas(cls):
+        """PRAGMA statements to run on every new SQLite connection."""
+        if cls.STORAGE_PROFILE != 'production':
+            return []
+
+        return [
+            'PRAGMA journal_mode=WAL',
+            'PRAGMA synchronous=NORMAL',
+            f'PRAGMA busy_timeout={cls.SQLITE_BUSY_TIMEOUT_MS}',
+            f'PRAGMA mmap_size={cls.SQLITE_MMAP_SIZE}'
+        ]
@@ -4,9 +4,9 @@ GMU Quiz Land - Demo Data Script
 Adds sample quizzes and questions to the database
 """
 
-from app import app, db, Quiz, Question, User
+from app import create_app, db, Quiz, Question, User
 
-def create_demo_data():
+def create_demo_data(app):
     with app.app_context():
         # Create sample quizzes
         quiz1 = Quiz(
@@ -142,4 +142,4 @@ def create_demo_data():
         print("   - Programming Fundamentals (4 questions, 5 min total)")
 
 if __name__ == '__main__':
-    create_demo_data()
+    create_demo_data(create_app())
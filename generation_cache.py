@@ -0,0 +1,118 @@
+"""
+GMU Quiz Land - Generated Question Cache
+Persistent cache of AI-generated question sets, stored in a local SQLite file
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, List
+
+COUNTERS = ('hits', 'partial_hits', 'misses', 'questions_served', 'questions_generated')
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.casefold().split())
+
+
+class GenerationCache:
+    """
+    Question sets keyed on (normalized topic, difficulty, model id, prompt template hash).
+
+    Changing the model or the prompt template changes the key, so stale
+    generations are never served for a new prompt. Entries expire ttl_seconds
+    after they were first generated; beyond max_entries the least recently
+    used entries are dropped.
+
+    Hit/miss counters are kept in the same file so they add up across
+    processes and restarts.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 7 * 24 * 3600, max_entries: int = 1000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(topic: str, difficulty: str, model_id: str, template: str) -> str:
+        template_hash = hashlib.sha256(template.encode()).hexdigest()
+        parts = [normalize_topic(topic), difficulty.strip().lower(), model_id, template_hash]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> List[Dict]:
+        """Cached questions for key, or [] if there are none or they have expired."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT questions FROM entries WHERE key = ? AND created_at > ?',
+                               (key, now - self.ttl_seconds)).fetchone()
+            if row is None:
+                return []
+            conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, topic: str, difficulty: str, questions: List[Dict]):
+        """Store questions under key, keeping the entry's original creation time for a top-up."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT INTO entries (key, topic, difficulty, questions, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET questions = excluded.questions, size = excluded.size, '
+                'accessed_at = excluded.accessed_at, '
+                'created_at = CASE WHEN entries.created_at > ? THEN entries.created_at ELSE excluded.created_at END',
+                (key, normalize_topic(topic), difficulty, json.dumps(questions), len(questions), now, now,
+                 now - self.ttl_seconds))
+            conn.execute('DELETE FROM entries WHERE created_at <= ?', (now - self.ttl_seconds,))
+            conn.execute('DELETE FROM entries WHERE key IN '
+                         '(SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                         (self.max_entries,))
+
+    def record(self, **counts: int):
+        """Add to the hit/miss counters, e.g. record(hits=1, questions_served=10)."""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany('UPDATE counters SET value = value + ? WHERE name = ?',
+                             [(value, name) for name, value in counts.items() if value])
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM entries')
+
+    def stats(self) -> Dict:
+        with closing(self._connect()) as conn:
+            stats = dict(conn.execute('SELECT name, value FROM counters'))
+            stats['entries'], stats['cached_questions'] = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE created_at > ?',
+                (time.time() - self.ttl_seconds,)).fetchone()
+        lookups = stats['hits'] + stats['partial_hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call: cheap for SQLite, and safe across threads and forks
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+                        self._create_schema(conn)
+                    self._ready = True
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                         'key TEXT PRIMARY KEY, topic TEXT NOT NULL, difficulty TEXT NOT NULL, '
+                         'questions TEXT NOT NULL, size INTEGER NOT NULL, '
+                         'created_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at)')
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.executemany('INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)',
+                             [(name,) for name in COUNTERS])
@@ -0,0 +1,233 @@
+"""
+GMU Quiz Land - Request Instrumentation
+Per-endpoint SQL statement counts, database and template time and N+1
+detection, exported in the Prometheus text format and as Server-Timing headers
+"""
+
+import contextvars
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from flask import before_render_template, request, template_rendered
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+MAX_REPORTED_STATEMENTS = 200  # distinct (endpoint, statement) N+1 warnings kept per process
+
+# Expanded IN lists differ in length from one request to the next
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _RequestState:
+    __slots__ = ('started', 'queries', 'db_seconds', 'render_seconds', 'render_started', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_started = None
+        self.statements = Counter()
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+def normalize_statement(statement: str) -> str:
+    """SQL text with whitespace collapsed and IN lists shortened, so repeats of one query compare equal."""
+    return _IN_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestMetrics:
+    """
+    Records, per Flask endpoint, how many requests there were and how long
+    they took, how many SQL statements they ran and how long those took, and
+    the time spent rendering templates.
+
+    A request that runs the same statement (ignoring parameters) at least
+    n_plus_one_threshold times is counted as a likely N+1 and logged once
+    per endpoint and statement. Statements run outside a request, such as
+    those of background threads, are not counted.
+
+    Metrics are per process; with several workers each one reports its own,
+    which is what Prometheus expects from separate scrape targets.
+    """
+
+    def __init__(self, n_plus_one_threshold: int = 5, server_timing: bool = True):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.server_timing = server_timing
+        self.logger = None
+        self._current = contextvars.ContextVar('request_metrics_state', default=None)
+        self._requests = Counter()  # (endpoint, method, status) -> requests
+        self._durations = defaultdict(lambda: _Histogram(DURATION_BUCKETS))
+        self._query_counts = defaultdict(lambda: _Histogram(QUERY_COUNT_BUCKETS))
+        self._db_seconds = Counter()
+        self._render_seconds = Counter()
+        self._n_plus_one = Counter()
+        self._reported = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        """Hook into app and engine; call before the app registers its own before_request functions."""
+        self.logger = app.logger
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        # First, so the statements of the app's own before_request hooks are counted too
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app, weak=False)
+        template_rendered.connect(self._after_render, app, weak=False)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current.get() is not None:
+            conn.info.setdefault('request_metrics_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        state = self._current.get()
+        started = conn.info.get('request_metrics_started')
+        if state is None or not started:
+            return
+        state.db_seconds += time.perf_counter() - started.pop()
+        state.queries += 1
+        state.statements[statement] += 1
+
+    def _before_render(self, app, template, context, **extra):
+        state = self._current.get()
+        if state is not None:
+            state.render_started = time.perf_counter()
+
+    def _after_render(self, app, template, context, **extra):
+        state = self._current.get()
+        if state is not None and state.render_started is not None:
+            state.render_seconds += time.perf_counter() - state.render_started
+            state.render_started = None
+
+    def _start_request(self):
+        self._current.set(_RequestState())
+
+    def _finish_request(self, response):
+        state = self._current.get()
+        if state is None:
+            return response
+        elapsed = time.perf_counter() - state.started
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+
+        repeated = self._repeated_statements(state)
+        with self._lock:
+            self._requests[(endpoint, request.method, response.status_code)] += 1
+            self._durations[endpoint].observe(elapsed)
+            self._query_counts[endpoint].observe(state.queries)
+            self._db_seconds[endpoint] += state.db_seconds
+            self._render_seconds[endpoint] += state.render_seconds
+            new = []
+            if repeated:
+                self._n_plus_one[endpoint] += 1
+                for statement, count in repeated:
+                    if (endpoint, statement) not in self._reported and len(self._reported) < MAX_REPORTED_STATEMENTS:
+                        self._reported.add((endpoint, statement))
+                        new.append((statement, count))
+        for statement, count in new:
+            if self.logger:
+                self.logger.warning('Possible N+1 in %s: %d executions of %s', endpoint, count, statement[:300])
+
+        if self.server_timing:
+            response.headers.add('Server-Timing', ', '.join([
+                f'db;dur={state.db_seconds * 1000:.1f};desc="{state.queries} queries"',
+                f'render;dur={state.render_seconds * 1000:.1f}',
+                f'app;dur={elapsed * 1000:.1f}'
+            ]))
+        return response
+
+    def _teardown_request(self, exc):
+        self._current.set(None)
+
+    def _repeated_statements(self, state: _RequestState) -> List[Tuple[str, int]]:
+        if state.queries < self.n_plus_one_threshold:
+            return []
+        normalized = Counter()
+        for statement, count in state.statements.items():
+            normalized[normalize_statement(statement)] += count
+        return [(statement, count) for statement, count in normalized.most_common()
+                if count >= self.n_plus_one_threshold]
+
+    def stats(self) -> Dict:
+        """Totals per endpoint."""
+        with self._lock:
+            endpoints = {}
+            for endpoint, durations in self._durations.items():
+                queries = self._query_counts[endpoint]
+                endpoints[endpoint] = {
+                    'requests': durations.count,
+                    'seconds': round(durations.total, 6),
+                    'queries': int(queries.total),
+                    'queries_per_request': round(queries.total / durations.count, 2) if durations.count else 0.0,
+                    'db_seconds': round(self._db_seconds[endpoint], 6),
+                    'render_seconds': round(self._render_seconds[endpoint], 6),
+                    'n_plus_one_requests': self._n_plus_one[endpoint]
+                }
+            return endpoints
+
+    def render_prometheus(self, prefix: str = 'gmu_quiz') -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def header(name, kind, text):
+            lines.append(f'# HELP {prefix}_{name} {text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+
+        def histogram(name, histograms):
+            for endpoint, hist in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_{name}_bucket{{endpoint="{_label(endpoint)}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_{name}_bucket{{endpoint="{_label(endpoint)}",le="+Inf"}} {hist.count}')
+                lines.append(f'{prefix}_{name}_sum{{endpoint="{_label(endpoint)}"}} {hist.total:.6f}')
+                lines.append(f'{prefix}_{name}_count{{endpoint="{_label(endpoint)}"}} {hist.count}')
+
+        def per_endpoint(name, values, fmt='{:.6f}'):
+            for endpoint, value in sorted(values.items()):
+                lines.append(f'{prefix}_{name}{{endpoint="{_label(endpoint)}"}} {fmt.format(value)}')
+
+        with self._lock:
+            header('http_requests_total', 'counter', 'Requests handled, by endpoint, method and status.')
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'{prefix}_http_requests_total{{endpoint="{_label(endpoint)}",'
+                             f'method="{_label(method)}",status="{status}"}} {count}')
+            header('http_request_duration_seconds', 'histogram', 'Time from before_request to after_request.')
+            histogram('http_request_duration_seconds', self._durations)
+            header('db_queries_per_request', 'histogram', 'SQL statements executed per request.')
+            histogram('db_queries_per_request', self._query_counts)
+            header('db_seconds_total', 'counter', 'Time spent executing SQL statements.')
+            per_endpoint('db_seconds_total', self._db_seconds)
+            header('template_render_seconds_total', 'counter', 'Time spent rendering templates.')
+            per_endpoint('template_render_seconds_total', self._render_seconds)
+            header('n_plus_one_requests_total', 'counter',
+                   f'Requests that ran one statement at least {self.n_plus_one_threshold} times.')
+            per_endpoint('n_plus_one_requests_total', self._n_plus_one, '{}')
+        return '\n'.join(lines) + '\n'
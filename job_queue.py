@@ -0,0 +1,74 @@
+"""
+GMU Quiz Land - Background Job Queue
+Runs jobs recorded in a database table on an in-process thread pool
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class JobQueue:
+    """
+    Thread pool that calls run_fn(job_id) for submitted jobs.
+
+    The job table is the queue; this class only supplies the threads. run_fn
+    must claim its row atomically (e.g. UPDATE ... WHERE status = 'queued'),
+    so a job submitted twice, or by two worker processes, still runs once,
+    and jobs lost with a crashed process can simply be submitted again.
+
+    The pool is created on first use and again after a fork, so pre-forking
+    servers get one pool per worker. A job that raises is reported to logger.
+    """
+
+    def __init__(self, run_fn: Callable[[int], None], max_workers: int = 2, name: str = 'job-worker',
+                 logger: Optional[logging.Logger] = None):
+        self.run_fn = run_fn
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_workers = max_workers
+        self.name = name
+        self.submitted = 0
+        self.failed = 0
+        self._active = 0
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: int):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            self.submitted += 1
+            self._pool.submit(self._run, job_id)
+
+    def shutdown(self):
+        """Drop jobs that have not started; they stay queued in the table for the next process."""
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'submitted': self.submitted,
+                'active': self._active,
+                'failed': self.failed
+            }
+
+    def _run(self, job_id: int):
+        with self._lock:
+            self._active += 1
+        try:
+            self.run_fn(job_id)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            self.logger.exception('%s job %s failed', self.name, job_id)
+        finally:
+            with self._lock:
+                self._active -= 1
@@ -0,0 +1,304 @@
+"""
+GMU Quiz Land - Live Exam Events
+In-process publish/subscribe for live exam monitoring, with bounded,
+coalescing subscriber queues and pluggable backends for sharing events
+between worker processes
+"""
+
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+MAX_DATAGRAM = 65536
+
+
+class LiveEvent(NamedTuple):
+    quiz_id: int
+    kind: str
+    payload: str  # JSON, encoded once however many subscribers receive it
+    coalesce_key: Optional[str] = None
+
+    def message(self) -> str:
+        """The event in the text/event-stream format."""
+        return format_message(self.kind, self.payload)
+
+
+def format_message(kind: str, payload: str) -> str:
+    return f'event: {kind}\ndata: {payload}\n\n'
+
+
+class Subscription:
+    """
+    Events for one quiz waiting to be sent to one client.
+
+    Holds at most maxsize events. An event with a coalesce_key replaces a
+    waiting event with the same key, so a slow client gets the latest state
+    of each attempt rather than every step. If the queue still overflows the
+    oldest event is dropped and the next get() says so, and the client
+    should be sent a fresh snapshot.
+    """
+
+    def __init__(self, quiz_id: int, maxsize: int = 256):
+        self.quiz_id = quiz_id
+        self.maxsize = maxsize
+        self._pending = OrderedDict()
+        self._keys = itertools.count()
+        self._overflowed = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, event: LiveEvent) -> bool:
+        """Queue event; True if it replaced a waiting one."""
+        with self._cond:
+            key = event.coalesce_key if event.coalesce_key is not None else next(self._keys)
+            coalesced = key in self._pending
+            self._pending[key] = event
+            self._pending.move_to_end(key)
+            if len(self._pending) > self.maxsize:
+                self._pending.popitem(last=False)
+                self._overflowed = True
+            self._cond.notify()
+        return coalesced
+
+    def get(self, timeout: float) -> Tuple[List[LiveEvent], bool]:
+        """Wait up to timeout seconds for events; returns them all and whether any were dropped."""
+        with self._cond:
+            if not self._pending and not self._closed:
+                self._cond.wait(timeout)
+            events = list(self._pending.values())
+            overflowed = self._overflowed
+            self._pending.clear()
+            self._overflowed = False
+        return events, overflowed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+
+class LocalBackend:
+    """Delivers events to subscribers in this process only."""
+
+    def start(self, deliver: Callable[[LiveEvent], None]):
+        self._deliver = deliver
+
+    def publish(self, event: LiveEvent):
+        self._deliver(event)
+
+    def listening(self) -> bool:
+        """True if subscribers in other processes may want events."""
+        return False
+
+    def subscribed(self):
+        """Called when this process gains its first subscriber."""
+
+    def unsubscribed(self):
+        """Called when this process loses its last subscriber."""
+
+
+class SocketBackend(LocalBackend):
+    """
+    Shares events between the processes of one host through Unix datagram
+    sockets in a directory, a stand-in for an external broker.
+
+    A process binds a socket there only while it has subscribers, and
+    publishers send each event to every socket they find, so publishing
+    costs a stat() of the directory while nobody is watching. Delivery is
+    best effort: an event for a process whose socket buffer is full is
+    dropped, as is one published while a subscriber is still connecting.
+    Problems with the socket are reported to logger, the app's logger when
+    the app creates the backend.
+    """
+
+    def __init__(self, directory: str, logger: Optional[logging.Logger] = None):
+        self.directory = directory
+        self.logger = logger or logging.getLogger(__name__)
+        self.sent = 0
+        self.dropped = 0
+        self._pid = None
+        self._sock = None
+        self._sender = None
+        self._subscribers = 0
+        self._peers = ()
+        self._peers_mtime = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f'{os.getpid()}.sock')
+
+    def publish(self, event: LiveEvent):
+        self._deliver(event)
+        peers = self._current_peers()
+        if not peers:
+            return
+        data = json.dumps(event).encode()
+        own = self.path
+        for peer in peers:
+            if peer == own:
+                continue
+            try:
+                self._sender.sendto(data, peer)
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a process that died without unbinding
+                self._forget_peer(peer)
+            except OSError:
+                self.dropped += 1
+
+    def listening(self) -> bool:
+        return bool(self._current_peers())
+
+    def subscribed(self):
+        with self._lock:
+            self._reset_after_fork()
+            self._subscribers += 1
+            if self._sock is not None:
+                return
+            path = self.path
+            if os.path.exists(path):
+                os.unlink(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                sock.bind(path)
+            except OSError as e:
+                # Subscribers here still get this process's own events
+                sock.close()
+                self.logger.warning('Live events socket %s failed, monitors here only see this process: %s',
+                                    path, e)
+                return
+            sock.settimeout(1.0)
+            self._sock = sock
+        threading.Thread(target=self._receive, args=(sock,), name='live-events-receiver', daemon=True).start()
+
+    def unsubscribed(self):
+        with self._lock:
+            self._subscribers -= 1
+            if self._subscribers > 0 or self._sock is None:
+                return
+            self._sock = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _receive(self, sock: socket.socket):
+        # Ends within a second of unsubscribed() swapping the socket out
+        while self._sock is sock:
+            try:
+                data = sock.recv(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                self._deliver(LiveEvent(*json.loads(data)))
+            except (ValueError, TypeError):
+                continue
+        sock.close()
+
+    def _current_peers(self) -> Tuple[str, ...]:
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return ()
+        if mtime != self._peers_mtime:
+            with self._lock:
+                self._reset_after_fork()
+                self._peers = tuple(entry.path for entry in os.scandir(self.directory)
+                                    if entry.name.endswith('.sock'))
+                self._peers_mtime = mtime
+                if self._sender is None:
+                    self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                    self._sender.setblocking(False)
+        return self._peers
+
+    def _forget_peer(self, peer: str):
+        try:
+            os.unlink(peer)
+        except OSError:
+            pass
+
+    def _reset_after_fork(self):
+        # A forked worker inherits the parent's state but none of its subscribers
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._sock = None
+            self._subscribers = 0
+            self._peers_mtime = None
+
+
+class LiveEventBroker:
+    """
+    Fans events for a quiz out to every subscription to it.
+
+    publish() encodes an event once and hands it to the backend, which
+    delivers it to this process's subscriptions and, for a shared backend,
+    to other processes'. Each subscription has its own bounded queue, so a
+    slow client never holds up publishers or other clients.
+    """
+
+    def __init__(self, backend: Optional[LocalBackend] = None, queue_size: int = 256):
+        self.backend = backend or LocalBackend()
+        self.queue_size = queue_size
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self.backend.start(self._deliver)
+
+    def publish(self, quiz_id: int, kind: str, data: Dict, coalesce_key: Optional[Hashable] = None):
+        """Send an event to the quiz's subscribers; does nothing if there are none in reach."""
+        if not self._subscriptions and not self.backend.listening():
+            return
+        key = None if coalesce_key is None else str(coalesce_key)
+        self.published += 1
+        self.backend.publish(LiveEvent(quiz_id, kind, json.dumps(data), key))
+
+    def subscribe(self, quiz_id: int) -> Subscription:
+        subscription = Subscription(quiz_id, self.queue_size)
+        with self._lock:
+            first = not any(self._subscriptions.values())
+            self._subscriptions[quiz_id].add(subscription)
+        if first:
+            self.backend.subscribed()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscription.close()
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.quiz_id)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.quiz_id]
+            last = not self._subscriptions
+        if last:
+            self.backend.unsubscribed()
+
+    def _deliver(self, event: LiveEvent):
+        with self._lock:
+            subscriptions = tuple(self._subscriptions.get(event.quiz_id, ()))
+        coalesced = sum(subscription.put(event) for subscription in subscriptions)
+        with self._lock:
+            self.delivered += len(subscriptions)
+            self.coalesced += coalesced
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'backend': type(self.backend).__name__,
+                'subscriptions': sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+                'published': self.published,
+                'delivered': self.delivered,
+                'coalesced': self.coalesced
+            }
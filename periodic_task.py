@@ -0,0 +1,62 @@
+"""
+GMU Quiz Land - Periodic Background Task
+Calls a function every few seconds on a daemon thread
+"""
+
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+
+class PeriodicTask:
+    """
+    Runs fn() every interval seconds on a daemon thread.
+
+    start() is cheap to call on every request: the thread is created on
+    first use and again after a fork, so pre-forking servers get one thread
+    per worker. fn must therefore be safe to run in several processes at
+    once. An exception in fn is reported to logger and the task carries on.
+    """
+
+    def __init__(self, fn: Callable[[], object], interval: float, name: str = 'periodic-task',
+                 logger: Optional[logging.Logger] = None):
+        self.fn = fn
+        self.logger = logger or logging.getLogger(__name__)
+        self.interval = interval
+        self.name = name
+        self.runs = 0
+        self.failures = 0
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._pid == os.getpid() or self.interval <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        self._pid = None
+
+    def stats(self) -> Dict:
+        return {'interval': self.interval, 'runs': self.runs, 'failures': self.failures}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.fn()
+                self.runs += 1
+            except Exception:
+                self.failures += 1
+                self.logger.exception('%s failed', self.name)
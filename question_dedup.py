@@ -0,0 +1,268 @@
+"""
+GMU Quiz Land - Duplicate Question Index
+In-memory MinHash/LSH index for finding near-duplicate question text
+"""
+
+import hashlib
+import heapq
+import string
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+_PUNCTUATION = {ord(char): " " for char in string.punctuation + "“”‘’«»¿¡–—…"}
+_MASK32 = 0xFFFFFFFF
+_GOLDEN = 0x9E3779B1  # multiplicative mixing for the CRC of each shingle
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(text.casefold().translate(_PUNCTUATION).split())
+
+
+def text_hash(normalized: str) -> int:
+    """Signed 64-bit hash of normalized text, for exact-duplicate lookups."""
+    return int.from_bytes(hashlib.blake2b(normalized.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def pack_signature(signature: List[int]) -> bytes:
+    """Signature as little-endian 32-bit words, for storing in the database."""
+    packed = array("I", signature)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_signature(data: bytes) -> List[int]:
+    unpacked = array("I")
+    unpacked.frombytes(data)
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+class DuplicateMatch(NamedTuple):
+    question_id: int
+    quiz_id: int
+    similarity: float  # estimated Jaccard similarity of character shingles; 1.0 for identical text
+
+
+class _SortedMultiMap:
+    """
+    int -> ints, kept as two parallel sorted arrays plus a dict of recent additions.
+
+    A few bytes per entry instead of a dict entry per key, which is what lets
+    ten bands of a 500k-question index fit in tens of megabytes. Recent
+    additions are merged into the arrays in one linear pass once there are
+    merge_at of them.
+    """
+
+    def __init__(self, merge_at: int = 20000):
+        self.keys = array("q")
+        self.values = array("l")
+        self.recent: Dict[int, List[int]] = {}
+        self.merge_at = merge_at
+        self._recent_count = 0
+
+    def bulk_load(self, keys: array):
+        """Replace the contents with keys[i] -> i for every i."""
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = array("q", [keys[i] for i in order])
+        self.values = array("l", order)
+        self.recent.clear()
+        self._recent_count = 0
+
+    def add(self, key: int, value: int):
+        self.recent.setdefault(key, []).append(value)
+        self._recent_count += 1
+        if self._recent_count >= self.merge_at:
+            self._merge()
+
+    def get(self, key: int) -> List[int]:
+        keys = self.keys
+        start = bisect_left(keys, key)
+        found = list(self.values[start:bisect_right(keys, key, start)]) if start < len(keys) and keys[start] == key else []
+        return found + self.recent.get(key, [])
+
+    def __len__(self):
+        return len(self.keys) + self._recent_count
+
+    def _merge(self):
+        recent = sorted((key, value) for key, values in self.recent.items() for value in values)
+        merged = list(heapq.merge(zip(self.keys, self.values), recent))
+        self.keys = array("q", [key for key, _ in merged])
+        self.values = array("l", [value for _, value in merged])
+        self.recent.clear()
+        self._recent_count = 0
+
+
+class QuestionIndex:
+    """
+    Finds questions whose text is identical or nearly identical to a given text.
+
+    Exact duplicates (after normalize_text) are found through a hash of the
+    normalized text. Near duplicates use a one-permutation MinHash signature
+    of the text's character shingles: each shingle is hashed once and the
+    smallest hash per bin is kept, so a signature costs one pass over the
+    text. Signatures are split into bands for LSH; only questions sharing a
+    whole band with the query are compared, and a candidate matches when the
+    share of equal bins reaches threshold.
+
+    With the defaults (30 bins, 10 bands of 3) a pair with similarity 0.7 is
+    found about 98% of the time, while unrelated questions almost never
+    share a band. Removed questions are tombstoned.
+
+    Computing a signature is the expensive part, so add() and build() take
+    precomputed fingerprints, which callers can store alongside the question.
+    """
+
+    def __init__(self, threshold: float = 0.7, shingle_size: int = 5, bands: int = 10, rows: int = 3):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = rows
+        self.num_bins = bands * rows
+        self.max_id = 0  # highest question id added, for incremental catch-up from the database
+        self._question_ids = array("l")
+        self._quiz_ids = array("l")
+        self._removed = bytearray()
+        self._signatures = array("I")
+        self._slots: Dict[int, int] = {}
+        self._exact = _SortedMultiMap()
+        self._band_maps = [_SortedMultiMap() for _ in range(bands)]
+        self._lock = threading.RLock()
+
+    def fingerprint(self, text: str) -> Tuple[int, List[int]]:
+        """(exact text hash, MinHash signature) for text."""
+        normalized = normalize_text(text)
+        return text_hash(normalized), self._signature(normalized)
+
+    def _signature(self, normalized: str) -> List[int]:
+        data = normalized.encode()
+        k = self.shingle_size
+        if len(data) < k:
+            hashes = [zlib.crc32(data)]
+        else:
+            crc32 = zlib.crc32
+            hashes = [crc32(data[i:i + k]) for i in range(len(data) - k + 1)]
+
+        n = self.num_bins
+        empty = _MASK32 + 1
+        bins = [empty] * n
+        for h in hashes:
+            h = (h * _GOLDEN) & _MASK32
+            b = h % n
+            if h < bins[b]:
+                bins[b] = h
+
+        # Densify: an empty bin borrows from the next non-empty one (short texts leave gaps)
+        if empty in bins:
+            for b in range(n):
+                if bins[b] == empty:
+                    step = 1
+                    while bins[(b + step) % n] == empty and step < n:
+                        step += 1
+                    bins[b] = (bins[(b + step) % n] + step) & _MASK32
+        return bins
+
+    def _band_keys(self, signature: List[int]) -> List[int]:
+        rows = self.rows
+        return [hash(tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def build(self, rows: Iterable[Tuple[int, int, int, List[int]]]):
+        """Replace the contents with (question_id, quiz_id, text_hash, signature) rows in one bulk load."""
+        with self._lock:
+            question_ids, quiz_ids, signatures, exact_keys = array("l"), array("l"), array("I"), array("q")
+            for question_id, quiz_id, exact_hash, signature in rows:
+                question_ids.append(question_id)
+                quiz_ids.append(quiz_id)
+                exact_keys.append(exact_hash)
+                signatures.extend(signature)
+
+            self._question_ids, self._quiz_ids, self._signatures = question_ids, quiz_ids, signatures
+            self._removed = bytearray(len(question_ids))
+            self._slots = {question_id: slot for slot, question_id in enumerate(question_ids)}
+            self._exact.bulk_load(exact_keys)
+            # One band at a time keeps the transient memory to a single key array
+            n, rows = self.num_bins, self.rows
+            for band, band_map in enumerate(self._band_maps):
+                offset = band * rows
+                band_map.bulk_load(array("q", [hash(tuple(signatures[start:start + rows]))
+                                               for start in range(offset, len(signatures), n)]))
+            self.max_id = max(question_ids) if question_ids else 0
+
+    def add(self, question_id: int, quiz_id: int, exact_hash: int, signature: List[int]):
+        with self._lock:
+            if question_id in self._slots:
+                return
+            slot = len(self._question_ids)
+            self._question_ids.append(question_id)
+            self._quiz_ids.append(quiz_id)
+            self._removed.append(0)
+            self._signatures.extend(signature)
+            self._slots[question_id] = slot
+            self._exact.add(exact_hash, slot)
+            for band_map, key in zip(self._band_maps, self._band_keys(signature)):
+                band_map.add(key, slot)
+            self.max_id = max(self.max_id, question_id)
+
+    def remove(self, question_ids: Iterable[int]):
+        with self._lock:
+            for question_id in question_ids:
+                slot = self._slots.pop(question_id, None)
+                if slot is not None:
+                    self._removed[slot] = 1
+
+    def remove_quiz(self, quiz_id: int) -> List[int]:
+        """Remove a quiz's questions; returns their ids."""
+        with self._lock:
+            question_ids = [self._question_ids[slot] for slot in self._slots.values() if self._quiz_ids[slot] == quiz_id]
+            self.remove(question_ids)
+            return question_ids
+
+    def find(self, text: str, limit: int = 5, exclude_quiz_id: Optional[int] = None) -> List[DuplicateMatch]:
+        """Indexed questions at or above threshold similarity, most similar first."""
+        return self.find_fingerprint(*self.fingerprint(text), limit=limit, exclude_quiz_id=exclude_quiz_id)
+
+    def find_fingerprint(self, exact_key: int, signature: List[int], limit: int = 5,
+                         exclude_quiz_id: Optional[int] = None) -> List[DuplicateMatch]:
+        n = self.num_bins
+        with self._lock:
+            exact = set(self._exact.get(exact_key))
+            candidates = set(exact)
+            for band_map, key in zip(self._band_maps, self._band_keys(signature)):
+                candidates.update(band_map.get(key))
+
+            matches = []
+            signatures = self._signatures
+            for slot in candidates:
+                if self._removed[slot] or self._quiz_ids[slot] == exclude_quiz_id:
+                    continue
+                if slot in exact:
+                    similarity = 1.0
+                else:
+                    stored = signatures[slot * n:(slot + 1) * n]
+                    similarity = sum(1 for a, b in zip(signature, stored) if a == b) / n
+                    if similarity < self.threshold:
+                        continue
+                matches.append(DuplicateMatch(self._question_ids[slot], self._quiz_ids[slot], similarity))
+
+        matches.sort(key=lambda match: (-match.similarity, match.question_id))
+        return matches[:limit]
+
+    def __len__(self):
+        return len(self._slots)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'questions': len(self._slots),
+                'tombstones': len(self._question_ids) - len(self._slots),
+                'threshold': self.threshold,
+                'bins': self.num_bins,
+                'bands': self.bands,
+                'max_id': self.max_id
+            }
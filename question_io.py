@@ -0,0 +1,269 @@
+"""
+GMU Quiz Land - Question Import/Export
+Streaming readers and writers for questions as CSV, JSON and GIFT files
+"""
+
+import csv
+import io
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO
+
+from question_parser import LETTERS, QUESTION_FIELDS, normalize_question
+
+FORMATS = ("csv", "json", "gift")
+EXTENSIONS = {".csv": "csv", ".json": "json", ".jsonl": "json", ".ndjson": "json", ".gift": "gift", ".txt": "gift"}
+CSV_COLUMNS = ("quiz",) + QUESTION_FIELDS
+QUIZ_KEYS = ("quiz", "quiz_title", "title")
+MAX_OPTION_LENGTH = 500  # Question.option_* columns
+MAX_TITLE_LENGTH = 200  # Quiz.title
+EXPORT_CHUNK_ROWS = 500
+
+_GIFT_SPECIAL = re.compile(r"([~=#{}:\\])")
+_GIFT_ESCAPED = re.compile(r"\\(.)", re.DOTALL)
+_GIFT_BRACE = re.compile(r"(?<!\\)[{}]")
+_GIFT_ANSWER = re.compile(r"(?<!\\)([=~])((?:\\.|[^=~\\])*)", re.DOTALL)
+_GIFT_FEEDBACK = re.compile(r"(?<!\\)#")
+_GIFT_WEIGHT = re.compile(r"^\s*%(-?\d+(?:\.\d+)?)%")
+_GIFT_TITLE = re.compile(r"^\s*::(?:\\.|[^\\])*?::", re.DOTALL)
+_GIFT_MARKUP = re.compile(r"^\s*\[(?:html|markdown|plain|moodle)\]", re.IGNORECASE)
+_GIFT_CATEGORY_PREFIX = re.compile(r"^\$\w+\$/(?:top/)?")
+
+
+class ImportRow(NamedTuple):
+    row: int  # line number (CSV, JSON lines, GIFT) or position in a JSON array
+    question: Optional[Dict]  # normalize_question() output plus "quiz", the quiz title or None
+    error: Optional[str]
+
+
+def question_format(filename: str) -> Optional[str]:
+    """The format a file name's extension suggests, or None."""
+    return EXTENSIONS.get(os.path.splitext(filename or "")[1].lower())
+
+
+def _quiz_title(item: Dict) -> Optional[str]:
+    for key, value in item.items():
+        if str(key).strip().lower() in QUIZ_KEYS and isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+
+def _canonical_question(item) -> Optional[Dict]:
+    # Records already in the schema (what write_questions produces), without
+    # the cost of normalize_question; anything unusual takes the slow path
+    try:
+        values = [item[field].strip() for field in QUESTION_FIELDS]
+    except (KeyError, TypeError, AttributeError):
+        return None
+    answer = values[5]
+    if not all(values) or answer not in LETTERS or any(value.casefold() == answer.casefold() for value in values[1:5]):
+        return None
+    return dict(zip(QUESTION_FIELDS, values))
+
+
+def check_question(row: int, item, quiz: Optional[str] = None) -> ImportRow:
+    """Validate one parsed record; quiz is the title to use when the record names none."""
+    question = _canonical_question(item) or normalize_question(item)
+    if question is None:
+        return ImportRow(row, None, "needs question text, four options and a correct answer (A-D or the option text)")
+    too_long = next((field for field in QUESTION_FIELDS[1:5] if len(question[field]) > MAX_OPTION_LENGTH), None)
+    if too_long:
+        return ImportRow(row, None, f"{too_long} is longer than {MAX_OPTION_LENGTH} characters")
+    question["quiz"] = _quiz_title(item) or quiz
+    if question["quiz"] and len(question["quiz"]) > MAX_TITLE_LENGTH:
+        return ImportRow(row, None, f"quiz title is longer than {MAX_TITLE_LENGTH} characters")
+    return ImportRow(row, question, None)
+
+
+def read_questions(stream: TextIO, fmt: str) -> Iterator[ImportRow]:
+    """Yield an ImportRow for every record in stream, valid or not, reading it incrementally."""
+    readers = {"csv": _read_csv, "json": _read_json, "gift": _read_gift}
+    if fmt not in readers:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return readers[fmt](stream)
+
+
+def _read_csv(stream: TextIO) -> Iterator[ImportRow]:
+    reader = csv.DictReader(stream)
+    for item in reader:
+        if any(isinstance(value, str) and value.strip() for value in item.values()):
+            yield check_question(reader.line_num, item)
+
+
+def _expand_json(row: int, item) -> Iterator[ImportRow]:
+    # A question, {"title": ..., "questions": [...]} or {"quizzes": [{"title": ..., "questions": [...]}, ...]}
+    if isinstance(item, dict) and isinstance(item.get("quizzes"), list):
+        for quiz in item["quizzes"]:
+            yield from _expand_json(row, quiz)
+    elif isinstance(item, dict) and isinstance(item.get("questions"), list):
+        quiz = _quiz_title(item)
+        for position, question in enumerate(item["questions"], 1):
+            yield check_question(position, question, quiz)
+    else:
+        yield check_question(row, item)
+
+
+def _read_json(stream: TextIO) -> Iterator[ImportRow]:
+    """
+    JSON lines, one record per line, are read a line at a time. If the first
+    line is not a JSON value by itself (a pretty-printed document or an
+    array), the whole stream is parsed as one document instead.
+    """
+    first = True
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            if first:
+                yield from _read_json_document(line + stream.read())
+                return
+            yield ImportRow(line_number, None, f"invalid JSON: {e}")
+            continue
+        if first and isinstance(item, list):
+            yield from _read_json_document(line + stream.read())
+            return
+        first = False
+        yield from _expand_json(line_number, item)
+
+
+def _read_json_document(text: str) -> Iterator[ImportRow]:
+    try:
+        document = json.loads(text)
+    except ValueError as e:
+        yield ImportRow(getattr(e, "lineno", 1), None, f"invalid JSON: {e}")
+        return
+    if isinstance(document, list):
+        for position, item in enumerate(document, 1):
+            yield from _expand_json(position, item)
+    else:
+        yield from _expand_json(1, document)
+
+
+def _gift_unescape(text: str) -> str:
+    if "\\" not in text:
+        return text.strip()
+    return _GIFT_ESCAPED.sub(lambda m: "\n" if m.group(1) == "n" else m.group(1), text).strip()
+
+
+def _parse_gift(block: str) -> Dict:
+    """One GIFT question as a dict of QUESTION_FIELDS; raises ValueError for other question types."""
+    block = _GIFT_MARKUP.sub("", _GIFT_TITLE.sub("", block))
+    braces = [m.start() for m in _GIFT_BRACE.finditer(block)]
+    if len(braces) != 2 or block[braces[0]] != "{":
+        raise ValueError("expected question text followed by one {answers} block")
+    start, end = braces
+    text = block[:start].strip()
+    after = block[end + 1:].strip()
+    if after:
+        text = f"{text} _____ {after}" if text else after  # missing-word layout
+
+    options, correct = [], []
+    for marker, answer in _GIFT_ANSWER.findall(block[start + 1:end]):
+        answer = _GIFT_FEEDBACK.split(answer, 1)[0]
+        weight = _GIFT_WEIGHT.match(answer)
+        if weight:
+            answer = answer[weight.end():]
+        if "->" in answer:
+            raise ValueError("matching questions are not supported")
+        if marker == "=" or (weight and float(weight.group(1)) >= 100):
+            correct.append(len(options))
+        options.append(_gift_unescape(answer))
+    if len(options) != 4 or len(correct) != 1:
+        raise ValueError("only multiple-choice questions with four options and one correct answer are supported")
+    item = {"question": _gift_unescape(text), "correct_answer": LETTERS[correct[0]]}
+    item.update(zip(QUESTION_FIELDS[1:5], options))
+    return item
+
+
+def _read_gift(stream: TextIO) -> Iterator[ImportRow]:
+    """GIFT (Moodle) questions; $CATEGORY lines set the quiz of the questions after them."""
+    category, lines, start, depth = None, [], 0, 0
+    for line_number, line in enumerate(stream, 1):
+        stripped = line.strip()
+        if not lines and (not stripped or stripped.startswith("//")):
+            continue
+        if not lines and stripped.startswith("$CATEGORY:"):
+            category = _GIFT_CATEGORY_PREFIX.sub("", stripped[len("$CATEGORY:"):].strip()) or None
+            continue
+        if stripped.startswith("//"):
+            continue
+        if stripped or depth:
+            if not lines:
+                start = line_number
+            lines.append(line)
+            if "{" in line or "}" in line:
+                for brace in _GIFT_BRACE.findall(line):
+                    depth += 1 if brace == "{" else -1
+            continue
+        yield _gift_row(start, "".join(lines), category)
+        lines, depth = [], 0
+    if lines:
+        yield _gift_row(start, "".join(lines), category)
+
+
+def _gift_row(row: int, block: str, category: Optional[str]) -> ImportRow:
+    try:
+        item = _parse_gift(block)
+    except ValueError as e:
+        return ImportRow(row, None, str(e))
+    return check_question(row, item, category)
+
+
+def write_questions(questions: Iterable[Dict], fmt: str) -> Iterator[str]:
+    """
+    Serialize questions (dicts with "quiz" and QUESTION_FIELDS) as text
+    chunks of EXPORT_CHUNK_ROWS questions; read_questions reads them back.
+    """
+    writers = {"csv": _csv_lines, "json": _json_lines, "gift": _gift_lines}
+    if fmt not in writers:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    chunk: List[str] = []
+    for text in writers[fmt](questions):
+        chunk.append(text)
+        if len(chunk) == EXPORT_CHUNK_ROWS:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def _csv_lines(questions: Iterable[Dict]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for question in questions:
+        writer.writerow([question.get(column) or "" for column in CSV_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _json_lines(questions: Iterable[Dict]) -> Iterator[str]:
+    for question in questions:
+        yield json.dumps({column: question.get(column) for column in CSV_COLUMNS}) + "\n"
+
+
+def _gift_escape(text: str) -> str:
+    text = _GIFT_SPECIAL.sub(r"\\\1", text.strip()).replace("\r\n", "\n").replace("\n", "\\n")
+    # Also keep text that would read back as a match ("a -> b"), an answer
+    # weight ("%50%...") or a markup tag ("[html]...") literal
+    text = text.replace("->", "-\\>")
+    return "\\" + text if text[:1] in ("%", "[") else text
+
+
+def _gift_lines(questions: Iterable[Dict]) -> Iterator[str]:
+    quiz, number = object(), 0
+    for question in questions:
+        if question.get("quiz") != quiz:
+            quiz, number = question.get("quiz"), 0
+            if quiz:
+                yield f"$CATEGORY: {quiz}\n\n"
+        number += 1
+        options = "\n".join(
+            ("=" if letter == question["correct_answer"] else "~") + _gift_escape(question[f"option_{letter.lower()}"])
+            for letter in LETTERS)
+        yield f"::Q{number}:: {_gift_escape(question['question'])} {{\n{options}\n}}\n\n"
@@ -0,0 +1,193 @@
+"""
+GMU Quiz Land - Question Output Parser
+Incremental parser that pulls quiz questions out of streamed LLM output
+"""
+
+import ast
+import json
+import re
+from typing import Dict, Iterator, List, Optional
+
+QUESTION_FIELDS = ("question", "option_a", "option_b", "option_c", "option_d", "correct_answer")
+LETTERS = ("A", "B", "C", "D")
+
+# Key spellings models use instead of the ones the prompt asks for
+QUESTION_KEYS = ("question", "question_text", "prompt", "stem", "q")
+ANSWER_KEYS = ("correct_answer", "answer", "correct", "correct_option", "correctanswer")
+OPTION_LIST_KEYS = ("options", "choices", "answers")
+
+_LETTER_PREFIX = re.compile(r"^\s*(?:option\s+)?\(?([A-Da-d])\s*[).:\-]\s+", re.IGNORECASE)
+_ANSWER_LETTER = re.compile(r"^\s*(?:option\s+|answer\s*:?\s*)?\(?([A-Da-d])\s*(?:[).:\-]|$)", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_UNQUOTED_KEY = re.compile(r"([{,]\s*)([A-Za-z_][A-Za-z0-9_]*)\s*:")
+_MISSING_COMMA = re.compile(r"(\"|\d|true|false|null)(\s*\n\s*)(\")")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_SCANNED_CHARS = re.compile(r'[{}"\\]')
+
+
+def question_key(question: Dict) -> str:
+    """Question text normalized for duplicate detection."""
+    return " ".join(question["question"].lower().split())
+
+
+def repair_json(text: str):
+    """
+    Parse a JSON value the way models tend to get it almost right.
+
+    Tries JSON with raw control characters allowed, then again after each
+    repair in turn: straightening smart quotes and dropping trailing commas,
+    inserting commas missing between lines, and quoting bare keys. Last
+    comes a Python literal, which covers single-quoted strings. Raises
+    ValueError if nothing parses.
+    """
+    repairs = (
+        lambda t: t,
+        lambda t: _TRAILING_COMMA.sub(r"\1", t.translate(_SMART_QUOTES)),
+        lambda t: _MISSING_COMMA.sub(r"\1,\2\3", t),
+        lambda t: _UNQUOTED_KEY.sub(r'\1"\2":', t)
+    )
+    repaired = text
+    for repair in repairs:
+        repaired = repair(repaired)
+        try:
+            return json.loads(repaired, strict=False)
+        except ValueError:
+            pass
+
+    literal = re.sub(r"\btrue\b", "True", repaired)
+    literal = re.sub(r"\bfalse\b", "False", literal)
+    literal = re.sub(r"\bnull\b", "None", literal)
+    try:
+        return ast.literal_eval(literal)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise ValueError("unparseable JSON")
+
+
+def _text(value) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _answer_letter(value, options: Dict[str, str]) -> Optional[str]:
+    if isinstance(value, int) and not isinstance(value, bool):
+        # A bare index: 0-3 is the common reading, 4 can only mean D
+        return LETTERS[value] if 0 <= value < 4 else ("D" if value == 4 else None)
+    value = _text(value)
+    if not value:
+        return None
+    for letter, option in options.items():
+        if value.casefold() == option.casefold():
+            return letter
+    match = _ANSWER_LETTER.match(value)
+    return match.group(1).upper() if match else None
+
+
+def normalize_question(item) -> Optional[Dict]:
+    """
+    Map one parsed object onto the question schema, or return None if it
+    is not a complete question.
+
+    Accepts the common variations: alternative key names, options as a list
+    or an {"A": ...} mapping, "A) ..." prefixes on options, and answers
+    given as a letter, "Option B", an index or the option text.
+    """
+    if not isinstance(item, dict):
+        return None
+    item = {str(key).strip().lower(): value for key, value in item.items()}
+
+    question = next((_text(item[key]) for key in QUESTION_KEYS if _text(item.get(key))), "")
+    options = {letter: _text(item.get(f"option_{letter.lower()}") or item.get(letter.lower())) for letter in LETTERS}
+
+    listed = next((item[key] for key in OPTION_LIST_KEYS if isinstance(item.get(key), (list, dict))), None)
+    if isinstance(listed, dict):
+        listed = {str(key).strip().upper()[-1:]: value for key, value in listed.items()}
+        listed = [listed.get(letter) for letter in LETTERS]
+    if isinstance(listed, list) and len(listed) == 4 and not all(options.values()):
+        options = {letter: _LETTER_PREFIX.sub("", _text(value), count=1) for letter, value in zip(LETTERS, listed)}
+
+    if not question or not all(options.values()):
+        return None
+    answer = next((item[key] for key in ANSWER_KEYS if item.get(key) not in (None, "")), None)
+    letter = _answer_letter(answer, options)
+    if letter is None:
+        return None
+
+    return {
+        "question": question,
+        "option_a": options["A"],
+        "option_b": options["B"],
+        "option_c": options["C"],
+        "option_d": options["D"],
+        "correct_answer": letter
+    }
+
+
+class QuestionStreamParser:
+    """
+    Incremental extractor of question objects from text arriving in pieces.
+
+    feed() scans only the new text, tracking string and brace state, and
+    returns every object that closed in it and normalizes to a valid
+    question. Wrappers such as {"questions": [...]}, code fences and prose
+    around the JSON are ignored, and a truncated final object is simply
+    never emitted.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._offset = 0  # absolute position of _buffer[0]
+        self._scanned = 0  # absolute position scanned up to
+        self._starts: List[int] = []
+        self._in_string = False
+        self._skip_to = 0  # the character after a backslash is not special
+
+    def feed(self, text: str) -> List[Dict]:
+        self._buffer += text
+        questions = []
+        buffer, offset = self._buffer, self._offset
+        for match in _SCANNED_CHARS.finditer(buffer, self._scanned - offset):
+            position = offset + match.start()
+            if position < self._skip_to:
+                continue
+            char = match.group()
+            if self._in_string:
+                if char == "\\":
+                    self._skip_to = position + 2
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._starts.append(position)
+            elif char == "}" and self._starts:
+                start = self._starts.pop()
+                try:
+                    question = normalize_question(repair_json(buffer[start - offset:position - offset + 1]))
+                except ValueError:
+                    question = None
+                if question:
+                    questions.append(question)
+        self._scanned = offset + len(buffer)
+
+        # Keep only the text of objects that are still open
+        keep_from = self._starts[0] if self._starts else self._scanned
+        self._buffer = buffer[keep_from - offset:]
+        self._offset = keep_from
+        return questions
+
+
+def parse_questions(text: str, limit: Optional[int] = None) -> List[Dict]:
+    """Every valid question in a complete response, deduplicated by text."""
+    questions, seen = [], set()
+    for question in QuestionStreamParser().feed(text):
+        key = question_key(question)
+        if key not in seen:
+            seen.add(key)
+            questions.append(question)
+    return questions[:limit] if limit is not None else questions
+
+
+def iter_questions(chunks) -> Iterator[Dict]:
+    """Yield questions from an iterable of text pieces as soon as each one is complete."""
+    parser = QuestionStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
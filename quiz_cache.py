@@ -0,0 +1,219 @@
+"""
+GMU Quiz Land - Quiz Content Cache
+In-process, size-bounded cache of compiled quiz snapshots
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class QuestionView(NamedTuple):
+    """Read-only copy of a Question row, usable anywhere a Question is."""
+    id: int
+    question_text: str
+    option_a: str
+    option_b: str
+    option_c: str
+    option_d: str
+    correct_answer: str
+    order: int
+
+
+class QuizSnapshot(NamedTuple):
+    """Everything a student request needs to know about a quiz."""
+    id: int
+    title: str
+    num_questions: int
+    duration_mode: str
+    duration_seconds: int
+    created_at: Optional[datetime]
+    questions: Tuple[QuestionView, ...]
+    answer_key: Dict[int, str]
+    version: int
+    shuffle_questions: bool = False
+    shuffle_options: bool = False
+    sample_size: Optional[int] = None
+
+    @property
+    def questions_per_attempt(self) -> int:
+        if self.sample_size and self.sample_size < self.num_questions:
+            return self.sample_size
+        return self.num_questions
+
+    def public_questions(self, questions: Optional[Tuple[QuestionView, ...]] = None) -> List[Dict]:
+        """Questions (by default all of them, in stored order) as plain dicts with the correct answers stripped."""
+        return [{
+            'id': q.id,
+            'question_text': q.question_text,
+            'option_a': q.option_a,
+            'option_b': q.option_b,
+            'option_c': q.option_c,
+            'option_d': q.option_d
+        } for q in (self.questions if questions is None else questions)]
+
+
+class QuizCache:
+    """
+    LRU cache of QuizSnapshot objects keyed by quiz id.
+
+    Every invalidation bumps the quiz's version. A snapshot that was being
+    loaded while an invalidation happened is returned to its caller but not
+    stored, so an admin edit can never be shadowed by a stale load.
+
+    With sync_path set, processes sharing the file (the workers of one
+    server) see each other's invalidations: each one is appended to the file
+    as a line, and every get() checks the file's size and applies new lines
+    before looking in the cache. Once the file grows past sync_max_bytes the
+    process writing to it swaps in an empty one, and every process drops its
+    whole cache when it sees the new file. Failures to write the file are
+    reported to logger.
+    """
+
+    def __init__(self, maxsize: int = 256, sync_path: Optional[str] = None,
+                 logger: Optional[logging.Logger] = None, sync_max_bytes: int = 1024 * 1024):
+        self.maxsize = maxsize
+        self.sync_path = sync_path
+        self.sync_max_bytes = sync_max_bytes
+        self.logger = logger or logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._epoch = 0  # bumped when everything is dropped, for loads of quizzes with no version yet
+        self._sync_file, self._sync_offset = self._sync_state()
+        self._lock = threading.Lock()
+
+    def get(self, quiz_id: int, loader: Callable[[int, int], Optional[QuizSnapshot]]) -> Optional[QuizSnapshot]:
+        """
+        Return the snapshot for quiz_id, calling loader(quiz_id, version) on a miss.
+
+        Missing quizzes (loader returns None) are not cached.
+        """
+        if self.sync_path and self._sync_state() != (self._sync_file, self._sync_offset):
+            self._sync()
+        with self._lock:
+            snapshot = self._entries.get(quiz_id)
+            if snapshot is not None:
+                self._entries.move_to_end(quiz_id)
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            version = self._versions.get(quiz_id, 0)
+            epoch = self._epoch
+
+        snapshot = loader(quiz_id, version)
+        if snapshot is None:
+            return None
+
+        with self._lock:
+            if self._versions.get(quiz_id, 0) == version and self._epoch == epoch:
+                self._entries[quiz_id] = snapshot
+                self._entries.move_to_end(quiz_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, quiz_id: int):
+        """Drop the cached snapshot for quiz_id and bump its version, in every process sharing sync_path."""
+        with self._lock:
+            self._invalidate(quiz_id)
+        self._publish(f'{quiz_id}\n')
+
+    def clear(self):
+        with self._lock:
+            self._drop_all()
+        self._publish('*\n')
+
+    def _invalidate(self, quiz_id: int):
+        self._versions[quiz_id] = self._versions.get(quiz_id, 0) + 1
+        self._entries.pop(quiz_id, None)
+
+    def _drop_all(self):
+        self._epoch += 1
+        for quiz_id in self._entries:
+            self._versions[quiz_id] = self._versions.get(quiz_id, 0) + 1
+        self._entries.clear()
+
+    def _sync_state(self) -> Tuple[Optional[Tuple[int, int]], int]:
+        """The sync file's identity (device, inode) and size; (None, 0) if there is none."""
+        if not self.sync_path:
+            return None, 0
+        try:
+            st = os.stat(self.sync_path)
+        except OSError:
+            return None, 0
+        return (st.st_dev, st.st_ino), st.st_size
+
+    def _sync(self):
+        # Our own invalidations come back through the file too; applying them twice is harmless
+        with self._lock:
+            try:
+                with open(self.sync_path, 'rb') as f:
+                    st = os.fstat(f.fileno())
+                    size = st.st_size
+                    if self._sync_file is None:
+                        # Created since we last looked: every line in it is news
+                        self._sync_file, self._sync_offset = (st.st_dev, st.st_ino), 0
+                    elif (st.st_dev, st.st_ino) != self._sync_file or size < self._sync_offset:
+                        # Rotated, truncated or replaced: nothing says what changed
+                        self._drop_all()
+                        self._sync_file, self._sync_offset = (st.st_dev, st.st_ino), size
+                        return
+                    f.seek(self._sync_offset)
+                    data = f.read(size - self._sync_offset)
+            except FileNotFoundError:
+                if self._sync_file is not None:
+                    self._drop_all()
+                    self._sync_file, self._sync_offset = None, 0
+                return
+            except OSError:
+                return
+            complete = data[:data.rfind(b'\n') + 1]  # a line still being written waits for the next get
+            self._sync_offset += len(complete)
+            for line in complete.split():
+                if line == b'*':
+                    self._drop_all()
+                elif line.isdigit():
+                    self._invalidate(int(line))
+
+    def _publish(self, line: str):
+        if not self.sync_path:
+            return
+        try:
+            for _ in range(2):
+                # O_APPEND writes this short are atomic, so concurrent writers never interleave lines
+                fd = os.open(self.sync_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line.encode())
+                    st = os.fstat(fd)
+                finally:
+                    os.close(fd)
+                if st.st_size > self.sync_max_bytes:
+                    self._rotate()
+                    break
+                # A process that has moved on to a newer file would never read this one; say it again there
+                if self._sync_state()[0] == (st.st_dev, st.st_ino):
+                    break
+        except OSError as e:
+            self.logger.warning('Quiz cache sync via %s failed, other processes may serve stale quizzes: %s',
+                                self.sync_path, e)
+
+    def _rotate(self):
+        # Swapped in whole rather than truncated, so a process that reads the file
+        # rarely cannot mistake a new file that has grown past its offset for the old one
+        replacement = f'{self.sync_path}.{os.getpid()}.tmp'
+        os.close(os.open(replacement, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644))
+        os.replace(replacement, self.sync_path)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
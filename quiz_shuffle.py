@@ -0,0 +1,84 @@
+"""
+GMU Quiz Land - Per-Attempt Shuffling
+Question order, question sampling and option order derived from a seed stored on each attempt
+"""
+
+import itertools
+import random
+import secrets
+from typing import List, Optional, Set, Tuple
+
+from quiz_cache import QuestionView, QuizSnapshot
+
+LETTERS = ('A', 'B', 'C', 'D')
+# Every ordering of the options: PERMUTATIONS[p][i] is the stored letter shown at position i
+PERMUTATIONS = tuple(itertools.permutations(LETTERS))
+_TO_STORED = tuple(dict(zip(LETTERS, permutation)) for permutation in PERMUTATIONS)
+_TO_SHOWN = tuple(dict(zip(permutation, LETTERS)) for permutation in PERMUTATIONS)
+_MASK64 = (1 << 64) - 1
+
+
+def new_seed() -> int:
+    """A seed for Attempt.shuffle_seed; 31 bits so it fits a signed 32-bit column."""
+    return secrets.randbits(31)
+
+
+def _mix(seed: int, question_id: int) -> int:
+    # SplitMix64 finalizer: stable across processes and Python versions, unlike hash()
+    z = (((seed << 32) ^ question_id) * 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+def _permutation(quiz: QuizSnapshot, seed: Optional[int], question_id: int) -> int:
+    """Index into PERMUTATIONS of a question's option order; 0 is the stored order."""
+    if seed is None or not quiz.shuffle_options:
+        return 0
+    return _mix(seed, question_id) % len(PERMUTATIONS)
+
+
+def question_order(quiz: QuizSnapshot, seed: Optional[int]) -> List[int]:
+    """
+    Positions in quiz.questions of the questions an attempt gets, in the
+    order it sees them.
+
+    Sampled questions keep their stored order unless the quiz also shuffles.
+    Attempts without a seed see every question in stored order.
+    """
+    count = len(quiz.questions)
+    size = min(quiz.questions_per_attempt, count)
+    if seed is None or (size >= count and not quiz.shuffle_questions):
+        return list(range(count))
+    positions = random.Random(seed).sample(range(count), size)
+    return positions if quiz.shuffle_questions else sorted(positions)
+
+
+def shown_question(quiz: QuizSnapshot, seed: Optional[int], question: QuestionView) -> QuestionView:
+    """question with its options in the order the attempt sees them and correct_answer relabelled to match."""
+    p = _permutation(quiz, seed, question.id)
+    if not p:
+        return question
+    options = {'A': question.option_a, 'B': question.option_b, 'C': question.option_c, 'D': question.option_d}
+    a, b, c, d = (options[letter] for letter in PERMUTATIONS[p])
+    return question._replace(option_a=a, option_b=b, option_c=c, option_d=d,
+                             correct_answer=_TO_SHOWN[p].get(question.correct_answer, question.correct_answer))
+
+
+def attempt_questions(quiz: QuizSnapshot, seed: Optional[int]) -> Tuple[QuestionView, ...]:
+    """The questions exactly as an attempt sees them."""
+    return tuple(shown_question(quiz, seed, quiz.questions[position]) for position in question_order(quiz, seed))
+
+
+def attempt_question_ids(quiz: QuizSnapshot, seed: Optional[int]) -> Set[int]:
+    return {quiz.questions[position].id for position in question_order(quiz, seed)}
+
+
+def stored_answer(quiz: QuizSnapshot, seed: Optional[int], question_id: int, letter: str) -> str:
+    """The stored option letter behind the letter an attempt selected."""
+    return _TO_STORED[_permutation(quiz, seed, question_id)].get(letter, letter)
+
+
+def shown_answer(quiz: QuizSnapshot, seed: Optional[int], question_id: int, letter: str) -> str:
+    """The letter an attempt saw for a stored option letter."""
+    return _TO_SHOWN[_permutation(quiz, seed, question_id)].get(letter, letter)
@@ -4,9 +4,14 @@ GMU Quiz Land - Run Script
 Simple script to start the Flask application
 """
 
-from app import app
+from app import create_app, create_tables, needs_bootstrap
 
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        if needs_bootstrap():
+            create_tables()
+    
     print("🌐 Starting GMU Quiz Land...")
     print("📚 Admin Login: admin@gmu.edu / admin123")
     print("🔗 Open your browser to: http://localhost:5000")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+GMU Quiz Land - Production Server
+Runs the app under gunicorn with several pre-forked worker processes
+"""
+
+import argparse
+import os
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+class QuizServer(BaseApplication):
+    """
+    gunicorn application that loads the app once in the master process.
+
+    The quiz cache and the templates are warmed before the workers fork,
+    so every worker starts with the same snapshots (questions and answer
+    keys) and compiled templates without loading them. Database
+    connections are closed first; each worker opens its own. Creating or
+    upgrading the schema is left to `flask --app app bootstrap`, run once
+    per deploy, unless bootstrap is set.
+    """
+
+    def __init__(self, options, bootstrap=False):
+        self.options = options
+        self.bootstrap = bootstrap
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('post_fork', _post_fork)
+
+    def load(self):
+        # Configured from QUIZ_CONFIG or config.Config
+        from app import create_app, create_tables, db, needs_bootstrap, warm_quiz_cache
+
+        app = create_app()
+
+        if app.config['ANSWER_WRITE_BEHIND'] and self.cfg.workers > 1:
+            sys.exit('ANSWER_WRITE_BEHIND keeps attempts in process memory; run with --workers 1 or turn it off')
+        with app.app_context():
+            if self.bootstrap:
+                create_tables()
+            elif needs_bootstrap():
+                sys.exit('The database has no tables; run `flask --app app bootstrap` or pass --bootstrap')
+            warmed = warm_quiz_cache()
+            for name in app.jinja_env.list_templates(extensions=['html']):
+                app.jinja_env.get_template(name)
+            db.session.remove()
+            db.engine.dispose()
+        print(f"Warmed {warmed} quiz snapshot(s) before forking {self.cfg.workers} worker(s)")
+        return app
+
+
+def _post_fork(server, worker):
+    from app import db
+
+    app = worker.app.wsgi()  # what load() returned in the master
+    # The master disposed its pool, but drop anything inherited without closing the parent's sockets
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run GMU Quiz Land with multiple worker processes.')
+    parser.add_argument('--bind', default=os.environ.get('BIND', '0.0.0.0:8000'),
+                        help='address to listen on (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=_env_int('WEB_WORKERS', (os.cpu_count() or 1) * 2 + 1),
+                        help='worker processes (default: 2 x CPUs + 1)')
+    parser.add_argument('--threads', type=int, default=_env_int('WEB_THREADS', 4),
+                        help='threads per worker; more than 1 uses the gthread worker (default: %(default)s)')
+    parser.add_argument('--keepalive', type=int, default=_env_int('WEB_KEEPALIVE', 5),
+                        help='seconds to hold an idle keep-alive connection (default: %(default)s)')
+    parser.add_argument('--timeout', type=int, default=_env_int('WEB_TIMEOUT', 60),
+                        help='seconds before a silent worker is killed and replaced (default: %(default)s)')
+    parser.add_argument('--graceful-timeout', type=int, default=_env_int('WEB_GRACEFUL_TIMEOUT', 30),
+                        help='seconds workers get to finish requests on reload or shutdown (default: %(default)s)')
+    parser.add_argument('--max-requests', type=int, default=_env_int('WEB_MAX_REQUESTS', 0),
+                        help='restart a worker after this many requests, 0 for never (default: %(default)s)')
+    parser.add_argument('--bootstrap', action='store_true',
+                        help='create or upgrade the schema before starting, for single-instance deployments')
+    parser.add_argument('--pid', default=os.environ.get('WEB_PIDFILE'),
+                        help='write the master PID here, for kill -HUP')
+    args = parser.parse_args()
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'keepalive': args.keepalive,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': True,
+        'pidfile': args.pid,
+        'accesslog': '-'
+    }
+    # kill -HUP <master> forks fresh workers and retires the old ones once their requests finish.
+    # The app is preloaded, so new code needs kill -USR2 (a new master) and then -QUIT for the old one.
+    QuizServer(options, bootstrap=args.bootstrap).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+GMU Quiz Land - Test Configuration
+Makes the top-level modules importable and builds apps on a temporary database
+"""
+
+import os
+import sys
+
+import pytest
+from jinja2 import ChoiceLoader, FunctionLoader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as quiz_app  # noqa: E402
+from config import Config  # noqa: E402
+
+# The student templates are kept next to app.py and the site's base template
+# is not in the repository; serve them under the names the routes render
+STUDENT_TEMPLATES = ('index.html', 'quizzes.html', 'quiz_list.html', 'start_quiz.html', 'take_quiz.html',
+                     'quiz_results.html')
+BASE_TEMPLATE = '<title>{% block title %}{% endblock %}</title>{% block content %}{% endblock %}'
+
+
+def load_template(name):
+    if name == 'base/base.html':
+        return BASE_TEMPLATE
+    folder, _, filename = name.partition('/')
+    if folder == 'student' and filename in STUDENT_TEMPLATES:
+        with open(os.path.join(ROOT, filename), encoding='utf-8') as f:
+            return f.read()
+    return None
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps on one temporary database, as separate server processes would be."""
+    def make(**settings):
+        config = type('TestConfig', (Config,), {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'quiz.db'}",
+            'QUIZ_CACHE_SYNC_PATH': str(tmp_path / 'quiz_cache.sync'),
+            'ANSWER_LOG_PATH': str(tmp_path / 'answers.log'),
+            'GENERATION_CACHE_PATH': '',
+            'LIVE_EVENTS_SOCKET_DIR': '',
+            'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+            'ATTEMPT_SWEEP_INTERVAL_SECONDS': 0,  # tests sweep when they choose to
+            **settings
+        })
+        app = quiz_app.create_app(config)
+        app.jinja_env.loader = ChoiceLoader([app.jinja_env.loader, FunctionLoader(load_template)])
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        quiz_app.create_tables()
+    return app
+
+
+def login_admin(app, client):
+    with app.app_context():
+        admin = quiz_app.User.query.filter_by(email='admin@gmu.edu').one()
+        user_id = admin.get_id()
+    with client.session_transaction() as session:
+        session['_user_id'] = user_id
+        session['_fresh'] = True
+    return client
+
+
+def add_quiz(app, texts, **fields):
+    """Store a quiz with a question per text, each answered B; returns its id."""
+    with app.app_context():
+        quiz = quiz_app.Quiz(title=fields.pop('title', 'Quiz'), num_questions=len(texts),
+                             duration_mode=fields.pop('duration_mode', 'overall'),
+                             duration_seconds=fields.pop('duration_seconds', 600), **fields)
+        quiz_app.db.session.add(quiz)
+        quiz_app.db.session.flush()
+        for order, text in enumerate(texts, 1):
+            quiz_app.db.session.add(quiz_app.Question(
+                quiz_id=quiz.id, question_text=text, option_a='a', option_b='b', option_c='c', option_d='d',
+                correct_answer='B', order=order))
+        quiz_app.db.session.commit()
+        return quiz.id
@@ -0,0 +1,63 @@
+"""
+GMU Quiz Land - Admin Session Tests
+Password changes end old sessions, and changes to a user reach the login identity cache
+"""
+
+import app as quiz_app
+from conftest import login_admin
+
+ADMIN = 'admin@gmu.edu'
+
+
+def access(client):
+    """200 for an admin, 403 for another signed-in user, 302 to the login page without a session."""
+    return client.get('/admin/generation-cache').status_code
+
+
+def cached_user(app, user_id):
+    cache = app.extensions['gmu_quiz']['user_cache']
+    return cache._entries.get(user_id, (None, None))[1]
+
+
+def test_password_change_ends_old_sessions(app, make_app):
+    other = make_app(USER_CACHE_TTL_SECONDS=0)
+    client = login_admin(app, app.test_client())
+    with client.session_transaction() as session:
+        cookie_session = dict(session)
+    elsewhere = other.test_client()
+    with elsewhere.session_transaction() as session:
+        session.update(cookie_session)
+    assert access(client) == access(elsewhere) == 200
+
+    result = app.test_cli_runner().invoke(args=['set-password', ADMIN], input='changed secret\nchanged secret\n')
+    assert result.exit_code == 0, result.output
+    assert access(client) == access(elsewhere) == 302
+
+    fresh = app.test_client()
+    response = fresh.post('/admin/login', data={'email': ADMIN, 'password': 'changed secret'})
+    assert response.headers['Location'].endswith('/admin/dashboard')
+    assert access(fresh) == 200
+
+
+def test_committed_user_changes_evict_the_cached_identity(app):
+    client = login_admin(app, app.test_client())
+    assert access(client) == 200
+    with app.app_context():
+        admin = quiz_app.User.query.filter_by(email=ADMIN).one()
+        user_id = admin.id
+        assert cached_user(app, user_id).email == ADMIN
+
+        admin.email = 'dean@gmu.edu'
+        quiz_app.db.session.flush()
+        assert cached_user(app, user_id) is not None  # until the change is committed
+        quiz_app.db.session.rollback()
+        assert cached_user(app, user_id).email == ADMIN
+
+        admin.is_admin = False
+        admin.email = 'dean@gmu.edu'
+        quiz_app.db.session.commit()
+        assert cached_user(app, user_id) is None
+
+    # Revoking admin rights applies to the open session at once, not after the cache TTL
+    assert access(client) == 403
+    assert (cached_user(app, user_id).email, cached_user(app, user_id).is_admin) == ('dean@gmu.edu', False)
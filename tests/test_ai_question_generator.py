@@ -0,0 +1,226 @@
+"""
+GMU Quiz Land - AI Question Generator Tests
+Chunking, retries and endpoint rotation against a local stand-in for the API
+"""
+
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ai_question_generator
+from ai_question_generator import NVIDIAQuestionGenerator, SimpleQuestionGenerator
+from conftest import login_admin
+
+
+class StubAPI:
+    """
+    A chat completions server on localhost.
+
+    Answers every POST with a streamed completion holding as many questions
+    as the prompt asks for, except that failures[path] lists status codes
+    to answer that path with first, one per request.
+    """
+
+    def __init__(self):
+        self.calls = []  # (path, questions asked for), in arrival order
+        self.failures = {}
+        self._numbers = itertools.count(1)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                wanted = int(re.search(r"Generate (\d+)", body["messages"][0]["content"]).group(1))
+                with stub._lock:
+                    stub.calls.append((self.path, wanted))
+                    pending = stub.failures.get(self.path)
+                    status = pending.pop(0) if pending else 200
+                    numbers = [next(stub._numbers) for _ in range(wanted)] if status == 200 else []
+                if status != 200:
+                    self.send_response(status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._stream(json.dumps([stub.question(number) for number in numbers]))
+
+            def _stream(self, text):
+                # Split mid-token, as a model's output arrives
+                events = [json.dumps({"choices": [{"delta": {"content": text[i:i + 25]}}]})
+                          for i in range(0, len(text), 25)]
+                data = "".join(f"data: {event}\n\n" for event in events + ["[DONE]"]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def question(number):
+        return {"question": f"Stub question number {number}?", "option_a": "a", "option_b": "b",
+                "option_c": "c", "option_d": "d", "correct_answer": "B"}
+
+    def url(self, path):
+        return self.base_url + path
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def api():
+    stub = StubAPI()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff delays the generator waits, recorded instead of slept."""
+    delays = []
+    monkeypatch.setattr(ai_question_generator.time, "sleep", delays.append)
+    return delays
+
+
+def make_generator(api, paths, **options):
+    options.setdefault("backoff", 0.5)
+    return NVIDIAQuestionGenerator(api_key="test-key", endpoints=[api.url(path) for path in paths], **options)
+
+
+def test_missing_api_key_is_an_error(monkeypatch):
+    monkeypatch.delenv("NVIDIA_API_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="NVIDIA_API_KEY"):
+        NVIDIAQuestionGenerator()
+
+
+def test_api_key_from_environment(monkeypatch):
+    monkeypatch.setenv("NVIDIA_API_KEY", "from-env")
+    generator = NVIDIAQuestionGenerator()
+    assert generator.session.headers["Authorization"] == "Bearer from-env"
+
+
+def test_large_request_is_split_into_chunks(api, sleeps):
+    generator = make_generator(api, ["/v1"], chunk_size=4, max_workers=3)
+
+    questions = generator.generate_questions("Biology", 10)
+
+    assert sorted(wanted for _, wanted in api.calls) == [2, 4, 4]
+    assert len(questions) == 10
+    assert len({question["question"] for question in questions}) == 10
+    assert sleeps == []
+
+
+def test_retryable_errors_back_off_exponentially(api, sleeps):
+    api.failures["/v1"] = [503, 429]
+    generator = make_generator(api, ["/v1"], max_retries=3)
+
+    questions = generator.generate_questions("Biology", 3)
+
+    assert len(questions) == 3
+    assert api.calls == [("/v1", 3)] * 3
+    # backoff * 2**attempt, stretched by up to 100% jitter
+    assert len(sleeps) == 2
+    assert 0.5 <= sleeps[0] < 1.0
+    assert 1.0 <= sleeps[1] < 2.0
+
+
+def test_retries_rotate_through_the_endpoints(api, sleeps):
+    api.failures["/down"] = [503] * 10
+    generator = make_generator(api, ["/down", "/up"], max_retries=3)
+
+    questions = generator.generate_questions("Biology", 3)
+
+    assert len(questions) == 3
+    assert [path for path, _ in api.calls] == ["/down", "/up"]
+    assert len(sleeps) == 1
+
+
+def test_chunks_start_on_different_endpoints(api, sleeps):
+    generator = make_generator(api, ["/a", "/b"], chunk_size=2, max_workers=2)
+
+    generator.generate_questions("Biology", 4)
+
+    assert sorted(path for path, _ in api.calls) == ["/a", "/b"]
+
+
+def test_other_errors_move_on_without_waiting(api, sleeps):
+    api.failures["/gone"] = [404]
+    generator = make_generator(api, ["/gone", "/up"], max_retries=3)
+
+    questions = generator.generate_questions("Biology", 2)
+
+    assert len(questions) == 2
+    assert [path for path, _ in api.calls] == ["/gone", "/up"]
+    assert sleeps == []
+
+
+def test_gives_up_after_max_retries(api, sleeps):
+    api.failures["/v1"] = [503] * 100
+    generator = make_generator(api, ["/v1"], max_retries=2)
+
+    assert generator.generate_questions("Biology", 2) == []
+    # Each of the two rounds (the second tops up a short first) tries 1 + max_retries times
+    assert len(api.calls) == 6
+    assert len(sleeps) == 4
+
+
+def test_retry_asks_only_for_the_missing_questions(api, sleeps, monkeypatch):
+    generator = make_generator(api, ["/v1"], max_retries=1)
+    streamed = generator._stream_endpoint
+    requests_made = []
+
+    def cut_off_first_response(endpoint, prompt, num_questions, stop=None):
+        requests_made.append(num_questions)
+        pieces = streamed(endpoint, prompt, num_questions, stop)
+        if len(requests_made) > 1:
+            yield from pieces
+            return
+        # The first two questions arrive, then the connection drops
+        text = "".join(pieces)
+        yield text[:text.index("number 3")]
+        raise ai_question_generator.GenerationError("connection reset")
+
+    monkeypatch.setattr(generator, "_stream_endpoint", cut_off_first_response)
+
+    questions = generator.generate_questions("Biology", 5)
+
+    assert [wanted for _, wanted in api.calls] == [5, 3]
+    assert len(questions) == 5
+
+
+def test_admin_routes_fall_back_to_sample_questions_without_a_key(app, monkeypatch):
+    monkeypatch.delenv("NVIDIA_API_KEY", raising=False)
+    client = login_admin(app, app.test_client())
+    samples = SimpleQuestionGenerator().generate_questions("Python", 3)
+
+    response = client.post("/admin/generate-questions", json={"topic": "Python", "num_questions": 3})
+    assert response.status_code == 200
+    assert response.get_json()["questions"] == samples
+
+    response = client.post("/admin/generate-questions", json={"topic": "Python", "num_questions": 3, "stream": True})
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == samples
+
+    response = client.post("/admin/ai-create-quiz", json={"topic": "Python", "num_questions": 3})
+    assert response.status_code == 202
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(response.headers["Location"]).get_json()
+        if job["status"] not in ("queued", "running") or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert (job["status"], job["used_fallback"], job["error"]) == ("completed", True, None)
+    assert job["questions"] == samples
+    assert job["quiz_id"] is not None
@@ -0,0 +1,168 @@
+"""
+GMU Quiz Land - Attempt Deadline Tests
+Late answers, per-question overruns and the expiry sweep, with the clock moved forward
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as quiz_app
+from conftest import add_quiz
+
+GRACE = timedelta(seconds=10)  # Config.ATTEMPT_DEADLINE_GRACE_SECONDS
+ALLOWANCE = timedelta(seconds=30)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The app's clock; advance it with clock.offset += timedelta(...)."""
+    class Clock(datetime):
+        offset = timedelta()
+
+        @classmethod
+        def utcnow(cls):
+            return datetime.utcnow() + cls.offset
+
+    monkeypatch.setattr(quiz_app, 'datetime', Clock)
+    return Clock
+
+
+def start(app, quiz_id):
+    client = app.test_client()
+    assert client.post(f'/student/start-quiz/{quiz_id}', data={'student_name': 'Ada'}).status_code == 302
+    with client.session_transaction() as session:
+        attempt_id = session['attempt_id']
+    return client, attempt_id
+
+
+def answer(client, question_id, letter='B'):
+    return client.post('/student/submit-answer', json={'question_id': question_id, 'selected_answer': letter})
+
+
+def question_ids(app, quiz_id):
+    with app.app_context():
+        return [question.id for question in quiz_app.Question.query.filter_by(quiz_id=quiz_id)
+                .order_by(quiz_app.Question.order)]
+
+
+def stored(app, quiz_id, attempt_id):
+    """The attempt row and its answers by question id; the summary tables must match a recount."""
+    with app.app_context():
+        attempt = quiz_app.db.session.get(quiz_app.Attempt, attempt_id)
+        answers = {answer.question_id: answer.selected_answer
+                   for answer in quiz_app.Answer.query.filter_by(attempt_id=attempt_id)}
+        assert quiz_app.read_results_stats(quiz_id) == quiz_app.compute_results_stats(quiz_id)
+        quiz_app.db.session.expunge(attempt)
+        return attempt, answers
+
+
+def test_late_answer_closes_an_overall_attempt(app, clock):
+    quiz_id = add_quiz(app, ['First?', 'Second?', 'Third?'], duration_seconds=60)
+    first, second, _ = question_ids(app, quiz_id)
+    client, attempt_id = start(app, quiz_id)
+    assert answer(client, first).status_code == 200
+    deadline = stored(app, quiz_id, attempt_id)[0].deadline
+
+    # Within the grace period a slow request still counts
+    clock.offset = timedelta(seconds=60) + GRACE - timedelta(seconds=2)
+    assert answer(client, second, 'C').status_code == 200
+
+    clock.offset += timedelta(seconds=5)
+    response = answer(client, first + second)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Time is up', 'completed': True}
+
+    attempt, answers = stored(app, quiz_id, attempt_id)
+    assert (attempt.is_completed, attempt.end_time, attempt.deadline) == (True, deadline, None)
+    assert (attempt.current_question, attempt.score, len(answers)) == (2, 1, 2)
+    assert answer(client, first + second).get_json()['error'] == 'Attempt not found or completed'
+    with app.app_context():
+        assert quiz_app.read_results_stats(quiz_id)['quiz'] == {'attempt_count': 1, 'score_sum': 1}
+
+
+def test_per_question_overrun_skips_the_question_and_moves_the_deadline(app, clock):
+    quiz_id = add_quiz(app, ['First?', 'Second?', 'Third?'], duration_mode='per_question', duration_seconds=30)
+    first, second, third = question_ids(app, quiz_id)
+    client, attempt_id = start(app, quiz_id)
+    deadline = stored(app, quiz_id, attempt_id)[0].deadline
+
+    clock.offset = ALLOWANCE + GRACE + timedelta(seconds=1)
+    response = answer(client, first)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Time is up for this question', 'completed': False}
+
+    attempt, answers = stored(app, quiz_id, attempt_id)
+    assert answers == {first: quiz_app.BLANK_ANSWER}
+    assert (attempt.is_completed, attempt.current_question, attempt.score) == (False, 1, 0)
+    # The second question's time started when the first one's ran out
+    assert attempt.deadline == deadline + ALLOWANCE
+
+    assert answer(client, second).get_json() == {'success': True, 'is_correct': True}
+    attempt, answers = stored(app, quiz_id, attempt_id)
+    assert answers == {first: quiz_app.BLANK_ANSWER, second: 'B'}
+    assert (attempt.is_completed, attempt.current_question, attempt.score) == (False, 2, 1)
+    assert third not in answers
+
+
+def test_overrunning_the_last_question_completes_the_attempt(app, clock):
+    quiz_id = add_quiz(app, ['First?', 'Second?'], duration_mode='per_question', duration_seconds=30)
+    first, second = question_ids(app, quiz_id)
+    client, attempt_id = start(app, quiz_id)
+    assert answer(client, first).status_code == 200
+
+    # Long enough for several questions, though only one is left
+    clock.offset = 5 * ALLOWANCE
+    response = answer(client, second)
+    assert response.get_json() == {'error': 'Time is up for this question', 'completed': True}
+
+    attempt, answers = stored(app, quiz_id, attempt_id)
+    assert answers == {first: 'B', second: quiz_app.BLANK_ANSWER}
+    assert (attempt.is_completed, attempt.current_question, attempt.score, attempt.deadline) == (True, 2, 1, None)
+    with app.app_context():
+        assert quiz_app.read_results_stats(quiz_id)['buckets'] == {1: 1}
+
+
+def test_take_quiz_page_skips_overrun_questions(app, clock):
+    quiz_id = add_quiz(app, ['First?', 'Second?'], duration_mode='per_question', duration_seconds=30)
+    client, attempt_id = start(app, quiz_id)
+
+    clock.offset = ALLOWANCE + GRACE + timedelta(seconds=1)
+    assert client.get(f'/student/take-quiz/{quiz_id}').status_code == 200
+    assert stored(app, quiz_id, attempt_id)[0].current_question == 1
+
+    clock.offset += ALLOWANCE
+    response = client.get(f'/student/take-quiz/{quiz_id}')
+    assert response.status_code == 302
+    assert f'/student/quiz-results/{quiz_id}' in response.headers['Location']
+    assert stored(app, quiz_id, attempt_id)[0].is_completed
+
+
+def test_sweeper_closes_abandoned_attempts(app, clock):
+    overall = add_quiz(app, ['First?', 'Second?'], duration_seconds=60)
+    per_question = add_quiz(app, ['One?', 'Two?', 'Three?'], duration_mode='per_question', duration_seconds=30)
+    overall_client, overall_attempt = start(app, overall)
+    assert answer(overall_client, question_ids(app, overall)[0]).status_code == 200
+    _, stepped_attempt = start(app, per_question)
+
+    clock.offset = timedelta(seconds=60) + GRACE + timedelta(seconds=1)
+    _, fresh_attempt = start(app, overall)
+    with app.app_context():
+        assert quiz_app.expire_overdue_attempts() == 2
+
+    attempt, answers = stored(app, overall, overall_attempt)
+    assert (attempt.is_completed, attempt.current_question, attempt.score, len(answers)) == (True, 1, 1, 1)
+    # 71 seconds covers the first question's 30 and the second's, with grace
+    attempt, answers = stored(app, per_question, stepped_attempt)
+    assert (attempt.is_completed, attempt.current_question, len(answers)) == (False, 2, 2)
+    assert not stored(app, overall, fresh_attempt)[0].is_completed
+
+    clock.offset += 3 * ALLOWANCE
+    quiz_app.sweep_expired_attempts(app)
+    attempt, answers = stored(app, per_question, stepped_attempt)
+    assert (attempt.is_completed, attempt.current_question, attempt.score) == (True, 3, 0)
+    assert set(answers.values()) == {quiz_app.BLANK_ANSWER}
+    assert stored(app, overall, fresh_attempt)[0].is_completed
+    with app.app_context():
+        assert quiz_app.expire_overdue_attempts() == 0
+        assert quiz_app.read_results_stats(overall)['quiz'] == {'attempt_count': 2, 'score_sum': 1}
@@ -0,0 +1,184 @@
+"""
+GMU Quiz Land - Live Exam Events Tests
+Coalescing, overflow, cleanup and delivery between processes sharing a socket directory
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+
+import app as quiz_app
+from conftest import add_quiz, login_admin
+from live_events import LiveEvent, LiveEventBroker, LocalBackend, SocketBackend, Subscription
+
+
+def event(kind, key=None, quiz_id=1, **data):
+    return LiveEvent(quiz_id, kind, json.dumps(data), key)
+
+
+def test_events_with_a_key_replace_waiting_ones():
+    subscription = Subscription(1)
+    assert subscription.put(event('answer_submitted', 'attempt:1', n=1)) is False
+    assert subscription.put(event('answer_submitted', 'attempt:2', n=1)) is False
+    assert subscription.put(event('attempt_started')) is False
+    assert subscription.put(event('answer_submitted', 'attempt:1', n=2)) is True
+
+    events, overflowed = subscription.get(timeout=0)
+    # The replacement moves to the back: events stay in the order their latest state arrived
+    assert [(e.coalesce_key, json.loads(e.payload)) for e in events] == [
+        ('attempt:2', {'n': 1}), (None, {}), ('attempt:1', {'n': 2})]
+    assert overflowed is False
+    assert subscription.get(timeout=0) == ([], False)
+
+
+def test_overflow_drops_the_oldest_and_is_reported_once():
+    subscription = Subscription(1, maxsize=2)
+    for n in range(3):
+        subscription.put(event('answer_submitted', f'attempt:{n}'))
+    events, overflowed = subscription.get(timeout=0)
+    assert [e.coalesce_key for e in events] == ['attempt:1', 'attempt:2']
+    assert overflowed is True
+
+    subscription.put(event('answer_submitted', 'attempt:3'))
+    assert subscription.get(timeout=0)[1] is False
+
+
+def test_get_waits_for_an_event_and_close_wakes_it():
+    subscription = Subscription(1)
+    started = time.monotonic()
+    assert subscription.get(timeout=0.05) == ([], False)
+    assert time.monotonic() - started >= 0.04
+
+    subscription.close()
+    started = time.monotonic()
+    assert subscription.get(timeout=5) == ([], False)
+    assert time.monotonic() - started < 1
+
+
+class RecordingBackend(LocalBackend):
+    def __init__(self):
+        self.calls = []
+
+    def subscribed(self):
+        self.calls.append('subscribed')
+
+    def unsubscribed(self):
+        self.calls.append('unsubscribed')
+
+
+def test_broker_delivers_per_quiz_and_cleans_up():
+    backend = RecordingBackend()
+    broker = LiveEventBroker(backend)
+    broker.publish(1, 'answer_submitted', {'n': 0})
+    assert broker.stats()['published'] == 0  # nobody listening, nothing encoded
+
+    first, second, other = broker.subscribe(1), broker.subscribe(1), broker.subscribe(2)
+    assert backend.calls == ['subscribed']
+    broker.publish(1, 'answer_submitted', {'n': 1}, coalesce_key=('attempt', 7))
+    assert [e.payload for e in first.get(timeout=0)[0]] == ['{"n": 1}']
+    assert [e.coalesce_key for e in second.get(timeout=0)[0]] == ["('attempt', 7)"]
+    assert other.get(timeout=0) == ([], False)
+
+    broker.unsubscribe(first)
+    broker.unsubscribe(first)
+    broker.unsubscribe(other)
+    assert backend.calls == ['subscribed']
+    broker.unsubscribe(second)
+    assert backend.calls == ['subscribed', 'unsubscribed']
+    assert broker.stats()['subscriptions'] == 0
+    assert broker._subscriptions == {}
+
+
+class NamedSocketBackend(SocketBackend):
+    """A SocketBackend named other than by pid, so one test process can hold several."""
+
+    def __init__(self, directory, name, **options):
+        self.name = name
+        super().__init__(directory, **options)
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f'{self.name}.sock')
+
+
+def wait_for_events(subscription, count=1, timeout=5):
+    events, deadline = [], time.monotonic() + timeout
+    while len(events) < count and time.monotonic() < deadline:
+        events += subscription.get(timeout=0.1)[0]
+    return events
+
+
+def test_events_reach_a_broker_sharing_the_socket_directory(tmp_path):
+    directory = str(tmp_path / 'live')
+    publisher = LiveEventBroker(NamedSocketBackend(directory, 'a'))
+    monitor = LiveEventBroker(NamedSocketBackend(directory, 'b'))
+    assert not publisher.backend.listening()
+
+    subscription = monitor.subscribe(1)
+    assert publisher.backend.listening()
+    publisher.publish(1, 'answer_submitted', {'attempt_id': 3, 'score': 1}, coalesce_key='attempt:3')
+    publisher.publish(2, 'answer_submitted', {'attempt_id': 4})
+
+    [received] = wait_for_events(subscription)
+    assert received == LiveEvent(1, 'answer_submitted', '{"attempt_id": 3, "score": 1}', 'attempt:3')
+    assert received.message() == 'event: answer_submitted\ndata: {"attempt_id": 3, "score": 1}\n\n'
+    assert publisher.backend.sent == 2
+
+    monitor.unsubscribe(subscription)
+    assert os.listdir(directory) == []
+    assert not publisher.backend.listening()
+
+
+def test_sockets_left_by_dead_processes_are_removed(tmp_path):
+    directory = tmp_path / 'live'
+    backend = NamedSocketBackend(str(directory), 'a')
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    dead.bind(str(directory / 'dead.sock'))
+    dead.close()
+
+    LiveEventBroker(backend).publish(1, 'answer_submitted', {})
+    assert os.listdir(directory) == []
+
+
+def test_socket_failure_is_logged_and_local_delivery_continues(tmp_path, caplog):
+    logger = logging.getLogger('live-events-test')
+    broker = LiveEventBroker(NamedSocketBackend(str(tmp_path), 'x' * 120, logger=logger))
+    with caplog.at_level(logging.WARNING, logger='live-events-test'):
+        subscription = broker.subscribe(1)
+    assert 'monitors here only see this process' in caplog.text
+
+    broker.publish(1, 'attempt_started', {'attempt_id': 1})
+    assert [e.kind for e in subscription.get(timeout=0)[0]] == ['attempt_started']
+
+
+def test_live_stream_sends_a_snapshot_then_progress(make_app):
+    app = make_app(LIVE_STREAM_HEARTBEAT_SECONDS=0.05, LIVE_STREAM_MAX_SECONDS=5)
+    with app.app_context():
+        quiz_app.create_tables()
+    quiz_id = add_quiz(app, ['First?', 'Second?'])
+    monitor = login_admin(app, app.test_client())
+    student = app.test_client()
+    assert student.post(f'/student/start-quiz/{quiz_id}', data={'student_name': 'Ada'}).status_code == 302
+
+    response = monitor.get(f'/admin/quiz/{quiz_id}/live')
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    first = next(chunks)
+    first = first.decode() if isinstance(first, bytes) else first
+    snapshot = json.loads(first.split('data: ', 1)[1])
+    assert [(a['student_name'], a['current_question']) for a in snapshot['in_progress']] == [('Ada', 0)]
+
+    with app.app_context():
+        question_id = quiz_app.Question.query.filter_by(quiz_id=quiz_id, order=1).one().id
+    student.post('/student/submit-answer', json={'question_id': question_id, 'selected_answer': 'B'})
+    for chunk in chunks:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith('event: '):
+            break
+    assert chunk.startswith('event: answer_submitted\n')
+    assert json.loads(chunk.split('data: ', 1)[1])['current_question'] == 1
+
+    response.close()
+    assert app.extensions['gmu_quiz']['live_events'].stats()['subscriptions'] == 0
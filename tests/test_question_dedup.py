@@ -0,0 +1,143 @@
+"""
+GMU Quiz Land - Duplicate Question Index Tests
+Similarity threshold, removals, and keeping every process's index current
+"""
+
+import pytest
+
+import app as quiz_app
+from conftest import add_quiz, login_admin
+from question_dedup import QuestionIndex, normalize_text, pack_signature, unpack_signature
+
+BASE = "Which organelle is known as the powerhouse of the eukaryotic cell and makes most of its ATP?"
+NEAR = "Which organelle is known as the powerhouse of the eukaryotic cell and makes most of the ATP?"
+UNRELATED = "In what year did the Berlin Wall fall, ending the division of the German capital?"
+
+
+def indexed(*texts, threshold=0.7, quiz_id=1):
+    index = QuestionIndex(threshold=threshold)
+    for question_id, text in enumerate(texts, 1):
+        index.add(question_id, quiz_id, *index.fingerprint(text))
+    return index
+
+
+def similarity(a, b):
+    index = indexed(a, threshold=0.0)
+    [match] = index.find(b)
+    return match.similarity
+
+
+def test_normalization_ignores_case_punctuation_and_spacing():
+    assert normalize_text("  What IS  a Cell?!  ") == normalize_text("what is a cell")
+
+
+def test_exact_duplicates_after_normalization_are_certain():
+    index = indexed(BASE, UNRELATED)
+    [match] = index.find(BASE.upper().replace("?", " ?!"))
+    assert (match.question_id, match.similarity) == (1, 1.0)
+
+
+def test_near_duplicate_is_found_and_unrelated_text_is_not():
+    index = indexed(BASE, UNRELATED)
+    assert [match.question_id for match in index.find(NEAR)] == [1]
+    assert 0.7 <= index.find(NEAR)[0].similarity < 1.0
+    assert index.find("How many moons does Mars have, and what are their names?") == []
+
+
+def test_threshold_is_inclusive():
+    estimate = similarity(BASE, NEAR)
+    assert [match.question_id for match in indexed(BASE, threshold=estimate).find(NEAR)] == [1]
+    assert indexed(BASE, threshold=estimate + 0.01).find(NEAR) == []
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.7, 0.9])
+def test_matches_never_fall_below_the_threshold(threshold):
+    texts = [BASE, NEAR, UNRELATED, BASE.replace("eukaryotic", "animal"),
+             BASE.replace("most of its ATP", "energy"), "Which organelle makes proteins in the cell?"]
+    index = indexed(*texts, threshold=threshold)
+    for text in texts:
+        for match in index.find(text, limit=10):
+            assert match.similarity >= threshold
+
+
+def test_most_similar_first_and_limited():
+    index = indexed(NEAR, BASE, BASE.replace("eukaryotic", "animal"), threshold=0.5)
+    matches = index.find(BASE, limit=2)
+    assert [match.question_id for match in matches] == [2, 1]
+    assert matches[0].similarity == 1.0
+
+
+def test_excluded_quiz_and_removed_questions_are_skipped():
+    index = QuestionIndex()
+    index.add(1, 10, *index.fingerprint(BASE))
+    index.add(2, 20, *index.fingerprint(NEAR))
+    assert [match.quiz_id for match in index.find(BASE, exclude_quiz_id=10)] == [20]
+
+    assert index.remove_quiz(20) == [2]
+    assert [match.question_id for match in index.find(BASE)] == [1]
+    index.remove([1])
+    assert index.find(BASE) == []
+    assert index.stats()["tombstones"] == 2
+
+
+def test_build_matches_incremental_adds():
+    texts = [BASE, NEAR, UNRELATED]
+    built = QuestionIndex()
+    built.build((question_id, 1, *built.fingerprint(text)) for question_id, text in enumerate(texts, 1))
+    added = indexed(*texts)
+    for text in texts:
+        assert built.find(text) == added.find(text)
+    assert built.max_id == added.max_id == 3
+
+
+def test_signature_round_trips_through_storage():
+    signature = QuestionIndex().fingerprint(BASE)[1]
+    assert unpack_signature(pack_signature(signature)) == signature
+
+
+def find_stored(app, text):
+    with app.app_context():
+        [matches] = quiz_app.find_duplicate_questions([text])
+        return sorted(match['question_id'] for match in matches)
+
+
+def replace_questions(app, quiz_id, texts):
+    form = {}
+    for number, text in enumerate(texts, 1):
+        form.update({f'question_{number}': text, f'option_a_{number}': 'a', f'option_b_{number}': 'b',
+                     f'option_c_{number}': 'c', f'option_d_{number}': 'd', f'correct_{number}': 'B'})
+    client = login_admin(app, app.test_client())
+    assert client.post(f'/admin/add-questions/{quiz_id}', data=form).status_code == 302
+
+
+def test_every_process_sees_edited_questions(app, make_app):
+    other = make_app()
+    quiz_id = add_quiz(app, [BASE, UNRELATED])
+    assert find_stored(app, NEAR) == find_stored(other, NEAR) == [1]
+
+    # The replacements reuse the deleted questions' ids
+    replace_questions(other, quiz_id, ["How many chambers does the human heart have in total?", BASE])
+    with app.app_context():
+        assert sorted(question.id for question in quiz_app.Question.query) == [1, 2]
+
+    heart = "how many chambers does the human heart have in total"
+    for process in (app, other):
+        assert find_stored(process, heart) == [1]
+        assert find_stored(process, NEAR) == [2]
+        assert find_stored(process, UNRELATED) == []
+
+
+def test_every_process_forgets_deleted_quizzes(app, make_app):
+    other = make_app()
+    add_quiz(app, [UNRELATED])
+    deleted = add_quiz(app, [BASE])
+    assert find_stored(app, NEAR) == find_stored(other, NEAR) == [2]
+
+    client = login_admin(other, other.test_client())
+    assert client.get(f'/admin/delete-quiz/{deleted}').status_code == 302
+
+    for process in (app, other):
+        assert find_stored(process, NEAR) == []
+        assert find_stored(process, UNRELATED) == [1]
+        with process.app_context():
+            assert len(quiz_app.get_question_index()) == 1
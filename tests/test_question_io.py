@@ -0,0 +1,146 @@
+"""
+GMU Quiz Land - Question Import/Export Tests
+Round trips through every format, GIFT escaping and Moodle-style input
+"""
+
+import io
+
+import pytest
+
+from question_io import FORMATS, question_format, read_questions, write_questions
+
+
+def question(number, quiz="Biology", **changes):
+    item = {"quiz": quiz, "question": f"Question {number}?", "option_a": "a", "option_b": "b",
+            "option_c": "c", "option_d": "d", "correct_answer": "B"}
+    item.update(changes)
+    return item
+
+
+def round_trip(questions, fmt):
+    text = "".join(write_questions(questions, fmt))
+    return list(read_questions(io.StringIO(text), fmt))
+
+
+def read(text, fmt="gift"):
+    return list(read_questions(io.StringIO(text), fmt))
+
+
+TRICKY = [
+    question(1, question="What does {x: 1} ~ {y = 2} # 3 print?", option_a="a ~ b", option_b="=c",
+             option_c="#d", option_d="e: f \\ g"),
+    question(2, question="Which cast is valid?", option_a="int -> str", option_b="%100%x",
+             option_c="[html]c", option_d="::t:: d", correct_answer="C"),
+    question(3, question="[html] Starts like markup", option_a="// not a comment", option_b="%50% off",
+             option_c="a->b->c", option_d="-> leading arrow"),
+    question(4, quiz="Chemistry", question="line1\n\nline3\n// and more", option_a="one\ntwo",
+             option_b="b", option_c="c", option_d="d", correct_answer="D"),
+    question(5, quiz="Chemistry", question="  ::Title:: real question  ", option_a="%", option_b="[",
+             option_c="\\", option_d="\\n", correct_answer="A"),
+]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_plain_questions_round_trip(fmt):
+    questions = [question(1), question(2, correct_answer="D"), question(3, quiz="Chemistry")]
+    rows = round_trip(questions, fmt)
+    assert [row.error for row in rows] == [None] * 3
+    assert [row.question for row in rows] == questions
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_special_characters_round_trip(fmt):
+    rows = round_trip(TRICKY, fmt)
+    assert [row.error for row in rows] == [None] * len(TRICKY)
+    expected = [dict(item, question=item["question"].strip()) for item in TRICKY]
+    assert [row.question for row in rows] == expected
+
+
+def test_exports_are_chunked_and_read_incrementally():
+    questions = [question(number) for number in range(1, 1202)]
+    for fmt in FORMATS:
+        chunks = list(write_questions(questions, fmt))
+        assert len(chunks) == 3
+        rows = read_questions(io.StringIO("".join(chunks)), fmt)
+        assert next(rows).question == questions[0]
+        assert len(list(rows)) == 1200
+
+
+def test_moodle_gift_features():
+    text = """// Exported from Moodle
+$CATEGORY: $course$/top/Cell Biology
+
+::Powerhouse::[html]Which organelle makes <b>ATP</b>? {
+    ~Nucleus#Holds DNA
+    =Mitochondrion#Correct!
+    ~Ribosome
+    ~Golgi apparatus
+}
+
+// A comment between questions
+Water boils at {~%0%50 ~%0%90 ~%100%100 ~%-50%120} degrees Celsius at sea level.
+
+::Matching:: Pair them {=cat -> feline =dog -> canine =cow -> bovine}
+
+::Truefalse:: The sky is green. {F}
+"""
+    rows = read(text)
+    assert [row.error for row in rows[:2]] == [None, None]
+    first, second = rows[0].question, rows[1].question
+    assert first["quiz"] == second["quiz"] == "Cell Biology"
+    assert first["question"] == "Which organelle makes <b>ATP</b>?"
+    assert [first["option_a"], first["option_b"], first["correct_answer"]] == ["Nucleus", "Mitochondrion", "B"]
+    assert second["question"] == "Water boils at _____ degrees Celsius at sea level."
+    assert [second[f"option_{letter}"] for letter in "abcd"] == ["50", "90", "100", "120"]
+    assert second["correct_answer"] == "C"
+    assert rows[2].error == "matching questions are not supported"
+    assert rows[2].row == 14
+    assert rows[3].error.startswith("only multiple-choice")
+
+
+@pytest.mark.parametrize("text, error", [
+    ("No answers here", "expected question text followed by one {answers} block"),
+    ("Two {=a ~b ~c ~d} blocks {=a ~b ~c ~d}", "expected question text followed by one {answers} block"),
+    ("Three options {=a ~b ~c}", "only multiple-choice"),
+    ("Two right {=a =b ~c ~d}", "only multiple-choice"),
+    ("{=a ~b ~c ~d}", "needs question text, four options and a correct answer"),
+])
+def test_unsupported_gift_questions_are_reported(text, error):
+    [row] = read(text)
+    assert row.question is None
+    assert row.error.startswith(error)
+
+
+def test_bad_rows_do_not_stop_the_import():
+    text = "quiz,question,option_a,option_b,option_c,option_d,correct_answer\n" \
+           "Q,First?,a,b,c,d,A\nQ,Missing options?,a,,,,A\nQ,Third?,a,b,c,d,E\nQ,Fourth?,a,b,c,d,d\n"
+    rows = read(text, "csv")
+    assert [row.row for row in rows] == [2, 3, 4, 5]
+    assert [row.error is None for row in rows] == [True, False, False, True]
+    assert rows[3].question["correct_answer"] == "D"
+
+
+def test_json_documents_lines_and_errors():
+    document = '{"title": "Physics", "questions": [{"question": "Q?", "options": ["1", "2", "3", "4"], "answer": "2"}]}'
+    [row] = read(document, "json")
+    assert (row.question["quiz"], row.question["correct_answer"]) == ("Physics", "B")
+
+    rows = read('{"question": "Q?", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d",'
+                ' "correct_answer": "A"}\n{broken\n', "json")
+    assert rows[0].error is None
+    assert (rows[1].row, rows[1].error.startswith("invalid JSON")) == (2, True)
+
+
+def test_long_options_are_rejected():
+    [row] = round_trip([question(1, option_c="x" * 501)], "csv")
+    assert row.error == "option_c is longer than 500 characters"
+
+
+def test_format_names():
+    assert question_format("export.GIFT") == "gift"
+    assert question_format("questions.jsonl") == "json"
+    assert question_format("notes.docx") is None
+    with pytest.raises(ValueError):
+        read_questions(io.StringIO(""), "xml")
+    with pytest.raises(ValueError):
+        list(write_questions([], "xml"))
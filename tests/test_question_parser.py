@@ -0,0 +1,130 @@
+"""
+GMU Quiz Land - Question Output Parser Tests
+Malformed, truncated and streamed model output
+"""
+
+import json
+
+import pytest
+
+from question_parser import QuestionStreamParser, iter_questions, normalize_question, parse_questions, repair_json
+
+
+def question(number, **changes):
+    item = {"question": f"Question {number}?", "option_a": "a", "option_b": "b",
+            "option_c": "c", "option_d": "d", "correct_answer": "B"}
+    item.update(changes)
+    return item
+
+
+def texts(questions):
+    return [item["question"] for item in questions]
+
+
+RESPONSE = json.dumps([question(1), question(2), question(3)], indent=2)
+
+
+def test_plain_array():
+    assert parse_questions(RESPONSE) == [question(1), question(2), question(3)]
+
+
+def test_code_fence_prose_and_wrapper_are_ignored():
+    text = ("Sure! Here are your questions:\n```json\n"
+            + json.dumps({"questions": [question(1), question(2)]})
+            + "\n```\nLet me know if you need more.")
+    assert texts(parse_questions(text)) == ["Question 1?", "Question 2?"]
+
+
+@pytest.mark.parametrize("cut", [
+    RESPONSE.index('"Question 3?"') + 5,  # inside a string
+    RESPONSE.index('"option_c"', RESPONSE.index("Question 3")),  # between keys
+    len(RESPONSE) - 3,  # before the last object's closing brace
+])
+def test_truncated_last_object_is_dropped(cut):
+    assert texts(parse_questions(RESPONSE[:cut])) == ["Question 1?", "Question 2?"]
+
+
+def test_truncated_stream_keeps_every_complete_question():
+    parser = QuestionStreamParser()
+    found = parser.feed(RESPONSE[:RESPONSE.index("Question 2") + 20])
+    assert texts(found) == ["Question 1?"]
+
+
+def test_braces_quotes_and_escapes_inside_strings():
+    tricky = question(1, question='What does "{x: }" print in f"{x!r}"?', option_a="a \\ b }", option_b="{")
+    assert parse_questions(json.dumps([tricky, question(2)])) == [tricky, question(2)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64])
+def test_streamed_in_pieces_matches_whole(size):
+    tricky = question(1, question='Braces {inside} and "quotes"?')
+    text = "```json\n" + json.dumps([tricky, question(2), question(3)]) + "\n```"
+    pieces = [text[i:i + size] for i in range(0, len(text), size)]
+    assert list(iter_questions(pieces)) == parse_questions(text)
+    assert len(parse_questions(text)) == 3
+
+
+def test_each_question_is_emitted_once_its_object_closes():
+    parser = QuestionStreamParser()
+    text = json.dumps([question(1), question(2)])
+    first_close = text.index("}") + 1
+    assert texts(parser.feed(text[:first_close - 1])) == []
+    assert texts(parser.feed(text[first_close - 1:first_close])) == ["Question 1?"]
+    assert texts(parser.feed(text[first_close:])) == ["Question 2?"]
+
+
+@pytest.mark.parametrize("text", [
+    '{"question": "Q?", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d", "correct_answer": "B",}',
+    '{“question”: “Q?”, “option_a”: “a”, “option_b”: “b”, “option_c”: “c”, “option_d”: “d”, “correct_answer”: “B”}',
+    '{"question": "Q?"\n "option_a": "a"\n "option_b": "b"\n "option_c": "c"\n "option_d": "d"\n "correct_answer": "B"}',
+    '{question: "Q?", option_a: "a", option_b: "b", option_c: "c", option_d: "d", correct_answer: "B"}',
+    "{'question': 'Q?', 'option_a': 'a', 'option_b': 'b', 'option_c': 'c', 'option_d': 'd', 'correct_answer': 'B'}",
+    '{"question": "Q?\nover two lines", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d", "correct_answer": "B"}',
+])
+def test_almost_json_is_repaired(text):
+    [parsed] = parse_questions(text)
+    assert parsed["question"].startswith("Q?")
+    assert (parsed["option_a"], parsed["option_d"], parsed["correct_answer"]) == ("a", "d", "B")
+
+
+@pytest.mark.parametrize("text", ["", "not json at all", '{"question": ', "{'a': }", "[1, 2"])
+def test_unparseable_text_raises_value_error(text):
+    with pytest.raises(ValueError):
+        repair_json(text)
+
+
+def test_malformed_objects_between_valid_ones_are_skipped():
+    text = (json.dumps(question(1)) + ', {"question": "Broken?", "option_a": "a" "option_b" b}, '
+            + '{"question": "No options?", "correct_answer": "A"}, ' + json.dumps(question(2)))
+    assert texts(parse_questions(text)) == ["Question 1?", "Question 2?"]
+
+
+@pytest.mark.parametrize("item, answer", [
+    ({"question": "Q?", "options": ["A) one", "B) two", "C) three", "D) four"], "answer": "C"}, "C"),
+    ({"question_text": "Q?", "choices": {"a": "one", "b": "two", "c": "three", "d": "four"}, "correct": 1}, "B"),
+    ({"Question": "Q?", "options": ["one", "two", "three", "four"], "Answer": "four"}, "D"),
+    ({"question": "Q?", "options": ["one", "two", "three", "four"], "correct_answer": "Option A"}, "A"),
+    ({"question": "Q?", "options": ["one", "two", "three", "four"], "correct_answer": "(d)"}, "D"),
+])
+def test_common_variations_are_normalized(item, answer):
+    normalized = normalize_question(item)
+    assert normalized["correct_answer"] == answer
+    assert [normalized[f"option_{letter}"] for letter in "abcd"] == ["one", "two", "three", "four"]
+
+
+@pytest.mark.parametrize("item", [
+    question(1, option_d=""),
+    question(1, question="  "),
+    question(1, correct_answer="E"),
+    question(1, correct_answer=7),
+    {"question": "Q?", "options": ["one", "two", "three"], "answer": "A"},
+    ["not", "an", "object"],
+])
+def test_incomplete_questions_are_rejected(item):
+    assert normalize_question(item) is None
+
+
+def test_repeated_questions_are_returned_once():
+    text = json.dumps([question(1), question(1, question="  QUESTION   1?"), question(2)])
+    assert texts(parse_questions(text)) == ["Question 1?", "Question 2?"]
+    assert len(parse_questions(text, limit=1)) == 1
@@ -0,0 +1,181 @@
+"""
+GMU Quiz Land - Quiz Content Cache Tests
+Snapshots are dropped after every admin change, in every process
+"""
+
+import io
+
+import app as quiz_app
+from conftest import add_quiz, login_admin
+from quiz_cache import QuizCache
+
+
+class Loader:
+    """Stands in for load_quiz_snapshot, counting loads; during() runs inside the next one."""
+
+    def __init__(self):
+        self.loads = 0
+        self.during = None
+
+    def __call__(self, quiz_id, version):
+        self.loads += 1
+        if self.during:
+            during, self.during = self.during, None
+            during()
+        return (quiz_id, version, self.loads)
+
+
+def test_snapshot_is_reused_until_invalidated():
+    cache, load = QuizCache(), Loader()
+    assert cache.get(1, load) == cache.get(1, load) == (1, 0, 1)
+    cache.invalidate(1)
+    assert cache.get(1, load) == (1, 1, 2)
+    assert cache.get(2, load) == (2, 0, 3)
+    assert cache.stats()['hits'] == 1
+
+
+def test_load_racing_an_invalidation_is_not_stored():
+    cache, load = QuizCache(), Loader()
+    load.during = lambda: cache.invalidate(1)
+    assert cache.get(1, load) == (1, 0, 1)
+    assert cache.get(1, load) == (1, 1, 2)
+    assert cache.get(1, load) == (1, 1, 2)
+
+    load.during = cache.clear
+    assert cache.get(2, load) == (2, 0, 3)
+    assert cache.get(2, load) == (2, 0, 4)
+
+
+def test_missing_quizzes_are_not_cached():
+    cache = QuizCache()
+    assert cache.get(1, lambda quiz_id, version: None) is None
+    assert cache.get(1, Loader()) == (1, 0, 1)
+
+
+def test_least_recently_used_snapshot_is_dropped():
+    cache, load = QuizCache(maxsize=2), Loader()
+    for quiz_id in (1, 2, 1, 3):
+        cache.get(quiz_id, load)
+    assert load.loads == 3
+    cache.get(1, load)
+    assert load.loads == 3
+    cache.get(2, load)
+    assert load.loads == 4
+
+
+def test_invalidations_reach_every_process_sharing_the_file(tmp_path):
+    path = str(tmp_path / 'quiz_cache.sync')
+    first, second, load = QuizCache(sync_path=path), QuizCache(sync_path=path), Loader()
+    for cache in (first, second):
+        cache.get(1, load)
+        cache.get(2, load)
+    assert load.loads == 4
+
+    first.invalidate(1)
+    assert second.get(1, load) == (1, 1, 5)
+    assert second.get(2, load) == (2, 0, 4)
+
+    second.clear()
+    assert first.get(2, load)[2] == 6
+
+
+def test_truncated_file_drops_everything_and_partial_lines_wait(tmp_path):
+    path = tmp_path / 'quiz_cache.sync'
+    cache, load = QuizCache(sync_path=str(path)), Loader()
+    cache.invalidate(3)
+    cache.get(1, load)
+
+    with open(path, 'a') as f:
+        f.write('1')
+    assert cache.get(1, load)[2] == 1
+    with open(path, 'a') as f:
+        f.write('\n')
+    assert cache.get(1, load)[2] == 2
+
+    path.write_text('')
+    assert cache.get(1, load)[2] == 3
+
+
+def test_full_sync_file_is_replaced_and_everything_dropped(tmp_path):
+    path = tmp_path / 'quiz_cache.sync'
+    writer, reader, load = QuizCache(sync_path=str(path), sync_max_bytes=8), QuizCache(sync_path=str(path)), Loader()
+    reader.get(1, load)
+    reader.get(9, load)
+    writer.invalidate(1)
+    assert reader.get(9, load)[2] == 2  # applied, nothing dropped yet
+
+    for quiz_id in (2, 3, 4, 5):
+        writer.invalidate(quiz_id)
+    assert path.read_text() == ''
+    assert reader.get(9, load)[2] == 3
+    assert reader.get(9, load)[2] == 3
+
+    # A process idle through a rotation is not fooled by the new file growing past its old offset
+    writer.invalidate(1)
+    idle = QuizCache(sync_path=str(path))
+    idle.get(9, load)
+    for quiz_id in (2, 3, 4, 9, 6, 7):
+        writer.invalidate(quiz_id)
+    assert path.read_text() == '6\n7\n'
+    assert idle.get(9, load)[2] == 5
+
+
+def test_line_written_to_a_file_being_replaced_is_repeated(tmp_path):
+    path = tmp_path / 'quiz_cache.sync'
+    writer, other = QuizCache(sync_path=str(path)), QuizCache(sync_path=str(path))
+    writer.invalidate(1)
+    state = writer._sync_state
+
+    def rotated_meanwhile():
+        writer._sync_state = state
+        other._rotate()
+        return state()
+
+    writer._sync_state = rotated_meanwhile
+    writer.invalidate(2)
+    assert path.read_text() == '2\n'
+
+
+def snapshot_texts(app, quiz_id):
+    with app.app_context():
+        snapshot = quiz_app.get_quiz_snapshot(quiz_id)
+        return snapshot and [question.question_text for question in snapshot.questions]
+
+
+def test_edits_in_one_process_reach_the_others(app, make_app):
+    other = make_app()
+    quiz_id = add_quiz(app, ['Old first?', 'Old second?'])
+    assert snapshot_texts(app, quiz_id) == snapshot_texts(other, quiz_id) == ['Old first?', 'Old second?']
+
+    form = {}
+    for number, (text, correct) in enumerate([('New first?', 'A'), ('New second?', 'D')], 1):
+        form.update({f'question_{number}': text, f'option_a_{number}': 'a', f'option_b_{number}': 'b',
+                     f'option_c_{number}': 'c', f'option_d_{number}': 'd', f'correct_{number}': correct})
+    client = login_admin(other, other.test_client())
+    assert client.post(f'/admin/add-questions/{quiz_id}', data=form).status_code == 302
+    for process in (app, other):
+        assert snapshot_texts(process, quiz_id) == ['New first?', 'New second?']
+        with process.app_context():
+            assert list(quiz_app.get_quiz_snapshot(quiz_id).answer_key.values()) == ['A', 'D']
+
+    upload = io.BytesIO(b'question,option_a,option_b,option_c,option_d,correct_answer\nImported?,a,b,c,d,C\n')
+    response = client.post('/admin/questions/import', data={'file': (upload, 'more.csv'), 'quiz_id': str(quiz_id)})
+    assert response.status_code == 201
+    for process in (app, other):
+        assert snapshot_texts(process, quiz_id) == ['New first?', 'New second?', 'Imported?']
+
+
+def test_deleted_quiz_is_gone_from_every_process(app, make_app):
+    other = make_app()
+    quiz_id = add_quiz(app, ['Doomed?'])
+    kept = add_quiz(app, ['Kept?'])
+    for process in (app, other):
+        assert snapshot_texts(process, quiz_id) == ['Doomed?']
+        assert snapshot_texts(process, kept) == ['Kept?']
+
+    client = login_admin(app, app.test_client())
+    assert client.get(f'/admin/delete-quiz/{quiz_id}').status_code == 302
+    for process in (app, other):
+        assert snapshot_texts(process, quiz_id) is None
+        assert snapshot_texts(process, kept) == ['Kept?']
+    assert other.test_client().get(f'/student/take-quiz/{quiz_id}').status_code == 404
@@ -0,0 +1,80 @@
+"""
+GMU Quiz Land - Quiz Catalog Tests
+Conditional requests until the catalog changes, and keyset pages that never repeat or skip a quiz
+"""
+
+import io
+import re
+from datetime import datetime
+
+import app as quiz_app
+from conftest import add_quiz, login_admin
+
+
+def titles(response):
+    return re.findall(r'<h3[^>]*>\s*(.*?)\s*</h3>', response.get_data(as_text=True))
+
+
+def next_page(response):
+    match = re.search(r'href="(/student/quizzes\?after=[^"]+)"', response.get_data(as_text=True))
+    return match and match.group(1)
+
+
+def test_catalog_is_not_modified_until_an_admin_change(app, make_app):
+    other = make_app(CATALOG_VERSION_TTL_SECONDS=0)
+    quiz_id = add_quiz(app, ['First?'], title='Doomed')
+    kept = add_quiz(app, ['Kept?'], title='Kept')
+    student, admin = app.test_client(), login_admin(app, app.test_client())
+
+    response = student.get('/student/quizzes')
+    etag = response.headers['ETag']
+    assert etag.startswith('W/') and titles(response) == ['Kept', 'Doomed']
+    for process in (app, other):
+        response = process.test_client().get('/student/quizzes', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+
+    assert admin.get(f'/admin/delete-quiz/{quiz_id}').status_code == 302
+    for process in (app, other):
+        response = process.test_client().get('/student/quizzes', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert titles(response) == ['Kept']
+    etag = response.headers['ETag']
+    assert student.get('/student/quizzes', headers={'If-None-Match': etag}).status_code == 304
+
+    # Imports change question counts with Core statements rather than the ORM
+    upload = io.BytesIO(b'question,option_a,option_b,option_c,option_d,correct_answer\nImported?,a,b,c,d,C\n')
+    response = admin.post('/admin/questions/import', data={'file': (upload, 'more.csv'), 'quiz_id': str(kept)})
+    assert response.status_code == 201
+    response = student.get('/student/quizzes', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert '2 Questions' in response.get_data(as_text=True)
+
+
+def test_catalog_pages_list_every_quiz_exactly_once(make_app):
+    app = make_app(CATALOG_PAGE_SIZE=3)
+    with app.app_context():
+        quiz_app.create_tables()
+    created = [add_quiz(app, ['Question?'], title=f'Quiz {number}') for number in range(8)]
+    # Ties on created_at are ordered by id, so they cannot straddle a page boundary twice
+    with app.app_context():
+        same_time = datetime(2024, 1, 1)
+        for quiz in quiz_app.Quiz.query.filter(quiz_app.Quiz.id.in_(created[2:6])):
+            quiz.created_at = same_time
+        quiz_app.db.session.commit()
+
+    client, seen, pages = app.test_client(), [], 0
+    url = '/student/quizzes'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        seen += titles(response)
+        pages += 1
+        if pages == 1:
+            # A quiz added mid-way goes on the first page and shifts nothing after the cursor
+            add_quiz(app, ['Question?'], title='Latecomer')
+        url = next_page(response)
+
+    assert pages == 3
+    assert seen == ['Quiz 7', 'Quiz 6', 'Quiz 1', 'Quiz 0', 'Quiz 5', 'Quiz 4', 'Quiz 3', 'Quiz 2']
+    assert client.get('/student/quizzes?after=not-a-cursor').status_code == 400
@@ -0,0 +1,119 @@
+"""
+GMU Quiz Land - Per-Attempt Shuffling Tests
+Seeded order, sampling and grading with the letters each student was shown
+"""
+
+import re
+
+import app as quiz_app
+from conftest import add_quiz
+from quiz_shuffle import LETTERS, question_order, shown_answer, stored_answer
+
+SEED = 1234567
+
+
+def add_shuffled_quiz(app, count, **fields):
+    """A quiz whose options name their question and stored letter, each answered B."""
+    quiz_id = add_quiz(app, [f'Question {number}?' for number in range(count)], **fields)
+    with app.app_context():
+        for question in quiz_app.Question.query.filter_by(quiz_id=quiz_id):
+            for letter in 'abcd':
+                setattr(question, f'option_{letter}', f'{question.question_text} {letter}')
+        quiz_app.db.session.commit()
+    return quiz_id
+
+
+def start(app, client, quiz_id, seed=SEED):
+    assert client.post(f'/student/start-quiz/{quiz_id}', data={'student_name': 'Ada'}).status_code == 302
+    with client.session_transaction() as session:
+        attempt_id = session['attempt_id']
+    with app.app_context():
+        quiz_app.db.session.get(quiz_app.Attempt, attempt_id).shuffle_seed = seed
+        quiz_app.db.session.commit()
+    return attempt_id
+
+
+def shown_letter(question, text):
+    return next(letter for letter in LETTERS if question[f'option_{letter.lower()}'] == text)
+
+
+def test_shuffled_attempt_is_graded_and_shown_in_its_own_letters(app):
+    quiz_id = add_shuffled_quiz(app, 6, shuffle_questions=True, shuffle_options=True)
+    client = app.test_client()
+    attempt_id = start(app, client, quiz_id)
+
+    questions = client.get(f'/student/quiz-session/{quiz_id}').get_json()['questions']
+    assert [question['question_text'] for question in questions] != [f'Question {n}?' for n in range(6)]
+    # Right (stored B) on even positions, stored D on odd ones, by the letters on screen
+    picked = [shown_letter(question, f"{question['question_text']} {'b' if index % 2 == 0 else 'd'}")
+              for index, question in enumerate(questions)]
+    assert picked != ['B', 'D'] * 3
+
+    response = client.post('/student/submit-answers', json={'answers': [
+        {'question_id': question['id'], 'selected_answer': letter} for question, letter in zip(questions, picked)]})
+    body = response.get_json()
+    assert [result['is_correct'] for result in body['results']] == [True, False] * 3
+    assert body['completed'] is True
+
+    with app.app_context():
+        stored = {answer.question_id: answer.selected_answer
+                  for answer in quiz_app.Answer.query.filter_by(attempt_id=attempt_id)}
+        assert [stored[question['id']] for question in questions] == ['B', 'D'] * 3
+        assert quiz_app.db.session.get(quiz_app.Attempt, attempt_id).score == 3
+
+    page = client.get(f'/student/quiz-results/{quiz_id}').get_data(as_text=True)
+    assert re.findall(r'Your answer: <strong>(\w)</strong>', page) == picked
+    texts = re.findall(r'>(Question \d\?)</p>', page)
+    assert texts == [question['question_text'] for question in questions]
+
+
+def test_sampled_attempt_rejects_questions_it_was_not_dealt(app):
+    quiz_id = add_shuffled_quiz(app, 5, sample_size=2)
+    client = app.test_client()
+    attempt_id = start(app, client, quiz_id)
+
+    dealt = [question['id'] for question in client.get(f'/student/quiz-session/{quiz_id}').get_json()['questions']]
+    assert len(dealt) == 2
+    with app.app_context():
+        other = next(question.id for question in quiz_app.Question.query.filter_by(quiz_id=quiz_id)
+                     if question.id not in dealt)
+
+    response = client.post('/student/submit-answers', json={'answers': [
+        {'question_id': dealt[0], 'selected_answer': 'B'}, {'question_id': other, 'selected_answer': 'B'}]})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Question not found'
+    response = client.post('/student/submit-answer', json={'question_id': other, 'selected_answer': 'B'})
+    assert response.status_code == 400
+
+    with app.app_context():
+        assert quiz_app.Answer.query.filter_by(attempt_id=attempt_id).count() == 0
+        assert quiz_app.db.session.get(quiz_app.Attempt, attempt_id).current_question == 0
+
+    response = client.post('/student/submit-answers', json={'answers': [
+        {'question_id': question_id, 'selected_answer': 'B'} for question_id in dealt]})
+    assert response.get_json()['completed'] is True
+
+
+def test_same_seed_gives_the_same_order_everywhere(app, make_app):
+    quiz_id = add_shuffled_quiz(app, 8, shuffle_questions=True, shuffle_options=True, sample_size=5)
+    other = make_app()
+
+    def session_questions(process):
+        client = process.test_client()
+        start(process, client, quiz_id)
+        return client.get(f'/student/quiz-session/{quiz_id}').get_json()['questions']
+
+    first = session_questions(app)
+    assert len(first) == 5
+    assert session_questions(app) == session_questions(other) == first
+
+    with app.app_context():
+        snapshot = quiz_app.get_quiz_snapshot(quiz_id)
+        assert question_order(snapshot, SEED) == question_order(snapshot, SEED)
+        orders = {tuple(question_order(snapshot, seed)) for seed in range(20)}
+        assert len(orders) > 1
+        for question in snapshot.questions:
+            for letter in LETTERS:
+                assert shown_answer(snapshot, SEED, question.id, stored_answer(snapshot, SEED, question.id, letter)) \
+                    == letter
+
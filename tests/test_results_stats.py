@@ -0,0 +1,107 @@
+"""
+GMU Quiz Land - Results Summary Table Tests
+The incrementally kept summary rows match a recount from Attempt and Answer after every kind of change
+"""
+
+import app as quiz_app
+from conftest import add_quiz, login_admin
+
+
+def take(app, quiz_id, letters, name='Ada'):
+    """One attempt answering the quiz's questions in order with letters; returns its id."""
+    client = app.test_client()
+    assert client.post(f'/student/start-quiz/{quiz_id}', data={'student_name': name}).status_code == 302
+    with client.session_transaction() as session:
+        attempt_id = session['attempt_id']
+    with app.app_context():
+        question_ids = [question.id for question in quiz_app.Question.query.filter_by(quiz_id=quiz_id)
+                        .order_by(quiz_app.Question.order)]
+    response = client.post('/student/submit-answers', json={'answers': [
+        {'question_id': question_id, 'selected_answer': letter} for question_id, letter in zip(question_ids, letters)]})
+    assert response.status_code == 200
+    return attempt_id
+
+
+def consistent_stats(app, quiz_id):
+    with app.app_context():
+        stats = quiz_app.read_results_stats(quiz_id)
+        assert stats == quiz_app.compute_results_stats(quiz_id)
+        return stats
+
+
+def test_replacing_questions_drops_their_counts_and_keeps_the_scores(app):
+    quiz_id = add_quiz(app, ['First?', 'Second?'])
+    take(app, quiz_id, 'BB')
+    take(app, quiz_id, 'BA', name='Bo')
+    assert consistent_stats(app, quiz_id)['buckets'] == {2: 1, 1: 1}
+
+    form = {}
+    for number, text in enumerate(['New first?', 'New second?'], 1):
+        form.update({f'question_{number}': text, f'option_a_{number}': 'a', f'option_b_{number}': 'b',
+                     f'option_c_{number}': 'c', f'option_d_{number}': 'd', f'correct_{number}': 'C'})
+    client = login_admin(app, app.test_client())
+    assert client.post(f'/admin/add-questions/{quiz_id}', data=form).status_code == 302
+    stats = consistent_stats(app, quiz_id)
+    assert stats['quiz'] == {'attempt_count': 2, 'score_sum': 3}
+    assert stats['questions'] == {}
+
+    take(app, quiz_id, 'CA', name='Cy')
+    stats = consistent_stats(app, quiz_id)
+    assert stats['buckets'] == {2: 1, 1: 2}
+    assert sorted((row['answered'], row['correct'], row['option_a_count']) for row in stats['questions'].values()) \
+        == [(1, 0, 1), (1, 1, 0)]
+
+
+def test_deleting_a_quiz_removes_only_its_counts(app):
+    doomed = add_quiz(app, ['First?'])
+    kept = add_quiz(app, ['Kept?'])
+    take(app, doomed, 'B')
+    take(app, kept, 'D')
+    before = consistent_stats(app, kept)
+
+    client = login_admin(app, app.test_client())
+    assert client.get(f'/admin/delete-quiz/{doomed}').status_code == 302
+    assert consistent_stats(app, doomed) == {'quiz': {'attempt_count': 0, 'score_sum': 0}, 'buckets': {},
+                                             'questions': {}}
+    with app.app_context():
+        assert quiz_app.QuestionStats.query.filter_by(quiz_id=doomed).count() == 0
+    assert consistent_stats(app, kept) == before
+
+
+def test_recounted_attempts_are_reopened_and_uncounted(app):
+    quiz_id = add_quiz(app, ['First?', 'Second?', 'Third?'])
+    attempt_id = take(app, quiz_id, 'BB')
+    with app.app_context():
+        # A double-submitted answer from before the unique index completed the attempt early
+        quiz_app.db.session.execute(quiz_app.db.text('DROP INDEX uq_answer_attempt_question'))
+        attempt = quiz_app.db.session.get(quiz_app.Attempt, attempt_id)
+        first = quiz_app.Answer.query.filter_by(attempt_id=attempt_id).first()
+        quiz_app.db.session.add(quiz_app.Answer(attempt_id=attempt_id, question_id=first.question_id,
+                                                selected_answer='B', is_correct=True))
+        attempt.current_question, attempt.score, attempt.is_completed = 3, 3, True
+        quiz_app.update_results_stats(quiz_id, [(first.question_id, 'B', True)], [3])
+        quiz_app.db.session.commit()
+
+        quiz_app.upgrade_schema()
+        attempt = quiz_app.db.session.get(quiz_app.Attempt, attempt_id)
+        assert (attempt.current_question, attempt.score, attempt.is_completed) == (2, 2, False)
+    stats = consistent_stats(app, quiz_id)
+    assert stats['quiz'] == {'attempt_count': 0, 'score_sum': 0}
+    assert [row['answered'] for row in stats['questions'].values()] == [1, 1]
+
+
+def test_rebuild_command_finds_and_repairs_drift(app):
+    quiz_id = add_quiz(app, ['First?', 'Second?'])
+    take(app, quiz_id, 'BC')
+    with app.app_context():
+        quiz_app.db.session.get(quiz_app.QuizStats, quiz_id).score_sum += 5
+        quiz_app.db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['rebuild-stats', '--check'])
+    assert result.exit_code == 1
+    assert f'Quiz {quiz_id}: summary rows are out of date' in result.output
+    result = runner.invoke(args=['rebuild-stats', '--quiz-id', str(quiz_id)])
+    assert result.exit_code == 0
+    assert consistent_stats(app, quiz_id)['quiz'] == {'attempt_count': 1, 'score_sum': 1}
+    assert runner.invoke(args=['rebuild-stats', '--check']).exit_code == 0
@@ -0,0 +1,126 @@
+"""
+GMU Quiz Land - Answer Submission Tests
+Concurrent and repeated submissions are counted once, in both storage modes
+"""
+
+import threading
+
+import pytest
+
+import app as quiz_app
+from conftest import add_quiz
+
+CLIENTS = 8
+
+
+@pytest.fixture(params=['atomic', 'write_behind'])
+def app(request, make_app):
+    app = make_app(STORAGE_PROFILE='production', ANSWER_WRITE_BEHIND=request.param == 'write_behind')
+    with app.app_context():
+        quiz_app.create_tables()
+    yield app
+    buffer = app.extensions['gmu_quiz'].get('answer_buffer')
+    if buffer:
+        buffer.close()
+
+
+def start_attempt(app, quiz_id, clients):
+    """Start an attempt with the first client and share it with the rest, as tabs of one browser."""
+    first = clients[0]
+    assert first.post(f'/student/start-quiz/{quiz_id}', data={'student_name': 'Ada'}).status_code == 302
+    with first.session_transaction() as session:
+        attempt_id = session['attempt_id']
+    for client in clients[1:]:
+        with client.session_transaction() as session:
+            session['attempt_id'] = attempt_id
+    return attempt_id
+
+
+def post_together(clients, requests_made):
+    """Send each client's (url, json) request from its own thread, all at once."""
+    barrier = threading.Barrier(len(clients))
+    responses = [None] * len(clients)
+
+    def send(index):
+        url, body = requests_made[index]
+        barrier.wait()
+        responses[index] = clients[index].post(url, json=body)
+
+    threads = [threading.Thread(target=send, args=(index,)) for index in range(len(clients))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def stored(app, quiz_id, attempt_id):
+    buffer = app.extensions['gmu_quiz'].get('answer_buffer')
+    if buffer:
+        buffer.flush()
+    with app.app_context():
+        attempt = quiz_app.db.session.get(quiz_app.Attempt, attempt_id)
+        answers = quiz_app.Answer.query.filter_by(attempt_id=attempt_id).count()
+        stats = quiz_app.read_results_stats(quiz_id)
+        assert stats == quiz_app.compute_results_stats(quiz_id)
+        return answers, attempt.current_question, attempt.score, attempt.is_completed, stats
+
+
+def question_ids(app, quiz_id):
+    with app.app_context():
+        return [question.id for question in quiz_app.db.session.get(quiz_app.Quiz, quiz_id).questions]
+
+
+def test_double_submitted_answer_is_counted_once(app):
+    quiz_id = add_quiz(app, ['First?', 'Second?', 'Third?'])
+    clients = [app.test_client() for _ in range(CLIENTS)]
+    attempt_id = start_attempt(app, quiz_id, clients)
+    answer = {'question_id': question_ids(app, quiz_id)[0], 'selected_answer': 'B'}
+
+    responses = post_together(clients, [('/student/submit-answer', answer)] * CLIENTS)
+
+    assert {response.status_code for response in responses} <= {200, 409}
+    assert all(response.get_json()['is_correct'] for response in responses if response.status_code == 200)
+    answers, current_question, score, completed, stats = stored(app, quiz_id, attempt_id)
+    assert (answers, current_question, score, completed) == (1, 1, 1, False)
+    assert [row['answered'] for row in stats['questions'].values()] == [1]
+
+
+def test_concurrent_answers_to_different_questions_all_count(app):
+    quiz_id = add_quiz(app, [f'Question {number}?' for number in range(CLIENTS)])
+    clients = [app.test_client() for _ in range(CLIENTS)]
+    attempt_id = start_attempt(app, quiz_id, clients)
+    # Half right (B), half wrong (C)
+    requests_made = [('/student/submit-answer', {'question_id': question_id, 'selected_answer': 'BC'[index % 2]})
+                     for index, question_id in enumerate(question_ids(app, quiz_id))]
+
+    responses = post_together(clients, requests_made)
+
+    assert [response.status_code for response in responses] == [200] * CLIENTS
+    answers, current_question, score, completed, stats = stored(app, quiz_id, attempt_id)
+    assert (answers, current_question, score, completed) == (CLIENTS, CLIENTS, CLIENTS // 2, True)
+    assert stats['quiz'] == {'attempt_count': 1, 'score_sum': CLIENTS // 2}
+    assert stats['buckets'] == {CLIENTS // 2: 1}
+
+
+def test_retried_batches_are_counted_once(app):
+    quiz_id = add_quiz(app, ['First?', 'Second?', 'Third?'])
+    clients = [app.test_client() for _ in range(CLIENTS)]
+    attempt_id = start_attempt(app, quiz_id, clients)
+    first, second, third = question_ids(app, quiz_id)
+    batch = {'answers': [{'question_id': first, 'selected_answer': 'B'},
+                         {'question_id': second, 'selected_answer': 'A'}]}
+
+    responses = post_together(clients, [('/student/submit-answers', batch)] * CLIENTS)
+
+    assert {response.status_code for response in responses} <= {200, 409}
+    answers, current_question, score, completed, _ = stored(app, quiz_id, attempt_id)
+    assert (answers, current_question, score, completed) == (2, 2, 1, False)
+
+    # A late retry overlapping the last answer still completes the attempt once
+    late = {'answers': batch['answers'] + [{'question_id': third, 'selected_answer': 'B'}]}
+    response = clients[0].post('/student/submit-answers', json=late)
+    assert response.get_json()['completed'] is True
+    answers, current_question, score, completed, stats = stored(app, quiz_id, attempt_id)
+    assert (answers, current_question, score, completed) == (3, 3, 2, True)
+    assert stats['buckets'] == {2: 1}
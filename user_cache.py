@@ -0,0 +1,100 @@
+"""
+GMU Quiz Land - Login Identity Cache
+Short-lived, size-bounded cache of the users Flask-Login loads on every request
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from flask_login import UserMixin
+
+
+def password_fingerprint(password_hash: str) -> str:
+    """Short digest of a stored password hash; it changes whenever the password does."""
+    return hashlib.blake2b(password_hash.encode(), digest_size=8).hexdigest()
+
+
+class CachedUser(UserMixin):
+    """Read-only copy of a User row, usable anywhere current_user is."""
+
+    def __init__(self, id: int, email: str, is_admin: bool, fingerprint: str):
+        self.id = id
+        self.email = email
+        self.is_admin = is_admin
+        self.fingerprint = fingerprint
+
+    def get_id(self) -> str:
+        # Same format as User.get_id, so a password change ends every session
+        return f'{self.id}:{self.fingerprint}'
+
+
+class UserCache:
+    """
+    LRU cache of CachedUser objects keyed by user id, each kept for at most
+    ttl_seconds.
+
+    The cache is per process. invalidate() drops a user at once in this
+    process; other processes notice a password change through the session's
+    fingerprint once their copy expires, so ttl_seconds bounds how long a
+    change elsewhere takes to apply. As with QuizCache, a load that overlaps
+    an invalidation is returned but not stored. ttl_seconds=0 turns caching
+    off.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl_seconds: float = 30):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, loader: Callable[[int], Optional[CachedUser]]) -> Optional[CachedUser]:
+        """Return the cached user, calling loader(user_id) on a miss. Missing users are not cached."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            version = self._versions.get(user_id, 0)
+
+        user = loader(user_id)
+        if user is None or self.ttl_seconds <= 0:
+            return user
+
+        with self._lock:
+            if self._versions.get(user_id, 0) == version:
+                self._entries[user_id] = (now + self.ttl_seconds, user)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: int):
+        """Drop user_id, e.g. on logout or a password change."""
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            for user_id in self._entries:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses
+            }